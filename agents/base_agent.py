@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Callable
 from models.schemas import AgentRequest, AgentResponse, ConversationContext
+from utils.async_bridge import async_bridge
+from utils.tracing import tracer
 
 class BaseAgent(ABC):
     """Base class for all agents"""
@@ -13,6 +15,11 @@ class BaseAgent(ABC):
         """Process agent request and return response"""
         pass
     
+    async def run_blocking(self, func: Callable, *args, **kwargs) -> Any:
+        """Chạy hàm blocking (LLM sync, đọc dữ liệu, tính toán) trong thread pool, giới hạn theo agent"""
+        with tracer.span(f"{self.agent_name}.{getattr(func, '__name__', 'call')}"):
+            return await async_bridge.run(self.agent_name, func, *args, **kwargs)
+    
     def validate_input(self, slots: Dict[str, Any], required_slots: list) -> bool:
         """Validate if required slots are present"""
         return all(slot in slots for slot in required_slots)
@@ -8,6 +8,7 @@ import uuid
 from .payment_agent import payment_agent
 from .verification_agent import verification_agent
 from .upselling_agent import upsell_agent
+from data.seat_inventory import seat_inventory, seat_capacity
 from data.mock_user_data import find_user_by_phone, find_user_by_email, create_mock_user, add_mock_booking, get_user_bookings, get_user_stats, MOCK_USERS
 
 class BookingAgent:
@@ -30,6 +31,17 @@ class BookingAgent:
         user = self._get_or_create_mock_user(contact_info, passenger_info[0])
         user_id = user["user_id"]
         
+        # Giữ ghế cho mọi hành khách - PaymentAgent đặt hạn hold bằng hạn payment session
+        seat_hold = None
+        if service_data["type"] == "flight":
+            seat_hold = seat_inventory.hold(service_data.get("flight_details", service_data),
+                                            seats=len(passenger_info), owner=user_id)
+            if seat_hold is None:
+                return {
+                    "success": False,
+                    "error": f"Chuyến bay {service_data['service_id']} không còn đủ {len(passenger_info)} ghế"
+                }
+        
         # Tạo booking data
         booking_data = {
             "service_type": service_data["type"],  # "flight" hoặc "hotel"
@@ -38,6 +50,7 @@ class BookingAgent:
             "passenger_info": passenger_info,
             "contact_info": contact_info,
             "booking_details": service_data,
+            "seat_hold_id": seat_hold["hold_id"] if seat_hold else None,
             "created_at": datetime.now().isoformat()
         }
         
@@ -67,6 +80,8 @@ class BookingAgent:
                 "message": f"✅ Đã tạo booking thành công! Mã tham chiếu: {payment_result['booking_reference']}"
             }
         else:
+            if seat_hold:
+                seat_inventory.release(seat_hold["hold_id"])
             return {
                 "success": False,
                 "error": payment_result["error"]
@@ -102,9 +117,12 @@ class BookingAgent:
                 "airline": flight_data["airline"],
                 "from_city": flight_data["from_city"],
                 "to_city": flight_data["to_city"],
+                "from_code": flight_data.get("from_code"),
+                "to_code": flight_data.get("to_code"),
                 "date": flight_data["date"],
                 "time": flight_data["time"],
-                "duration": flight_data.get("duration", "2h00m")
+                "duration": flight_data.get("duration", "2h00m"),
+                "seat_capacity": seat_capacity(flight_data)
             }
         }
         
@@ -2,7 +2,10 @@
 Booking Intent Agent - Xử lý ý định đặt vé
 """
 
+import uuid
 from typing import Dict, Any
+from utils.shared_state import shared_state
+from data.seat_inventory import seat_inventory
 from .booking_agent import booking_agent
 
 class BookingIntentAgent:
@@ -10,7 +13,7 @@ class BookingIntentAgent:
     
     def __init__(self):
         self.name = "BookingIntentAgent"
-        self.booking_state = {}  # Lưu trạng thái đặt vé
+        self.booking_state = shared_state("booking_sessions", ttl=2 * 3600)  # Lưu trạng thái đặt vé (dùng chung giữa các worker)
     
     def detect_booking_intent(self, user_message: str, context: Dict = None) -> Dict[str, Any]:
         """Phát hiện ý định đặt vé từ tin nhắn user"""
@@ -108,14 +111,24 @@ class BookingIntentAgent:
         price = actual_flight.get('price', 1665967)
         
         # Tạo session đặt vé
-        session_id = f"booking_{flight_id}_{hash(str(actual_flight)) % 10000}"
+        # uuid thay cho hash(): hash() đổi theo từng process nên worker khác không tìm lại được session
+        session_id = f"booking_{flight_id}_{uuid.uuid4().hex[:12]}"
         
-        self.booking_state[session_id] = {
+        # Giữ chỗ ngay khi bắt đầu - user bỏ dở thì ghế tự trả sau SEAT_HOLD_TTL
+        seat_hold = seat_inventory.hold(actual_flight, owner=session_id)
+        if seat_hold is None:
+            return {
+                "success": False,
+                "message": f"Chuyến {airline} {flight_id} ngày {date} lúc {time} đã hết chỗ. Vui lòng chọn chuyến khác."
+            }
+        
+        self.booking_state.set(session_id, {
             "step": "request_contact_info",
             "flight_info": actual_flight,
+            "seat_hold": seat_hold,
             "passenger_info": None,
             "contact_info": None
-        }
+        })
         
         message = f"""
 🛫 **ĐẶT VÉ MÁY BAY**
@@ -140,7 +153,8 @@ Bạn đã chọn:
     def process_phone_input(self, session_id: str, phone: str) -> Dict[str, Any]:
         """Xử lý input số điện thoại"""
         
-        if session_id not in self.booking_state:
+        session = self.booking_state.get(session_id)
+        if session is None:
             return {
                 "success": False,
                 "message": "Session đặt vé không hợp lệ. Vui lòng bắt đầu lại."
@@ -159,9 +173,10 @@ Bạn đã chọn:
         confirmation = booking_agent.prepare_booking_confirmation(phone)
         
         # Cập nhật session
-        self.booking_state[session_id]["phone"] = phone
-        self.booking_state[session_id]["user_confirmation"] = confirmation
-        self.booking_state[session_id]["step"] = "confirm_user_info"
+        session["phone"] = phone
+        session["user_confirmation"] = confirmation
+        session["step"] = "confirm_user_info"
+        self.booking_state.set(session_id, session)
         
         return {
             "success": True,
@@ -174,13 +189,13 @@ Bạn đã chọn:
     def process_user_confirmation(self, session_id: str, confirmation: str) -> Dict[str, Any]:
         """Xử lý xác nhận thông tin user"""
         
-        if session_id not in self.booking_state:
+        session = self.booking_state.get(session_id)
+        if session is None:
             return {
                 "success": False,
                 "message": "Session không hợp lệ."
             }
         
-        session = self.booking_state[session_id]
         confirmation_lower = confirmation.lower().strip()
         
         if confirmation_lower in ["đúng", "ok", "yes", "correct", "chính xác"]:
@@ -191,6 +206,7 @@ Bạn đã chọn:
             additional_info_msg = booking_agent.request_additional_info(user_data)
             
             session["step"] = "collect_additional_info"
+            self.booking_state.set(session_id, session)
             
             return {
                 "success": True,
@@ -225,13 +241,13 @@ Ví dụ: "Nguyễn Văn A, 123456789012, email@gmail.com, 123 Nguyễn Huệ Q1
     def process_additional_info(self, session_id: str, info_text: str) -> Dict[str, Any]:
         """Xử lý thông tin bổ sung (CCCD + SMS)"""
         
-        if session_id not in self.booking_state:
+        session = self.booking_state.get(session_id)
+        if session is None:
             return {
                 "success": False,
                 "message": "Session không hợp lệ."
             }
         
-        session = self.booking_state[session_id]
         
         # Parse thông tin CCCD và SMS phone - linh hoạt hơn
         info_lower = info_text.lower().strip()
@@ -293,6 +309,7 @@ Ví dụ: "Nguyễn Văn A, 123456789012, email@gmail.com, 123 Nguyễn Huệ Q1
         session["sms_code"] = sms_result.get("sms_code")  # Lưu để test
         session["booking_ref"] = booking_ref
         session["step"] = "verify_sms"
+        self.booking_state.set(session_id, session)
         
         # Thêm mã SMS vào message để test
         test_message = sms_result["message"]
@@ -308,13 +325,13 @@ Ví dụ: "Nguyễn Văn A, 123456789012, email@gmail.com, 123 Nguyễn Huệ Q1
     def process_sms_verification(self, session_id: str, sms_code: str) -> Dict[str, Any]:
         """Xử lý xác thực SMS"""
         
-        if session_id not in self.booking_state:
+        session = self.booking_state.get(session_id)
+        if session is None:
             return {
                 "success": False,
                 "message": "Session không hợp lệ."
             }
         
-        session = self.booking_state[session_id]
         sms_phone = session.get("sms_phone")
         
         if not sms_phone:
@@ -323,12 +340,22 @@ Ví dụ: "Nguyễn Văn A, 123456789012, email@gmail.com, 123 Nguyễn Huệ Q1
                 "message": "Không tìm thấy thông tin SMS."
             }
         
+        # Ghế phải còn giữ được trước khi thanh toán
+        seat_hold = self._ensure_seat_hold(session_id, session)
+        if seat_hold is None:
+            return {
+                "success": False,
+                "message": "Rất tiếc, chuyến bay đã hết chỗ trong lúc bạn hoàn tất thông tin. Vui lòng chọn chuyến khác."
+            }
+        
         # Xác thực SMS
         verify_result = booking_agent.verify_payment_code(sms_phone, sms_code, session_id)
         
         if verify_result["success"]:
             # Thanh toán thành công - có upselling
+            seat_inventory.confirm(seat_hold["hold_id"])
             session["step"] = "completed"
+            self.booking_state.set(session_id, session)
             
             return {
                 "success": True,
@@ -344,6 +371,18 @@ Ví dụ: "Nguyễn Văn A, 123456789012, email@gmail.com, 123 Nguyễn Huệ Q1
                 "attempts_left": verify_result.get("attempts_left")
             }
     
+    def _ensure_seat_hold(self, session_id: str, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Gia hạn hold hiện tại, hold đã hết hạn thì giữ chỗ lại (None nếu chuyến đã hết chỗ)"""
+        seat_hold = session.get("seat_hold")
+        if seat_hold and seat_inventory.extend(seat_hold["hold_id"]):
+            return seat_hold
+        
+        seat_hold = seat_inventory.hold(session["flight_info"], owner=session_id)
+        if seat_hold:
+            session["seat_hold"] = seat_hold
+            self.booking_state.set(session_id, session)
+        return seat_hold
+    
     def get_session_info(self, session_id: str) -> Dict[str, Any]:
         """Lấy thông tin session"""
         return self.booking_state.get(session_id, {})
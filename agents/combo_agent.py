@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from .base_agent import BaseAgent
 from models.schemas import AgentRequest, AgentResponse, ComboContext, ComboResponse, ComboItem
 try:
@@ -6,6 +6,12 @@ try:
     from data.mock_data import hotel_generator, transfer_generator, combo_generator
 except ImportError:
     from data.mock_data import combo_generator, hotel_generator, transfer_generator, get_flights_by_route
+from data.seat_inventory import seat_inventory
+from utils.logger import get_logger
+
+log = get_logger("agents.combo_agent")
+
+COMBO_PAYMENT_HOURS = 2  # Hạn thanh toán combo
 
 class ComboAgent(BaseAgent):
     """Agent for combo services and packages with session context"""
@@ -70,7 +76,7 @@ class ComboAgent(BaseAgent):
                     "to_city": flight_info.to_city,
                     "price": flight_info.price
                 }
-                combo = combo_generator.generate_combo(flight_dict, destination)
+                combo = await self.run_blocking(combo_generator.generate_combo, flight_dict, destination)
                 if combo:
                     combos.append(combo)
         
@@ -103,7 +109,7 @@ class ComboAgent(BaseAgent):
                 combo_responses.append(combo_response)
             
             context.combo_context.available_combos = combo_responses
-            print(f"DEBUG: Saved {len(combo_responses)} combos to session context")
+            log.debug("Saved %s combos to session context", len(combo_responses))
         
         if not combos:
             return self.create_response(
@@ -155,7 +161,19 @@ class ComboAgent(BaseAgent):
         
         booking_id = f"CB{uuid.uuid4().hex[:6].upper()}"
         payment_code = f"PAY{uuid.uuid4().hex[:8].upper()}"
-        deadline = (datetime.now() + timedelta(hours=2)).strftime("%H:%M %d/%m/%Y")
+        deadline = (datetime.now() + timedelta(hours=COMBO_PAYMENT_HOURS)).strftime("%H:%M %d/%m/%Y")
+        
+        # Giữ ghế của chuyến bay trong combo tới hạn thanh toán
+        seat_hold = None
+        flight = await self.run_blocking(self._resolve_combo_flight, selected_combo, context)
+        if flight:
+            seat_hold = seat_inventory.hold(flight, ttl=COMBO_PAYMENT_HOURS * 3600, owner=booking_id)
+            if seat_hold is None:
+                return self.create_response(
+                    success=False,
+                    data={},
+                    message=f"😔 Chuyến {flight['flight_id']} trong combo đã hết chỗ. Bạn chọn combo khác nhé!"
+                )
         
         booking_data = {
             "booking_id": booking_id,
@@ -168,6 +186,7 @@ class ComboAgent(BaseAgent):
             },
             "total_amount": selected_combo.final_price,
             "deadline": deadline,
+            "seat_hold_id": seat_hold["hold_id"] if seat_hold else None,
             "status": "pending_payment"
         }
         
@@ -184,19 +203,36 @@ class ComboAgent(BaseAgent):
             message=f"🎉 Đặt combo thành công! Mã booking: {booking_id}"
         )
     
+    def _resolve_combo_flight(self, combo: ComboResponse, context=None) -> Optional[Dict[str, Any]]:
+        """Chuyến bay (flight_id, ngày, giờ, số ghế) của item flight trong combo - tra từ kết quả search trong context"""
+        flight_item = next((item for item in combo.items if item.type == "flight"), None)
+        if not flight_item or not context or not context.flight_context:
+            return None
+        
+        for flight_info in context.flight_context.search_results:
+            if flight_info.service_id == flight_item.service_id:
+                from data.mock_data_loader import get_mock_data_loader
+                flights = get_mock_data_loader().get_flights_by_route_and_date(
+                    flight_info.from_city, flight_info.to_city, flight_info.date
+                )
+                # Sức chứa lấy từ loader - seats_left trong FlightInfo là số ghế còn lúc search, không phải sức chứa
+                return next((flight for flight in flights if flight["flight_id"] == flight_info.flight_id
+                             and flight["time"] == flight_info.time), None)
+        return None
+    
     async def _create_personalized_combo(self, flight: Dict[str, Any], slots: Dict[str, Any], context=None) -> AgentResponse:
         """Create personalized combo based on flight using dynamic generator"""
         destination = flight["to_city"]
         
         # Generate combo động dựa trên chuyến bay
-        combo = combo_generator.generate_combo(flight, destination)
+        combo = await self.run_blocking(combo_generator.generate_combo, flight, destination)
         
         if combo:
             # Tạo thêm 1-2 combo khác với các option khác nhau
             combos = [combo]
             
             # Combo chỉ có flight + hotel (không transfer)
-            hotels = hotel_generator.generate_hotels(destination, flight.get("date"))
+            hotels = await self.run_blocking(hotel_generator.generate_hotels, destination, flight.get("date"))
             if len(hotels) > 1:
                 alt_hotel = hotels[1] if len(hotels) > 1 else hotels[0]
                 alt_combo = {
@@ -241,9 +277,9 @@ class ComboAgent(BaseAgent):
         
         # Combo Hà Nội - Đà Nẵng
         # get_flights_by_route already imported at top
-        sample_flights = get_flights_by_route("HAN", "DAD", "2025-01-30")
+        sample_flights = await self.run_blocking(get_flights_by_route, "HAN", "DAD", "2025-01-30")
         if sample_flights:
-            combo = combo_generator.generate_combo(sample_flights[0], "DAD")
+            combo = await self.run_blocking(combo_generator.generate_combo, sample_flights[0], "DAD")
             if combo:
                 sample_combos.append(combo)
         
@@ -2,6 +2,9 @@ from typing import Dict, Any
 from .base_agent import BaseAgent
 from models.schemas import AgentRequest, AgentResponse, HotelContext, HotelInfo
 from data.mock_data import hotel_generator
+from utils.logger import get_logger
+
+log = get_logger("agents.hotel_agent")
 
 class HotelAgent(BaseAgent):
     """Agent for hotel booking and management"""
@@ -91,7 +94,7 @@ class HotelAgent(BaseAgent):
                 hotel_infos.append(hotel_info)
             
             context.hotel_context.search_results = hotel_infos
-            print(f"DEBUG: Saved {len(hotel_infos)} hotels to session context")
+            log.debug("Saved %s hotels to session context", len(hotel_infos))
         
         return self.create_response(
             success=True,
@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List, Optional
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain.tools import Tool
 from langchain.schema import BaseMessage
@@ -8,17 +8,30 @@ try:
 except Exception as e:
     print(f"Warning: ChatGoogleGenerativeAI import failed in IntelligentReasoningAgent: {e}")
     ChatGoogleGenerativeAI = None
+import asyncio
 import json
 import os
 
+from utils.llm_cache import llm_cache
+from utils.llm_batcher import create_llm_batcher, llm_batching
+from utils.async_bridge import async_bridge
+from utils.gazetteer import gazetteer
+from utils.logger import get_logger
+from utils.tracing import tracer
+
 try:
     from agents.price_agent import PriceAgent
 except ImportError:
     PriceAgent = None
 
+log = get_logger("agents.intelligent_reasoning_agent")
+
 class IntelligentReasoningAgent:
     """Multi-step reasoning agent with session context and specialized agent routing"""
     
+    DEFAULT_INTENT = '{"primary_intent": "search", "target_agent": "SearchAgent", "ready_for_action": false}'
+    DEFAULT_SYNTHESIS = "Tôi hiểu yêu cầu của bạn về vé VietJet Air. Hãy cho tôi biết thêm thông tin nhé!"
+    
     def __init__(self):
         model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
         if ChatGoogleGenerativeAI and os.getenv("GOOGLE_API_KEY"):
@@ -34,6 +47,15 @@ class IntelligentReasoningAgent:
         else:
             self.llm = None
         
+        # Timeout (giây) cho mỗi bước LLM trong pipeline async
+        self.step_timeout = float(os.getenv("LLM_STEP_TIMEOUT", "8"))
+        
+        # Cache cho các bước extract/reason (câu hỏi lặp lại không cần gọi LLM)
+        self.cache = llm_cache
+        
+        # Gom prompt extract thành llm.abatch khi chạy qua batch runner (/chat/batch)
+        self.extract_batcher = create_llm_batcher(self.llm)
+        
         # Session context storage
         self.session_contexts = {}
     
@@ -42,243 +64,324 @@ class IntelligentReasoningAgent:
         return self._process_internal(user_input, context)
     
     async def process(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Async version with session context"""
-        return self._process_internal(user_input, context)
+        """Async version with session context - không block event loop"""
+        if not self.llm:
+            log.debug("Fallback - No LLM available")
+            return self._fallback_processing(user_input, context)
+        
+        try:
+            # Regex extraction chạy local, dùng làm gợi ý cho bước reasoning song song
+            # và làm kết quả dự phòng khi LLM extraction timeout
+            with tracer.span("nlu.regex_extract"):
+                regex_entities = json.dumps(await async_bridge.run("IntelligentReasoningAgent", self._fallback_extract, user_input, context), ensure_ascii=False)
+            
+            # Step 1 + 2: Extract entities và reason intent đồng thời
+            extracted_info, intent_analysis = await asyncio.gather(
+                self._aextract_entities_with_context(user_input, context, regex_entities),
+                self._areason_conversation_intent(regex_entities, context, user_input)
+            )
+            log.debug("Extracted info: %s", extracted_info)
+            log.debug("Intent analysis: %s", intent_analysis)
+            
+            # Step 3: Route to specialized agent (sync agents => chạy trong thread)
+            with tracer.span("agent.route"):
+                execution_result, parsed_entities, parsed_intent = await async_bridge.run(
+                    "IntelligentReasoningAgent", self._route_to_agent, extracted_info, intent_analysis, context
+                )
+            
+            # Step 4: Synthesize conversation response
+            all_context = self._build_synthesis_context(user_input, context, extracted_info, intent_analysis, execution_result)
+            final_response = await self._asynthesize_conversation_response(all_context)
+            
+            return self._build_result(context, extracted_info, intent_analysis, execution_result, final_response, parsed_entities)
+            
+        except Exception as e:
+            log.debug("Exception in process: %s", e)
+            import traceback
+            traceback.print_exc()
+            return self._fallback_processing(user_input, context)
+    
+    async def process_stream(self, user_input: str, context: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Như process() nhưng phát event ngay khi từng bước xong:
+        step (extract/reason/execute) → token (synthesize, stream từ LLM) → result
+        """
+        if not self.llm:
+            log.debug("Fallback - No LLM available")
+            yield {"event": "result", "result": self._fallback_processing(user_input, context)}
+            return
+        
+        try:
+            with tracer.span("nlu.regex_extract"):
+                regex_entities = json.dumps(await async_bridge.run("IntelligentReasoningAgent", self._fallback_extract, user_input, context), ensure_ascii=False)
+            
+            # Step 1 + 2 chạy song song, bước nào xong trước báo trước
+            steps = {
+                asyncio.ensure_future(self._aextract_entities_with_context(user_input, context, regex_entities)): "extract",
+                asyncio.ensure_future(self._areason_conversation_intent(regex_entities, context, user_input)): "reason"
+            }
+            outputs = {}
+            pending = set(steps)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        outputs[steps[task]] = task.result()
+                        yield {"event": "step", "step": steps[task], "result": outputs[steps[task]]}
+            finally:
+                for task in pending:
+                    task.cancel()
+            extracted_info, intent_analysis = outputs["extract"], outputs["reason"]
+            
+            # Step 3: Route to specialized agent
+            with tracer.span("agent.route"):
+                execution_result, parsed_entities, parsed_intent = await async_bridge.run(
+                    "IntelligentReasoningAgent", self._route_to_agent, extracted_info, intent_analysis, context
+                )
+            yield {"event": "step", "step": "execute", "result": execution_result}
+            
+            # Step 4: Stream từng token của câu trả lời
+            all_context = self._build_synthesis_context(user_input, context, extracted_info, intent_analysis, execution_result)
+            chunks = []
+            async for text in self._astream_synthesis(all_context):
+                chunks.append(text)
+                yield {"event": "token", "text": text}
+            
+            final_response = "".join(chunks)
+            yield {"event": "result", "result": self._build_result(context, extracted_info, intent_analysis, execution_result, final_response, parsed_entities)}
+            
+        except Exception as e:
+            log.debug("Exception in process_stream: %s", e)
+            yield {"event": "result", "result": self._fallback_processing(user_input, context)}
     
     def _process_internal(self, user_input: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
         """Process with conversation flow and agent routing"""
-        print(f"DEBUG: LLM available: {self.llm is not None}")
-        print(f"DEBUG: GOOGLE_API_KEY set: {os.getenv('GOOGLE_API_KEY') is not None}")
+        log.debug("LLM available: %s", self.llm is not None)
+        log.debug("GOOGLE_API_KEY set: %s", os.getenv('GOOGLE_API_KEY') is not None)
         
         if not self.llm:
-            print("DEBUG: Fallback - No LLM available")
+            log.debug("Fallback - No LLM available")
             return self._fallback_processing(user_input, context)
         
         try:
             # Step 1: Extract entities with session context
             extracted_info = self._extract_entities_with_context(user_input, context)
-            print(f"DEBUG: Extracted info: {extracted_info}")
+            log.debug("Extracted info: %s", extracted_info)
             
             # Step 2: Determine conversation intent
             intent_analysis = self._reason_conversation_intent(extracted_info, context, user_input)
-            print(f"DEBUG: Intent analysis: {intent_analysis}")
+            log.debug("Intent analysis: %s", intent_analysis)
             
             # Step 3: Route to specialized agent
-            execution_result = ""
-            parsed_entities = {}
-            parsed_intent = {}
-            
-            try:
-                # Extract JSON from response with extra text
-                def extract_json(text):
-                    text = text.strip()
-                    # Remove markdown wrapper
-                    if '```json' in text:
-                        start = text.find('```json') + 7
-                        end = text.find('```', start)
-                        if end != -1:
-                            text = text[start:end].strip()
-                        else:
-                            text = text[start:].strip()
-                    
-                    # Find JSON object boundaries
-                    start_idx = text.find('{')
-                    if start_idx != -1:
-                        brace_count = 0
-                        for i, char in enumerate(text[start_idx:], start_idx):
-                            if char == '{':
-                                brace_count += 1
-                            elif char == '}':
-                                brace_count -= 1
-                                if brace_count == 0:
-                                    return text[start_idx:i+1]
-                    return text
-                
-                clean_extracted = extract_json(extracted_info)
-                clean_intent = extract_json(intent_analysis)
-                
-                print(f"DEBUG: Clean extracted JSON: {clean_extracted}")
-                print(f"DEBUG: Clean intent JSON: {clean_intent}")
-                
-                parsed_entities = json.loads(clean_extracted)
-                parsed_intent = json.loads(clean_intent)
-                
-                print(f"DEBUG: Parsed entities: {parsed_entities}")
-                print(f"DEBUG: Parsed intent: {parsed_intent}")
-                
-                intent_type = parsed_intent.get('primary_intent', 'search')
-                
-                if intent_type in ['search', 'availability_check']:
-                    execution_result = self._call_search_agent_sync(parsed_entities, context)
-                elif intent_type in ['price_check', 'price_inquiry']:
-                    execution_result = self._call_price_agent_sync(parsed_entities, context)
-                elif intent_type == 'booking':
-                    execution_result = self._call_booking_agent_sync(parsed_entities, context)
-                elif intent_type.startswith('request_') or intent_type.startswith('book_') or intent_type == 'confirm_service_payment':
-                    # Truyền thêm thông tin SMS code từ parsed_intent nếu có
-                    if intent_type == 'confirm_service_payment' and parsed_intent.get('sms_code'):
-                        parsed_entities['sms_code'] = parsed_intent['sms_code']
-                    execution_result = self._call_service_agent_sync(parsed_entities, context, intent_type)
-                    
-            except Exception as e:
-                print(f"DEBUG: Agent routing failed: {e}")
-                print(f"DEBUG: Raw extracted_info: {repr(extracted_info)}")
-                print(f"DEBUG: Raw intent_analysis: {repr(intent_analysis)}")
-                parsed_entities = {}
-                parsed_intent = {}
+            execution_result, parsed_entities, parsed_intent = self._route_to_agent(extracted_info, intent_analysis, context)
             
             # Step 4: Synthesize conversation response
-            all_context = f"""
-            Current Input: {user_input}
-            Session Context: {json.dumps(context or {}, ensure_ascii=False)}
-            Extracted Information: {extracted_info}
-            Intent Analysis: {intent_analysis}
-            Agent Result: {execution_result}
-            """
-            
+            all_context = self._build_synthesis_context(user_input, context, extracted_info, intent_analysis, execution_result)
             final_response = self._synthesize_conversation_response(all_context)
             
             # Step 5: Update session context  
-            updated_context = self._update_session_context(context, parsed_entities, execution_result)
-            
-            return {
-                "success": True,
-                "response": final_response,
-                "reasoning_steps": [
-                    {"step": "extract", "result": extracted_info},
-                    {"step": "reason", "result": intent_analysis},
-                    {"step": "execute", "result": execution_result},
-                    {"step": "synthesize", "result": final_response}
-                ],
-                "extracted_info": updated_context
-            }
+            return self._build_result(context, extracted_info, intent_analysis, execution_result, final_response, parsed_entities)
             
         except Exception as e:
-            print(f"DEBUG: Exception in _process_internal: {e}")
+            log.debug("Exception in _process_internal: %s", e)
             import traceback
             traceback.print_exc()
             return self._fallback_processing(user_input, context)
     
+    def _extract_json(self, text: str) -> str:
+        """Extract JSON from response with extra text"""
+        text = text.strip()
+        # Remove markdown wrapper
+        if '```json' in text:
+            start = text.find('```json') + 7
+            end = text.find('```', start)
+            if end != -1:
+                text = text[start:end].strip()
+            else:
+                text = text[start:].strip()
+        
+        # Find JSON object boundaries
+        start_idx = text.find('{')
+        if start_idx != -1:
+            brace_count = 0
+            for i, char in enumerate(text[start_idx:], start_idx):
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0:
+                        return text[start_idx:i+1]
+        return text
+    
+    def _route_to_agent(self, extracted_info: str, intent_analysis: str, context: Dict[str, Any] = None) -> tuple:
+        """Parse kết quả extract/reason và route đến agent chuyên biệt"""
+        execution_result = ""
+        parsed_entities = {}
+        parsed_intent = {}
+        
+        try:
+            clean_extracted = self._extract_json(extracted_info)
+            clean_intent = self._extract_json(intent_analysis)
+            
+            log.debug("Clean extracted JSON: %s", clean_extracted)
+            log.debug("Clean intent JSON: %s", clean_intent)
+            
+            parsed_entities = json.loads(clean_extracted)
+            parsed_intent = json.loads(clean_intent)
+            
+            log.debug("Parsed entities: %s", parsed_entities)
+            log.debug("Parsed intent: %s", parsed_intent)
+            
+            intent_type = parsed_intent.get('primary_intent', 'search')
+            tracer.annotate(intent=intent_type)
+            
+            if intent_type in ['search', 'availability_check']:
+                execution_result = self._call_search_agent_sync(parsed_entities, context)
+            elif intent_type in ['price_check', 'price_inquiry']:
+                execution_result = self._call_price_agent_sync(parsed_entities, context)
+            elif intent_type == 'booking':
+                execution_result = self._call_booking_agent_sync(parsed_entities, context)
+            elif intent_type.startswith('request_') or intent_type.startswith('book_') or intent_type == 'confirm_service_payment':
+                # Truyền thêm thông tin SMS code từ parsed_intent nếu có
+                if intent_type == 'confirm_service_payment' and parsed_intent.get('sms_code'):
+                    parsed_entities['sms_code'] = parsed_intent['sms_code']
+                execution_result = self._call_service_agent_sync(parsed_entities, context, intent_type)
+                
+        except Exception as e:
+            log.debug("Agent routing failed: %s", e)
+            log.debug("Raw extracted_info: %s", repr(extracted_info))
+            log.debug("Raw intent_analysis: %s", repr(intent_analysis))
+            parsed_entities = {}
+            parsed_intent = {}
+        
+        return execution_result, parsed_entities, parsed_intent
+    
+    def _build_synthesis_context(self, user_input: str, context: Dict[str, Any], extracted_info: str,
+                                 intent_analysis: str, execution_result: str) -> str:
+        """Gom toàn bộ dữ liệu cho bước synthesize"""
+        return f"""
+            Current Input: {user_input}
+            Session Context: {json.dumps(context or {}, ensure_ascii=False)}
+            Extracted Information: {extracted_info}
+            Intent Analysis: {intent_analysis}
+            Agent Result: {execution_result}
+            """
+    
+    def _build_result(self, context: Dict[str, Any], extracted_info: str, intent_analysis: str,
+                      execution_result: str, final_response: str, parsed_entities: Dict[str, Any]) -> Dict[str, Any]:
+        """Tạo kết quả cuối cùng và cập nhật session context"""
+        updated_context = self._update_session_context(context, parsed_entities, execution_result)
+        
+        return {
+            "success": True,
+            "response": final_response,
+            "reasoning_steps": [
+                {"step": "extract", "result": extracted_info},
+                {"step": "reason", "result": intent_analysis},
+                {"step": "execute", "result": execution_result},
+                {"step": "synthesize", "result": final_response}
+            ],
+            "extracted_info": updated_context
+        }
+    
+    async def _ainvoke(self, prompt: str, step: str) -> str:
+        """Gọi LLM async với timeout cho từng bước"""
+        if step == "extract" and self.extract_batcher and llm_batching.get():
+            call = self.extract_batcher.ainvoke(prompt)
+        else:
+            call = self.llm.ainvoke(prompt)
+        response = await asyncio.wait_for(call, timeout=self.step_timeout)
+        self._annotate_usage(response)
+        return response.content if hasattr(response, 'content') else str(response)
+    
+    @staticmethod
+    def _annotate_usage(message):
+        """Ghi token count (usage_metadata của LangChain) vào span hiện tại"""
+        usage = getattr(message, 'usage_metadata', None)
+        if usage:
+            tracer.annotate(
+                input_tokens=usage.get("input_tokens"),
+                output_tokens=usage.get("output_tokens"),
+                total_tokens=usage.get("total_tokens")
+            )
+    
     def _extract_entities_with_context(self, input_text: str, context: Dict[str, Any] = None) -> str:
         """Extract entities with session context awareness"""
-        # Fallback extraction linh hoạt với context awareness
-        def fallback_extract(text, ctx=None):
-            import re
-            
-            # Lấy thông tin từ context trước
-            existing_locations = (ctx or {}).get('locations', {}) if ctx else {}
-            existing_time = (ctx or {}).get('time', {}) if ctx else {}
-            
-            # Extract locations linh hoạt
-            from_city = existing_locations.get('from', '')
-            to_city = existing_locations.get('to', '')
-            
-            # Mở rộng patterns nhận diện địa điểm
-            location_patterns = [
-                r"từ\s+([^\sđ]+)\s+đến\s+([^\s]+)",  # từ X đến Y
-                r"bay\s+từ\s+([^\sđ]+)\s+đến\s+([^\s]+)",  # bay từ X đến Y
-                r"([^\s]+)\s+đến\s+([^\s]+)",  # X đến Y
-                r"đi\s+([^\s]+)",  # đi X (chỉ có điểm đến)
-            ]
-            
-            for pattern in location_patterns:
-                match = re.search(pattern, text.lower())
-                if match:
-                    try:
-                        if len(match.groups()) == 2:
-                            from_raw, to_raw = match.groups()
-                            normalized_from = self._normalize_city(from_raw.strip()) if hasattr(self, '_normalize_city') else from_raw.strip().title()
-                            normalized_to = self._normalize_city(to_raw.strip()) if hasattr(self, '_normalize_city') else to_raw.strip().title()
-                            from_city = normalized_from or from_city
-                            to_city = normalized_to or to_city
-                        else:  # chỉ có điểm đến
-                            to_raw = match.group(1)
-                            normalized_to = self._normalize_city(to_raw.strip()) if hasattr(self, '_normalize_city') else to_raw.strip().title()
-                            to_city = normalized_to or to_city
-                    except (AttributeError, IndexError) as e:
-                        print(f"DEBUG: Location extraction error: {e}")
-                        continue
-                    break
-            
-            # Extract date linh hoạt
-            date = existing_time.get('date', '')
-            time_preference = existing_time.get('time_preference', '')
-            
-            # Mở rộng patterns thời gian
-            time_patterns = {
-                r"hôm nay|today": "hôm nay",
-                r"ngày mai|tomorrow": "ngày mai",
-                r"tuần sau|next week": "tuần sau",
-                r"tháng sau|next month": "tháng sau",
-                r"\d{1,2}/\d{1,2}/\d{4}": None,  # sẽ extract exact date
-                r"sáng|morning": "sáng",
-                r"chiều|afternoon": "chiều",
-                r"tối|evening": "tối"
-            }
-            
-            text_lower = text.lower()
-            for pattern, value in time_patterns.items():
-                if re.search(pattern, text_lower):
-                    if value:
-                        if pattern in [r"sáng|morning", r"chiều|afternoon", r"tối|evening"]:
-                            time_preference = value
-                        else:
-                            date = value
-                    else:  # exact date
-                        date_match = re.search(pattern, text)
-                        if date_match:
-                            date = date_match.group()
-            
-            # Extract preferences linh hoạt
-            price_patterns = {
-                r"rẻ nhất|cheapest|giá rẻ": "cheapest",
-                r"đắt nhất|expensive|cao cấp": "expensive",
-                r"trung bình|medium": "medium"
-            }
-            
-            price_range = ""
-            for pattern, value in price_patterns.items():
-                if re.search(pattern, text_lower):
-                    price_range = value
-                    break
-            
-            # Extract passengers safely
-            passengers = 1
-            try:
-                passenger_match = re.search(r"(\d+)\s*người|for\s*(\d+)", text_lower)
-                if passenger_match:
-                    passenger_num = passenger_match.group(1) or passenger_match.group(2)
-                    if passenger_num and passenger_num.isdigit():
-                        passengers = max(1, min(int(passenger_num), 10))  # giới hạn 1-10
-            except (ValueError, AttributeError) as e:
-                print(f"DEBUG: Passenger extraction error: {e}")
-                passengers = 1
-            
-            # Extract intent signals linh hoạt
-            intent_keywords = {
-                "search": ["tìm", "search", "có", "kiểm tra", "xem", "hiện thị", "cho tôi xem"],
-                "booking": ["đặt vé", "đặt chỗ", "book", "mua vé", "order"],
-                "price": ["giá", "price", "cost", "bao nhiêu"],
-                "info": ["thông tin", "info", "chi tiết", "detail"]
-            }
-            
-            intent_signals = []
-            for intent_type, keywords in intent_keywords.items():
-                if any(keyword in text_lower for keyword in keywords):
-                    intent_signals.append(intent_type)
-            
-            return {
-                "locations": {"from": from_city, "to": to_city},
-                "time": {"date": date, "time_preference": time_preference},
-                "passengers": passengers,
-                "preferences": {"price_range": price_range},
-                "intent_signals": intent_signals,
-                "conversation_type": "search"
-            }
+        if not self.llm:
+            return json.dumps(self._fallback_extract(input_text, context), ensure_ascii=False)
+        
+        cache_key = self.cache.make_key("extract", input_text, self._extraction_cache_slots(context))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_extraction_prompt(input_text, context)
         
+        try:
+            response = self.llm.invoke(prompt)
+            # Validate response is valid JSON
+            if hasattr(response, 'content'):
+                test_parse = json.loads(response.content)
+                self.cache.set(cache_key, response.content)
+                return response.content
+            else:
+                # Handle different response formats
+                content = str(response)
+                test_parse = json.loads(content)
+                self.cache.set(cache_key, content)
+                return content
+        except Exception as e:
+            log.debug("LLM extraction failed: %s", e)
+            # Fallback to regex extraction
+            return json.dumps(self._fallback_extract(input_text, context), ensure_ascii=False)
+    
+    @tracer.traced("llm.extract")
+    async def _aextract_entities_with_context(self, input_text: str, context: Dict[str, Any] = None,
+                                              fallback: str = None) -> str:
+        """Async extraction - timeout hoặc lỗi thì dùng kết quả regex"""
+        if fallback is None:
+            fallback = json.dumps(self._fallback_extract(input_text, context), ensure_ascii=False)
         if not self.llm:
-            return json.dumps(fallback_extract(input_text, context), ensure_ascii=False)
+            return fallback
         
+        cache_key = self.cache.make_key("extract", input_text, self._extraction_cache_slots(context))
+        cached = self.cache.get(cache_key)
+        tracer.annotate(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        
+        try:
+            content = await self._ainvoke(self._build_extraction_prompt(input_text, context), "extract")
+            json.loads(content)  # Validate response is valid JSON
+            self.cache.set(cache_key, content)
+            return content
+        except asyncio.TimeoutError:
+            log.debug("LLM extraction timed out after %ss, using regex path", self.step_timeout)
+            return fallback
+        except Exception as e:
+            log.debug("LLM extraction failed: %s", e)
+            return fallback
+    
+    def _extraction_cache_slots(self, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Các context slot ảnh hưởng đến kết quả trích xuất"""
+        ctx = context or {}
+        return {key: ctx.get(key) for key in ('locations', 'time', 'passengers', 'preferences')}
+    
+    def _intent_cache_slots(self, extracted_info: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Các context slot ảnh hưởng đến kết quả phân tích intent"""
+        ctx = context or {}
+        try:
+            entities = json.loads(self._extract_json(extracted_info))
+        except (ValueError, TypeError):
+            entities = extracted_info
+        return {
+            "entities": entities,
+            "locations": ctx.get('locations'),
+            "has_search_result": bool(ctx.get('last_search_result')),
+            "has_completed_booking": bool(ctx.get('completed_booking')),
+            "current_destination": ctx.get('current_destination')
+        }
+    
+    def _build_extraction_prompt(self, input_text: str, context: Dict[str, Any] = None) -> str:
         context_info = json.dumps(context or {}, ensure_ascii=False)
         
         prompt = f"""
@@ -312,56 +415,185 @@ class IntelligentReasoningAgent:
         LƯU Ý: Chỉ điền thông tin nếu thực sự có trong câu hoặc context. Để trống nếu không có.
         """
         
+        return prompt
+    
+    def _fallback_extract(self, text: str, ctx: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Regex extraction dự phòng khi không có LLM hoặc LLM lỗi/timeout"""
+        import re
+        
+        # Lấy thông tin từ context trước
+        existing_locations = (ctx or {}).get('locations', {}) if ctx else {}
+        existing_time = (ctx or {}).get('time', {}) if ctx else {}
+        
+        # Extract locations linh hoạt
+        from_city = existing_locations.get('from', '')
+        to_city = existing_locations.get('to', '')
+        
+        # Mở rộng patterns nhận diện địa điểm
+        location_patterns = [
+            r"từ\s+([^\sđ]+)\s+đến\s+([^\s]+)",  # từ X đến Y
+            r"bay\s+từ\s+([^\sđ]+)\s+đến\s+([^\s]+)",  # bay từ X đến Y
+            r"([^\s]+)\s+đến\s+([^\s]+)",  # X đến Y
+            r"đi\s+([^\s]+)",  # đi X (chỉ có điểm đến)
+        ]
+        
+        for pattern in location_patterns:
+            match = re.search(pattern, text.lower())
+            if match:
+                try:
+                    if len(match.groups()) == 2:
+                        from_raw, to_raw = match.groups()
+                        normalized_from = self._normalize_city(from_raw.strip()) if hasattr(self, '_normalize_city') else from_raw.strip().title()
+                        normalized_to = self._normalize_city(to_raw.strip()) if hasattr(self, '_normalize_city') else to_raw.strip().title()
+                        from_city = normalized_from or from_city
+                        to_city = normalized_to or to_city
+                    else:  # chỉ có điểm đến
+                        to_raw = match.group(1)
+                        normalized_to = self._normalize_city(to_raw.strip()) if hasattr(self, '_normalize_city') else to_raw.strip().title()
+                        to_city = normalized_to or to_city
+                except (AttributeError, IndexError) as e:
+                    log.debug("Location extraction error: %s", e)
+                    continue
+                break
+        
+        # Extract date linh hoạt
+        date = existing_time.get('date', '')
+        time_preference = existing_time.get('time_preference', '')
+        
+        # Mở rộng patterns thời gian
+        time_patterns = {
+            r"hôm nay|today": "hôm nay",
+            r"ngày mai|tomorrow": "ngày mai",
+            r"tuần sau|next week": "tuần sau",
+            r"tháng sau|next month": "tháng sau",
+            r"\d{1,2}/\d{1,2}/\d{4}": None,  # sẽ extract exact date
+            r"sáng|morning": "sáng",
+            r"chiều|afternoon": "chiều",
+            r"tối|evening": "tối"
+        }
+        
+        text_lower = text.lower()
+        for pattern, value in time_patterns.items():
+            if re.search(pattern, text_lower):
+                if value:
+                    if pattern in [r"sáng|morning", r"chiều|afternoon", r"tối|evening"]:
+                        time_preference = value
+                    else:
+                        date = value
+                else:  # exact date
+                    date_match = re.search(pattern, text)
+                    if date_match:
+                        date = date_match.group()
+        
+        # Extract preferences linh hoạt
+        price_patterns = {
+            r"rẻ nhất|cheapest|giá rẻ": "cheapest",
+            r"đắt nhất|expensive|cao cấp": "expensive",
+            r"trung bình|medium": "medium"
+        }
+        
+        price_range = ""
+        for pattern, value in price_patterns.items():
+            if re.search(pattern, text_lower):
+                price_range = value
+                break
+        
+        # Extract passengers safely
+        passengers = 1
         try:
-            response = self.llm.invoke(prompt)
-            # Validate response is valid JSON
-            if hasattr(response, 'content'):
-                test_parse = json.loads(response.content)
-                return response.content
-            else:
-                # Handle different response formats
-                content = str(response)
-                test_parse = json.loads(content)
-                return content
-        except Exception as e:
-            print(f"DEBUG: LLM extraction failed: {e}")
-            # Fallback to regex extraction
-            return json.dumps(fallback_extract(input_text, context), ensure_ascii=False)
+            passenger_match = re.search(r"(\d+)\s*người|for\s*(\d+)", text_lower)
+            if passenger_match:
+                passenger_num = passenger_match.group(1) or passenger_match.group(2)
+                if passenger_num and passenger_num.isdigit():
+                    passengers = max(1, min(int(passenger_num), 10))  # giới hạn 1-10
+        except (ValueError, AttributeError) as e:
+            log.debug("Passenger extraction error: %s", e)
+            passengers = 1
+        
+        # Extract intent signals linh hoạt
+        intent_keywords = {
+            "search": ["tìm", "search", "có", "kiểm tra", "xem", "hiện thị", "cho tôi xem"],
+            "booking": ["đặt vé", "đặt chỗ", "book", "mua vé", "order"],
+            "price": ["giá", "price", "cost", "bao nhiêu"],
+            "info": ["thông tin", "info", "chi tiết", "detail"]
+        }
+        
+        intent_signals = []
+        for intent_type, keywords in intent_keywords.items():
+            if any(keyword in text_lower for keyword in keywords):
+                intent_signals.append(intent_type)
+        
+        return {
+            "locations": {"from": from_city, "to": to_city},
+            "time": {"date": date, "time_preference": time_preference},
+            "passengers": passengers,
+            "preferences": {"price_range": price_range},
+            "intent_signals": intent_signals,
+            "conversation_type": "search"
+        }
     
     def _normalize_city(self, city_raw: str) -> str:
-        """Chuẩn hóa tên thành phố linh hoạt"""
+        """Chuẩn hóa tên thành phố linh hoạt (gazetteer dùng chung)"""
         if not city_raw:
             return ""
-            
-        city_map = {
-            # HCM variants
-            "hcm": "Ho Chi Minh City", "tphcm": "Ho Chi Minh City", 
-            "sài gòn": "Ho Chi Minh City", "saigon": "Ho Chi Minh City",
-            "tp.hcm": "Ho Chi Minh City", "ho chi minh": "Ho Chi Minh City",
-            
-            # Hanoi variants  
-            "hn": "Hanoi", "hanoi": "Hanoi", "hà nội": "Hanoi",
-            "ha noi": "Hanoi", "thủ đô": "Hanoi",
-            
-            # Da Nang variants
-            "dn": "Da Nang", "đà nẵng": "Da Nang", "da nang": "Da Nang",
-            "danang": "Da Nang",
-            
-            # Other cities
-            "nha trang": "Nha Trang", "nt": "Nha Trang",
-            "đà lạt": "Da Lat", "dalat": "Da Lat",
-            "phú quốc": "Phu Quoc", "phu quoc": "Phu Quoc",
-            "cần thơ": "Can Tho", "can tho": "Can Tho"
-        }
         
-        city_lower = city_raw.lower().strip()
-        return city_map.get(city_lower, city_raw.title())
+        return gazetteer.to_city(city_raw, city_raw.strip().title())
     
     def _reason_conversation_intent(self, extracted_info: str, context: Dict[str, Any] = None, user_input: str = "") -> str:
         """Determine conversation intent for agent routing"""
         if not self.llm:
             return '{"primary_intent": "search", "ready_for_action": false}'
         
+        rule_intent = self._rule_based_intent(context, user_input)
+        if rule_intent:
+            return rule_intent
+        
+        cache_key = self.cache.make_key("reason", user_input, self._intent_cache_slots(extracted_info, context))
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = self._build_intent_prompt(extracted_info, context, user_input)
+        
+        try:
+            response = self.llm.invoke(prompt)
+            content = response.content if hasattr(response, 'content') else str(response)
+            self.cache.set(cache_key, content)
+            return content
+        except Exception as e:
+            log.debug("Intent analysis failed: %s", e)
+            return self.DEFAULT_INTENT
+    
+    @tracer.traced("llm.reason")
+    async def _areason_conversation_intent(self, extracted_info: str, context: Dict[str, Any] = None, user_input: str = "") -> str:
+        """Async intent reasoning - timeout hoặc lỗi thì về intent mặc định"""
+        if not self.llm:
+            return '{"primary_intent": "search", "ready_for_action": false}'
+        
+        rule_intent = self._rule_based_intent(context, user_input)
+        if rule_intent:
+            tracer.annotate(rule_based=True)
+            return rule_intent
+        
+        cache_key = self.cache.make_key("reason", user_input, self._intent_cache_slots(extracted_info, context))
+        cached = self.cache.get(cache_key)
+        tracer.annotate(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        
+        try:
+            content = await self._ainvoke(self._build_intent_prompt(extracted_info, context, user_input), "reason")
+            self.cache.set(cache_key, content)
+            return content
+        except asyncio.TimeoutError:
+            log.debug("Intent analysis timed out after %ss", self.step_timeout)
+            return self.DEFAULT_INTENT
+        except Exception as e:
+            log.debug("Intent analysis failed: %s", e)
+            return self.DEFAULT_INTENT
+    
+    def _rule_based_intent(self, context: Dict[str, Any] = None, user_input: str = "") -> Optional[str]:
+        """Intent xác định bằng rule (SMS code, dịch vụ SOVICO) - không cần gọi LLM"""
         # Kiểm tra linh hoạt về dịch vụ dựa trên context
         user_lower = user_input.lower()
         
@@ -427,6 +659,9 @@ class IntelligentReasoningAgent:
                         "is_booking": is_booking
                     }, ensure_ascii=False)
         
+        return None
+    
+    def _build_intent_prompt(self, extracted_info: str, context: Dict[str, Any] = None, user_input: str = "") -> str:
         context_info = json.dumps(context or {}, ensure_ascii=False)
         
         prompt = f"""
@@ -457,15 +692,7 @@ class IntelligentReasoningAgent:
         }}
         """
         
-        try:
-            response = self.llm.invoke(prompt)
-            if hasattr(response, 'content'):
-                return response.content
-            else:
-                return str(response)
-        except Exception as e:
-            print(f"DEBUG: Intent analysis failed: {e}")
-            return '{"primary_intent": "search", "target_agent": "SearchAgent", "ready_for_action": false}'
+        return prompt
     
     def _call_search_agent_sync(self, entities: Dict[str, Any], context: Dict[str, Any] = None) -> str:
         """Route to SearchAgent"""
@@ -643,7 +870,7 @@ class IntelligentReasoningAgent:
                                     if city_key in data_lower:
                                         return city_name
                         except Exception as e:
-                            print(f"DEBUG: Error in find_destination_in_data: {e}")
+                            log.debug("Error in find_destination_in_data: %s", e)
                         return None
                     
                     destination = find_destination_in_data(context) or destination
@@ -993,6 +1220,60 @@ class IntelligentReasoningAgent:
         if not self.llm:
             return "Đã xử lý yêu cầu của bạn."
         
+        prompt = self._build_synthesis_prompt(all_info)
+        
+        try:
+            response = self.llm.invoke(prompt)
+            return response.content
+        except:
+            return self.DEFAULT_SYNTHESIS
+    
+    @tracer.traced("llm.synthesize")
+    async def _asynthesize_conversation_response(self, all_info: str) -> str:
+        """Async synthesize với timeout"""
+        if not self.llm:
+            return "Đã xử lý yêu cầu của bạn."
+        
+        try:
+            return await self._ainvoke(self._build_synthesis_prompt(all_info), "synthesize")
+        except asyncio.TimeoutError:
+            log.debug("Synthesis timed out after %ss", self.step_timeout)
+            return self.DEFAULT_SYNTHESIS
+        except Exception:
+            return self.DEFAULT_SYNTHESIS
+    
+    async def _astream_synthesis(self, all_info: str) -> AsyncIterator[str]:
+        """Stream câu trả lời qua llm.astream - timeout tính cho từng chunk, lỗi trước chunk đầu => DEFAULT_SYNTHESIS"""
+        streamed = False
+        with tracer.span("llm.synthesize", stream=True) as span:
+            stream = self.llm.astream(self._build_synthesis_prompt(all_info))
+            chunks = 0
+            try:
+                while True:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=self.step_timeout)
+                    # Chunk cuối thường mang usage_metadata
+                    self._annotate_usage(chunk)
+                    text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    if text:
+                        if not streamed:
+                            span.set(first_token_ms=span.duration_ms)
+                        streamed = True
+                        chunks += 1
+                        yield text
+            except StopAsyncIteration:
+                pass
+            except asyncio.TimeoutError:
+                log.debug("Synthesis stream timed out after %ss", self.step_timeout)
+            except Exception as e:
+                log.debug("Synthesis stream failed: %s", e)
+            finally:
+                await stream.aclose()
+            span.set(chunks=chunks)
+        
+        if not streamed:
+            yield self.DEFAULT_SYNTHESIS
+    
+    def _build_synthesis_prompt(self, all_info: str) -> str:
         from datetime import datetime
         current_date = datetime.now().strftime("%A, %d/%m/%Y")
         
@@ -1045,11 +1326,7 @@ class IntelligentReasoningAgent:
         BẮT ĐẦU PHÂN TÍCH VÀ TRẢ LỜI:
         """
         
-        try:
-            response = self.llm.invoke(prompt)
-            return response.content
-        except:
-            return "Tôi hiểu yêu cầu của bạn về vé VietJet Air. Hãy cho tôi biết thêm thông tin nhé!"
+        return prompt
     
     def _update_session_context(self, context: Dict[str, Any], entities: Dict[str, Any], execution_result: str) -> Dict[str, Any]:
         """Update session context for conversation continuity"""
@@ -1,6 +1,8 @@
 from typing import Dict, Any
 from datetime import datetime
 from utils.nlu import SimpleNLU
+from utils.tracing import tracer
+from utils.shared_state import shared_state
 from models.schemas import ConversationContext, AgentRequest
 from .search_agent import SearchAgent
 try:
@@ -22,8 +24,8 @@ class BookingOrchestrator:
             "booking": BookingAgent(),
             "combo": ComboAgent()
         }
-        # In-memory context storage (sẽ thay bằng Redis)
-        self.contexts = {}
+        # Context dùng chung giữa các worker (STATE_BACKEND: memory | sqlite:///... | redis://...)
+        self.contexts = shared_state("orchestrator_contexts", ttl=24 * 3600)
     
     async def process_message(self, user_id: str, message: str) -> Dict[str, Any]:
         """Process user message and return response"""
@@ -32,7 +34,9 @@ class BookingOrchestrator:
         context = self._load_context(user_id)
         
         # 2. NLU processing
-        intent, slots = self.nlu.process(message, context.slots)
+        with tracer.span("nlu") as span:
+            intent, slots = self.nlu.process(message, context.slots)
+            span.set(intent=intent)
         
         # 3. Update context
         context.intent = intent
@@ -51,7 +55,9 @@ class BookingOrchestrator:
         )
         
         # 6. Process with agent
-        agent_response = await agent.process(agent_request)
+        with tracer.span(f"agent.{agent_name}") as span:
+            agent_response = await agent.process(agent_request)
+            span.set(success=agent_response.success)
         
         # 7. Update context with results
         if agent_response.success:
@@ -61,10 +67,11 @@ class BookingOrchestrator:
         self._save_context(context)
         
         # 9. Generate natural language response
-        response_text = self._generate_vietnamese_response(intent, agent_response, slots)
-        
-        # 10. Generate suggestions
-        suggestions = self._generate_suggestions(intent, agent_response, context)
+        with tracer.span("render"):
+            response_text = self._generate_vietnamese_response(intent, agent_response, slots)
+            
+            # 10. Generate suggestions
+            suggestions = self._generate_suggestions(intent, agent_response, context)
         
         return {
             "response": response_text,
@@ -77,14 +84,15 @@ class BookingOrchestrator:
     
     def _load_context(self, user_id: str) -> ConversationContext:
         """Load user context from storage"""
-        if user_id in self.contexts:
-            return self.contexts[user_id]
+        data = self.contexts.get(user_id)
+        if data is not None:
+            return ConversationContext(**data)
         else:
             return ConversationContext(user_id=user_id)
     
     def _save_context(self, context: ConversationContext):
         """Save context to storage"""
-        self.contexts[context.user_id] = context
+        self.contexts.set(context.user_id, context.dict())
     
     def _select_agent(self, intent: str) -> str:
         """Select appropriate agent based on intent"""
@@ -6,6 +6,10 @@ from typing import Dict, Any, List
 from datetime import datetime, timedelta
 import uuid
 import json
+from utils.shared_state import shared_state
+from data.seat_inventory import seat_inventory
+
+PAYMENT_SESSION_TTL = 15 * 60  # 15 phút để thanh toán
 
 class PaymentAgent:
     """Agent xử lý thanh toán"""
@@ -13,6 +17,8 @@ class PaymentAgent:
     def __init__(self):
         self.name = "PaymentAgent"
         self.supported_methods = ["momo", "zalopay", "vnpay", "banking", "visa", "mastercard"]
+        # Payment session dùng chung giữa các worker - confirm có thể tới worker khác với process
+        self.sessions = shared_state("payment_sessions", ttl=PAYMENT_SESSION_TTL)
         
     def process_payment(self, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         """Xử lý thanh toán cho booking"""
@@ -50,12 +56,27 @@ class PaymentAgent:
                 "error": f"Phương thức thanh toán {payment_method} không được hỗ trợ"
             }
         
+        # Hold ghế hết hạn cùng payment session => không thu tiền cho ghế đã trả lại
+        payment_session = self.sessions.get(session_id)
+        seat_hold_id = payment_session["booking_data"].get("seat_hold_id") if payment_session else None
+        if seat_hold_id and not seat_inventory.is_active(seat_hold_id):
+            return {
+                "success": False,
+                "error": "Hết thời gian giữ chỗ. Vui lòng đặt lại.",
+                "payment_status": "expired"
+            }
+        
         # Process payment based on method
         payment_result = self._process_payment_method(payment_method, payment_details)
         
         if payment_result["success"]:
+            if seat_hold_id:
+                seat_inventory.confirm(seat_hold_id)
             # Tạo booking confirmation
             booking_confirmation = self._create_booking_confirmation(session_id, payment_result)
+            payment_session = self.sessions.pop(session_id)
+            if payment_session:
+                booking_confirmation["booking_reference"] = payment_session["booking_ref"]
             
             return {
                 "success": True,
@@ -94,15 +115,20 @@ class PaymentAgent:
         """Tạo payment session"""
         session_id = str(uuid.uuid4())
         booking_ref = f"SOVICO{datetime.now().strftime('%Y%m%d')}{session_id[:6].upper()}"
-        expires_at = datetime.now() + timedelta(minutes=15)  # 15 phút để thanh toán
+        expires_at = datetime.now() + timedelta(seconds=PAYMENT_SESSION_TTL)
         
-        return {
+        payment_session = {
             "session_id": session_id,
             "booking_ref": booking_ref,
             "expires_at": expires_at.isoformat(),
             "booking_data": booking_data,
             "created_at": datetime.now().isoformat()
         }
+        self.sessions.set(session_id, payment_session)
+        # Ghế được giữ đúng bằng thời hạn thanh toán
+        if booking_data.get("seat_hold_id"):
+            seat_inventory.extend(booking_data["seat_hold_id"], PAYMENT_SESSION_TTL)
+        return payment_session
     
     def _calculate_costs(self, booking_data: Dict) -> Dict[str, Any]:
         """Tính toán chi phí"""
@@ -2,7 +2,9 @@ from typing import Dict, Any
 from langchain_google_genai import ChatGoogleGenerativeAI
 from .base_agent import BaseAgent
 from models.schemas import AgentRequest, AgentResponse
-from data.mock_data_loader import get_cheapest_flight, get_flights_by_route
+from data.mock_data_loader import get_cheapest_flight, get_flights_by_route, get_mock_data_loader
+from data.fare_engine import get_fare_engine
+from datetime import datetime, timedelta
 import json
 import os
 from dotenv import load_dotenv
@@ -30,10 +32,10 @@ class PriceAgent(BaseAgent):
         
         try:
             # Step 1: Extract price-related entities
-            extracted_info = self._extract_price_entities(user_input)
+            extracted_info = await self.run_blocking(self._extract_price_entities, user_input)
             
             # Step 2: Reason about price intent
-            intent_analysis = self._reason_price_intent(extracted_info)
+            intent_analysis = await self.run_blocking(self._reason_price_intent, extracted_info)
             
             # Step 3: Execute price search
             price_result = await self._search_prices(extracted_info)
@@ -46,7 +48,7 @@ class PriceAgent(BaseAgent):
             Price Result: {price_result}
             """
             
-            final_response = self._synthesize_price_response(all_context)
+            final_response = await self.run_blocking(self._synthesize_price_response, all_context)
             
             return self.create_response(
                 success=True,
@@ -69,7 +71,8 @@ class PriceAgent(BaseAgent):
         Trả về JSON với các fields:
         - locations: {{from: "", to: ""}}
         - time: {{date: "", flexible: true/false}}
-        - price_intent: "check_price"/"compare_prices"/"find_cheapest"/"price_range"
+        - price_intent: "check_price"/"compare_prices"/"find_cheapest"/"price_range"/"fare_calendar"
+          (fare_calendar: hỏi ngày nào rẻ nhất trong một khoảng thời gian, VD "ngày nào rẻ nhất tháng sau")
         - budget: {{max_price: "", preferred_range: ""}}
         - passengers: số người
         - intent_signals: [list các từ/cụm từ chỉ ý định về giá]
@@ -112,8 +115,26 @@ class PriceAgent(BaseAgent):
         except:
             return '{"primary_intent": "check_price", "confidence": 0.5}'
     
+    async def search_prices(self, from_city: str, to_city: str, date: str, date_text: str = "",
+                            price_intent: str = "check_price") -> Dict[str, Any]:
+        """Tra giá không qua LLM (slot đã có sẵn, VD từ fast path) - kết quả giống bước search của process()
+
+        date_text là cụm ngày gốc ("tuần sau", "tháng này"...): nếu là một khoảng ngày thì tra cả khoảng.
+        """
+        if self._resolve_date_range(date_text):
+            date = date_text
+        criteria = {
+            "locations": {"from": from_city, "to": to_city},
+            "time": {"date": date},
+            "price_intent": price_intent
+        }
+        return json.loads(await self._search_prices(json.dumps(criteria)))
+    
     async def _search_prices(self, search_criteria: str) -> str:
-        """Execute price search"""
+        """Execute price search (FareEngine / loader chạy trong thread pool)"""
+        return await self.run_blocking(self._search_prices_sync, search_criteria)
+    
+    def _search_prices_sync(self, search_criteria: str) -> str:
         try:
             criteria = json.loads(search_criteria)
             
@@ -122,7 +143,14 @@ class PriceAgent(BaseAgent):
             date = criteria.get('time', {}).get('date', '')
             price_intent = criteria.get('price_intent', 'check_price')
             
-            if from_city and to_city:
+            engine = get_fare_engine()
+            date_range = self._resolve_date_range(date)
+            
+            if from_city and to_city and price_intent == 'fare_calendar':
+                return json.dumps(self._search_fare_calendar(from_city, to_city, date, date_range))
+            elif from_city and to_city and engine:
+                return json.dumps(self._search_prices_vectorized(engine, from_city, to_city, date, date_range, price_intent))
+            elif from_city and to_city:
                 if price_intent == 'find_cheapest':
                     cheapest = get_cheapest_flight(from_city, to_city, date)
                     return json.dumps({
@@ -151,6 +179,82 @@ class PriceAgent(BaseAgent):
         except Exception as e:
             return json.dumps({"success": False, "error": str(e)})
     
+    def _search_prices_vectorized(self, engine, from_city: str, to_city: str, date: str,
+                                  date_range: tuple, price_intent: str) -> Dict[str, Any]:
+        """Price search qua FareEngine - một lần gọi cho cả khoảng ngày"""
+        start_date, end_date = date_range or (date, None)
+        
+        if price_intent == 'find_cheapest':
+            if date_range:
+                per_day = engine.cheapest_per_day(from_city, to_city, start_date, end_date)
+                cheapest = min(per_day, key=lambda x: x["price"])["flight"] if per_day else None
+                return {
+                    "success": True,
+                    "type": "cheapest",
+                    "flight": cheapest,
+                    "per_day": [{"date": day["date"], "price": day["price"]} for day in per_day]
+                }
+            top = engine.top_k(from_city, to_city, start_date, k=1)
+            return {
+                "success": True,
+                "type": "cheapest",
+                "flight": top[0] if top else None
+            }
+        
+        flights = engine.top_k(from_city, to_city, start_date, end_date, k=5)
+        histogram = engine.fare_histogram(from_city, to_city, start_date, end_date)
+        return {
+            "success": True,
+            "type": "comparison",
+            "flights": flights,
+            "price_range": {
+                "min": histogram["min"],
+                "max": histogram["max"]
+            },
+            "histogram": histogram
+        }
+    
+    def _search_fare_calendar(self, from_city: str, to_city: str, date: str, date_range: tuple) -> Dict[str, Any]:
+        """Lịch giá theo ngày (mặc định 30 ngày tới nếu không có khoảng ngày)"""
+        if not date_range:
+            today = datetime.now()
+            date_range = (today.strftime("%Y-%m-%d"), (today + timedelta(days=30)).strftime("%Y-%m-%d"))
+        
+        calendar = get_mock_data_loader().get_fare_calendar(from_city, to_city, *date_range)
+        return {
+            "success": True,
+            "type": "calendar",
+            "cheapest_day": calendar["cheapest_day"],
+            "days": calendar["days"]
+        }
+    
+    def _resolve_date_range(self, date: str):
+        """'tuần sau' / 'tuần này' / 'cuối tuần' → (start, end) dạng YYYY-MM-DD, None nếu là một ngày"""
+        text = (date or "").lower().strip()
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        if any(keyword in text for keyword in ["cuối tuần", "weekend"]):
+            saturday = today + timedelta(days=(5 - today.weekday()) % 7)
+            if "sau" in text or "next" in text:
+                saturday += timedelta(days=7)
+            start, end = saturday, saturday + timedelta(days=1)
+        elif any(keyword in text for keyword in ["tuần sau", "tuần tới", "next week"]):
+            start = today + timedelta(days=7 - today.weekday())
+            end = start + timedelta(days=6)
+        elif any(keyword in text for keyword in ["tuần này", "this week", "trong tuần"]):
+            start = today
+            end = today + timedelta(days=6 - today.weekday())
+        elif any(keyword in text for keyword in ["tháng sau", "tháng tới", "next month"]):
+            start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        elif any(keyword in text for keyword in ["tháng này", "this month"]):
+            start = today
+            end = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:
+            return None
+        
+        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    
     def _synthesize_price_response(self, all_info: str) -> str:
         """Synthesize final price response"""
         if not self.llm:
@@ -207,6 +311,8 @@ class PriceAgent(BaseAgent):
         price_intent = "check_price"
         if any(word in text_lower for word in ['so sánh', 'compare']):
             price_intent = "compare_prices"
+        elif any(word in text_lower for word in ['ngày nào rẻ', 'lịch giá', 'which day']):
+            price_intent = "fare_calendar"
         elif any(word in text_lower for word in ['rẻ nhất', 'cheapest']):
             price_intent = "find_cheapest"
         
@@ -1,8 +1,12 @@
 from typing import Dict, Any
 from .base_agent import BaseAgent
 from models.schemas import AgentRequest, AgentResponse
+from utils.gazetteer import gazetteer
+from utils.logger import get_logger
 # Import cũ - sẽ thay thế bằng loader mới trong các function
 
+log = get_logger("agents.search_agent")
+
 class SearchAgent(BaseAgent):
     """Agent for searching flights, hotels, transfers"""
     
@@ -75,11 +79,11 @@ class SearchAgent(BaseAgent):
         
         # Search flights - sử dụng loader mới để đảm bảo dữ liệu nhất quán
         from data.mock_data_loader import get_mock_data_loader
-        loader = get_mock_data_loader()
-        flights = loader.get_flights_by_route_and_date(from_city, to_city, date or "hôm nay")
+        loader = await self.run_blocking(get_mock_data_loader)
+        flights = await self.run_blocking(loader.get_flights_by_route_and_date, from_city, to_city, date or "hôm nay")
         
-        print(f"DEBUG: Search flights - from: {from_city}, to: {to_city}, date: {date}")
-        print(f"DEBUG: Found {len(flights)} flights")
+        log.debug("Search flights - from: %s, to: %s, date: %s", from_city, to_city, date)
+        log.debug("Found %s flights", len(flights))
         
         if not flights:
             return self.create_response(
@@ -91,13 +95,13 @@ class SearchAgent(BaseAgent):
         # Filter by time if specified
         time_filter = slots.get("time")
         if time_filter:
-            # Simple time filtering (within 2 hours)
-            filtered_flights = []
-            for flight in flights:
-                flight_time = flight["time"]
-                # Simple time comparison logic
-                filtered_flights.append(flight)
-            flights = filtered_flights
+            # Chỉ giữ các chuyến trong ±2h quanh giờ mong muốn (gần nhất trước)
+            from data.fare_engine import get_fare_engine, parse_minutes
+            engine = await self.run_blocking(get_fare_engine)
+            if engine and parse_minutes(time_filter) is not None:
+                nearby = await self.run_blocking(engine.flights_near_time, from_city, to_city, date or "hôm nay", time_filter, window_hours=2)
+                if nearby:
+                    flights = nearby
         
         # Update session context với flight search results
         if context and hasattr(context, 'flight_context'):
@@ -132,7 +136,7 @@ class SearchAgent(BaseAgent):
                 flight_infos.append(flight_info)
             
             context.flight_context.search_results = flight_infos
-            print(f"DEBUG: Saved {len(flight_infos)} flights to session context")
+            log.debug("Saved %s flights to session context", len(flight_infos))
         
         return self.create_response(
             success=True,
@@ -146,7 +150,7 @@ class SearchAgent(BaseAgent):
         to_city = self._normalize_city(slots.get("to_city", ""))
         date = self._normalize_date(slots.get("date"))
         
-        print(f"DEBUG: Normalized - from: {from_city}, to: {to_city}, date: {date}")
+        log.debug("Normalized - from: %s, to: %s, date: %s", from_city, to_city, date)
         
         if not from_city or not to_city:
             return self.create_response(
@@ -159,7 +163,7 @@ class SearchAgent(BaseAgent):
         from data.mock_data_loader import get_mock_data_loader
         loader = get_mock_data_loader()
         flights = loader.get_flights_by_route_and_date(from_city, to_city, date or "hôm nay")
-        print(f"DEBUG: Found {len(flights)} flights")
+        log.debug("Found %s flights", len(flights))
         
         if not flights:
             return self.create_response(
@@ -171,9 +175,11 @@ class SearchAgent(BaseAgent):
         # Check if user wants cheapest flight
         user_input = slots.get('user_input', '')
         if 'rẻ nhất' in user_input or 'giá rẻ' in user_input:
-            # Sort by price and return only cheapest
-            flights = sorted(flights, key=lambda x: x['price'])
-            flights = [flights[0]]  # Only cheapest
+            # Only cheapest
+            from data.fare_engine import get_fare_engine
+            engine = get_fare_engine()
+            cheapest = engine.top_k(from_city, to_city, date or "hôm nay", k=1) if engine else []
+            flights = cheapest or [min(flights, key=lambda x: x['price'])]
             message = f"Vé rẻ nhất từ {from_city} đến {to_city} ngày {date}: {flights[0]['airline']} {flights[0]['flight_id']} - {flights[0]['price']:,} VNĐ lúc {flights[0]['time']}"
         else:
             message = f"Tìm thấy {len(flights)} chuyến bay từ {from_city} đến {to_city} ngày {date}"
@@ -185,27 +191,11 @@ class SearchAgent(BaseAgent):
         )
     
     def _normalize_city(self, city: str) -> str:
-        """Normalize city names"""
+        """Normalize city names (gazetteer dùng chung: bỏ dấu, alias, gõ sai)"""
         if not city:
             return ""
         
-        city_lower = city.lower().strip()
-        city_map = {
-            "hồ chí minh": "Ho Chi Minh City",
-            "tp.hcm": "Ho Chi Minh City", 
-            "hcm": "Ho Chi Minh City",
-            "sài gòn": "Ho Chi Minh City",
-            "hà nội": "Hanoi",
-            "hanoi": "Hanoi",
-            "hn": "Hanoi",
-            "đà nẵng": "Da Nang",
-            "da nang": "Da Nang",
-            "dn": "Da Nang"
-        }
-        
-        return city_map.get(city_lower, city)
-        
-
+        return gazetteer.to_city(city, city)
     
     def _normalize_date(self, date: str) -> str:
         """Normalize date formats - linh hoạt với mọi format"""
@@ -317,7 +307,7 @@ class SearchAgent(BaseAgent):
                 hotel_infos.append(hotel_info)
             
             context.hotel_context.search_results = hotel_infos
-            print(f"DEBUG: Saved {len(hotel_infos)} hotels to session context")
+            log.debug("Saved %s hotels to session context", len(hotel_infos))
         
         return self.create_response(
             success=True,
@@ -3,34 +3,46 @@ Smart Intent Agent - Phát hiện ý định thông minh dựa trên context
 """
 
 from typing import Dict, Any, List
+import logging
 import re
+from utils.logger import get_logger
+from utils.shared_state import shared_state
+
+log = get_logger("agents.smart_intent_agent")
+
+# Số message gần nhất giữ lại trong context (context nằm ở shared state, không để phình vô hạn)
+MAX_CONTEXT_MESSAGES = 20
+
+
+def _new_context() -> Dict[str, Any]:
+    return {
+        "last_search": None,
+        "selected_flight": None,
+        "booking_stage": None,
+        "messages": []
+    }
 
 class SmartIntentAgent:
     """Agent phát hiện ý định thông minh với context awareness"""
     
     def __init__(self):
         self.name = "SmartIntentAgent"
-        self.conversation_context = {}
+        # Dùng chung giữa các worker (STATE_BACKEND)
+        self.conversation_context = shared_state("smart_intent", ttl=24 * 3600)
     
     def analyze_intent(self, user_message: str, conversation_history: List[Dict] = None, user_id: str = None) -> Dict[str, Any]:
         """Phân tích ý định dựa trên message và context"""
         
         # Cập nhật context
         if user_id:
-            if user_id not in self.conversation_context:
-                self.conversation_context[user_id] = {
-                    "last_search": None,
-                    "selected_flight": None,
-                    "booking_stage": None,
-                    "messages": []
-                }
-            
-            self.conversation_context[user_id]["messages"].append({
-                "message": user_message,
-                "timestamp": "now"
-            })
-        
-        context = self.conversation_context.get(user_id, {})
+            with self.conversation_context.mutate(user_id, _new_context) as context:
+                context["messages"].append({
+                    "message": user_message,
+                    "timestamp": "now"
+                })
+                del context["messages"][:-MAX_CONTEXT_MESSAGES]
+        else:
+            context = {}
         
         # Phân tích các loại intent
         search_intent = self._analyze_search_intent(user_message, context)
@@ -38,8 +50,8 @@ class SmartIntentAgent:
         info_intent = self._analyze_info_intent(user_message, context)
         
         # Debug output
-        print(f"DEBUG Intent Analysis for '{user_message}': search={search_intent['confidence']:.2f}, booking={booking_intent['confidence']:.2f}, info={info_intent['confidence']:.2f}")
-        print(f"DEBUG Context: has_search={bool(context.get('last_search'))}, user_id={user_id}")
+        log.debug("Intent Analysis for '%s': search=%.2f, booking=%.2f, info=%.2f", user_message, search_intent['confidence'], booking_intent['confidence'], info_intent['confidence'])
+        log.debug("Context: has_search=%s, user_id=%s", bool(context.get('last_search')), user_id)
         
         # Quyết định intent chính - ưu tiên booking intent cao hơn
         selected_intent = None
@@ -56,7 +68,7 @@ class SmartIntentAgent:
         else:
             selected_intent = {"intent": "unknown", "confidence": 0.0}
         
-        print(f"DEBUG Selected intent: {selected_intent['intent']} (confidence: {selected_intent.get('confidence', 0):.2f})")
+        log.debug("Selected intent: %s (confidence: %.2f)", selected_intent['intent'], selected_intent.get('confidence', 0))
         return selected_intent
     
     def _analyze_booking_intent(self, message: str, context: Dict, history: List = None) -> Dict[str, Any]:
@@ -158,7 +170,7 @@ class SmartIntentAgent:
             "extracted_info": extracted_info
         }
         
-        print(f"DEBUG booking_intent result: {result}")
+        log.debug("booking_intent result: %s", result)
         return result
     
     def _analyze_search_intent(self, message: str, context: Dict) -> Dict[str, Any]:
@@ -306,15 +318,8 @@ class SmartIntentAgent:
     
     def update_context(self, user_id: str, key: str, value: Any):
         """Cập nhật context"""
-        if user_id not in self.conversation_context:
-            self.conversation_context[user_id] = {
-                "last_search": None,
-                "selected_flight": None,
-                "booking_stage": None,
-                "messages": []
-            }
-        
-        self.conversation_context[user_id][key] = value
+        with self.conversation_context.mutate(user_id, _new_context) as context:
+            context[key] = value
     
     def get_context(self, user_id: str) -> Dict[str, Any]:
         """Lấy context"""
@@ -326,15 +331,16 @@ class SmartIntentAgent:
         intent_result = self.analyze_intent(user_message, user_id=user_id)
         
         # Debug output
-        print(f"DEBUG SmartIntent should_proceed_with_booking: Message='{user_message}', Intent={intent_result['intent']}, Confidence={intent_result.get('confidence', 0):.2f}")
-        print(f"DEBUG SmartIntent context: {self.get_context(user_id)}")
+        log.debug("SmartIntent should_proceed_with_booking: Message='%s', Intent=%s, Confidence=%.2f", user_message, intent_result['intent'], intent_result.get('confidence', 0))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("SmartIntent context: %s", self.get_context(user_id))
         
         if intent_result["intent"] == "book_flight" and intent_result["confidence"] > 0:
             context = self.get_context(user_id)
             
             # Nếu có confidence cao
             if intent_result["confidence"] >= 0.8:
-                print(f"DEBUG: High confidence booking intent - proceeding")
+                log.debug("High confidence booking intent - proceeding")
                 return {
                     "should_book": True,
                     "confidence": intent_result["confidence"],
@@ -343,7 +349,7 @@ class SmartIntentAgent:
             
             # Nếu confidence trung bình - hỏi xác nhận
             elif intent_result["confidence"] >= 0.5:
-                print(f"DEBUG: Medium confidence booking intent - asking confirmation")
+                log.debug("Medium confidence booking intent - asking confirmation")
                 return {
                     "should_book": False,
                     "should_confirm": True,
@@ -353,7 +359,7 @@ class SmartIntentAgent:
             
             # Nếu confidence thấp nhưng có context
             elif intent_result["confidence"] > 0 and context.get("last_search"):
-                print(f"DEBUG: Low confidence but has context - asking confirmation")
+                log.debug("Low confidence but has context - asking confirmation")
                 return {
                     "should_book": False,
                     "should_confirm": True,
@@ -363,7 +369,7 @@ class SmartIntentAgent:
             
             # Nếu confidence thấp và không có context
             else:
-                print(f"DEBUG: Low confidence and no context - not booking")
+                log.debug("Low confidence and no context - not booking")
                 return {
                     "should_book": False,
                     "should_confirm": False,
@@ -371,10 +377,11 @@ class SmartIntentAgent:
                     "reason": "Low confidence - not booking intent"
                 }
         
-        print(f"DEBUG: No booking intent detected")
+        log.debug("No booking intent detected")
         return {
             "should_book": False,
             "should_confirm": False,
+            "intent": intent_result["intent"],
             "confidence": intent_result.get("confidence", 0.0),
             "reason": "No booking intent detected"
         }
@@ -2,6 +2,9 @@ from typing import Dict, Any
 from .base_agent import BaseAgent
 from models.schemas import AgentRequest, AgentResponse, TransferContext, TransferInfo
 from data.mock_data import transfer_generator
+from utils.logger import get_logger
+
+log = get_logger("agents.transfer_agent")
 
 class TransferAgent(BaseAgent):
     """Agent for transfer booking and management"""
@@ -93,7 +96,7 @@ class TransferAgent(BaseAgent):
                 transfer_infos.append(transfer_info)
             
             context.transfer_context.search_results = transfer_infos
-            print(f"DEBUG: Saved {len(transfer_infos)} transfers to session context")
+            log.debug("Saved %s transfers to session context", len(transfer_infos))
         
         return self.create_response(
             success=True,
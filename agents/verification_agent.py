@@ -6,13 +6,16 @@ import random
 import time
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
+from utils.shared_state import shared_state
+
+SMS_CODE_TTL = 300  # 5 phút
 
 class VerificationAgent:
     """Agent xử lý xác thực SMS và verification"""
     
     def __init__(self):
         self.name = "VerificationAgent"
-        self.sms_codes = {}  # Lưu mã SMS tạm thời
+        self.sms_codes = shared_state("sms_codes", ttl=SMS_CODE_TTL)  # Lưu mã SMS tạm thời (dùng chung giữa các worker)
         
     def send_sms_code(self, phone: str, purpose: str = "payment") -> Dict[str, Any]:
         """Gửi mã SMS xác thực"""
@@ -21,36 +24,36 @@ class VerificationAgent:
         code = f"{random.randint(100000, 999999)}"
         
         # Lưu mã với thời hạn 5 phút
-        self.sms_codes[phone] = {
+        now = datetime.now()
+        self.sms_codes.set(phone, {
             "code": code,
             "purpose": purpose,
-            "created_at": datetime.now(),
-            "expires_at": datetime.now() + timedelta(minutes=5),
+            "created_at": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=SMS_CODE_TTL)).isoformat(),
             "attempts": 0
-        }
+        })
         
         # Mock gửi SMS
         return {
             "success": True,
             "message": f"📱 Mã xác thực đã được gửi đến {phone[-4:].rjust(len(phone), '*')}",
             "code": code,  # Chỉ để test, thực tế không trả về
-            "expires_in": 300  # 5 phút
+            "expires_in": SMS_CODE_TTL
         }
     
     def verify_sms_code(self, phone: str, input_code: str) -> Dict[str, Any]:
         """Xác thực mã SMS"""
         
-        if phone not in self.sms_codes:
+        sms_data = self.sms_codes.get(phone)
+        if sms_data is None:
             return {
                 "success": False,
                 "error": "Không tìm thấy mã xác thực. Vui lòng yêu cầu gửi lại."
             }
         
-        sms_data = self.sms_codes[phone]
-        
         # Kiểm tra hết hạn
-        if datetime.now() > sms_data["expires_at"]:
-            del self.sms_codes[phone]
+        if datetime.now() > datetime.fromisoformat(sms_data["expires_at"]):
+            self.sms_codes.delete(phone)
             return {
                 "success": False,
                 "error": "Mã xác thực đã hết hạn. Vui lòng yêu cầu gửi lại."
@@ -59,7 +62,7 @@ class VerificationAgent:
         # Kiểm tra số lần thử
         sms_data["attempts"] += 1
         if sms_data["attempts"] > 3:
-            del self.sms_codes[phone]
+            self.sms_codes.delete(phone)
             return {
                 "success": False,
                 "error": "Đã nhập sai quá 3 lần. Vui lòng yêu cầu gửi lại mã mới."
@@ -67,6 +70,7 @@ class VerificationAgent:
         
         # Kiểm tra mã
         if input_code != sms_data["code"]:
+            self.sms_codes.set(phone, sms_data)
             return {
                 "success": False,
                 "error": f"Mã xác thực không đúng. Còn {3 - sms_data['attempts']} lần thử.",
@@ -74,7 +78,7 @@ class VerificationAgent:
             }
         
         # Xác thực thành công
-        del self.sms_codes[phone]
+        self.sms_codes.delete(phone)
         return {
             "success": True,
             "message": "✅ Xác thực thành công!",
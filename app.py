@@ -1,8 +1,8 @@
 import streamlit as st
-import asyncio
+import requests
 import json
+import os
 from datetime import datetime
-from smart_orchestrator import SmartOrchestrator
 
 # Page config
 st.set_page_config(
@@ -11,18 +11,34 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize orchestrator
-@st.cache_resource
-def get_orchestrator():
-    return SmartOrchestrator()
+# API endpoint (main.py) - SSE stream: start → step → token... → done
+API_URL = os.getenv("BOOKING_API_URL", "http://localhost:8000")
+STREAM_URL = f"{API_URL}/chat/stream"
 
-orchestrator = get_orchestrator()
+STEP_LABELS = {
+    "extract": "🔎 Đã trích xuất thông tin",
+    "reason": "🧠 Đã phân tích ý định",
+    "execute": "✈️ Đã tra cứu dữ liệu chuyến bay",
+    "fast_path": "⚡ Trả lời nhanh (không cần LLM)"
+}
+
+def stream_events(user_id: str, message: str):
+    """Đọc /chat/stream, trả về từng event (dict) ngay khi server gửi"""
+    with requests.post(STREAM_URL, json={"user_id": user_id, "message": message}, stream=True, timeout=(5, 120)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
 
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "user_id" not in st.session_state:
     st.session_state.user_id = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+if "session_context" not in st.session_state:
+    st.session_state.session_context = {}
+if "last_context" not in st.session_state:
+    st.session_state.last_context = {}
 
 # Main UI
 st.title("🛫 Smart Booking Agent")
@@ -31,38 +47,37 @@ st.markdown("*AI-powered flight booking assistant with context awareness*")
 # Sidebar - Context Info
 with st.sidebar:
     st.header("📊 Session Info")
-    
+
     # User ID
     st.text(f"User ID: {st.session_state.user_id}")
-    
+
     # Context display
-    if hasattr(orchestrator, 'user_contexts') and st.session_state.user_id in orchestrator.user_contexts:
-        context = orchestrator.user_contexts[st.session_state.user_id]
-        
+    context = st.session_state.session_context
+    if context:
         st.subheader("🧠 Current Context")
-        
+
         # Slots info
-        if hasattr(context, 'slots') and context.slots:
-            st.write("**Active Slots:**")
-            for key, value in context.slots.items():
-                if key not in ['last_search_results', 'original_message']:
-                    st.text(f"• {key}: {value}")
-        
-        # Query history
-        if hasattr(context, 'query_history') and context.query_history:
-            st.write("**Query History:**")
-            for i, query in enumerate(context.query_history[-5:], 1):
-                st.text(f"{i}. {query}")
-        
+        locations = context.get('locations') or {}
+        if locations:
+            st.write("**Route:**")
+            st.text(f"• {locations.get('from', '?')} → {locations.get('to', '?')}")
+
+        time_info = context.get('time') or {}
+        if time_info:
+            st.write("**Time:**")
+            for key, value in time_info.items():
+                st.text(f"• {key}: {value}")
+
         # Search results
-        if hasattr(context, 'slots') and context.slots.get('last_search_results'):
-            flights = context.slots['last_search_results']
+        flights = (context.get('last_search_result') or {}).get('data', {}).get('flights') or []
+        if flights:
             st.write(f"**Search Results:** {len(flights)} flights")
-    
+
     # Clear context button
     if st.button("🔄 Clear Context"):
-        if st.session_state.user_id in orchestrator.user_contexts:
-            del orchestrator.user_contexts[st.session_state.user_id]
+        st.session_state.user_id = f"user_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        st.session_state.session_context = {}
+        st.session_state.last_context = {}
         st.session_state.messages = []
         st.rerun()
 
@@ -71,14 +86,14 @@ col1, col2 = st.columns([2, 1])
 
 with col1:
     st.header("💬 Chat")
-    
+
     # Display messages
     for msg_idx, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
-            
+
             # Display suggestions if available
-            if message["role"] == "assistant" and "suggestions" in message:
+            if message["role"] == "assistant" and message.get("suggestions"):
                 st.write("**Quick Actions:**")
                 cols = st.columns(len(message["suggestions"]))
                 for i, suggestion in enumerate(message["suggestions"]):
@@ -86,7 +101,7 @@ with col1:
                         if st.button(suggestion, key=f"sug_{msg_idx}_{i}"):
                             # Add suggestion as user message
                             st.session_state.messages.append({
-                                "role": "user", 
+                                "role": "user",
                                 "content": suggestion
                             })
                             st.rerun()
@@ -95,91 +110,98 @@ with col1:
     if prompt := st.chat_input("Nhập tin nhắn của bạn..."):
         # Add user message
         st.session_state.messages.append({"role": "user", "content": prompt})
-        
+
         with st.chat_message("user"):
             st.markdown(prompt)
-        
-        # Get AI response
+
+        # Get AI response - hiển thị dần theo từng event
         with st.chat_message("assistant"):
-            with st.spinner("Đang xử lý..."):
-                try:
-                    response = asyncio.run(
-                        orchestrator.process_message(st.session_state.user_id, prompt)
-                    )
-                    
-                    st.markdown(response["response"])
-                    
-                    # Add assistant message with suggestions
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response["response"],
-                        "suggestions": response.get("suggestions", [])
-                    })
-                    
-                except Exception as e:
-                    error_msg = f"❌ Lỗi: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": error_msg
-                    })
+            status = st.status("Đang xử lý...", expanded=False)
+            final = {}
+
+            def tokens():
+                for event in stream_events(st.session_state.user_id, prompt):
+                    if event["event"] == "step":
+                        status.update(label=STEP_LABELS.get(event["step"], event["step"]))
+                    elif event["event"] == "token":
+                        yield event["text"]
+                    elif event["event"] == "done":
+                        final.update(event)
+
+            try:
+                streamed_text = st.write_stream(tokens())
+                status.update(label="✅ Hoàn tất", state="complete")
+
+                response_text = final.get("response") or streamed_text
+                session_context = (final.get("context") or {}).get("session_context")
+                if session_context is not None:
+                    st.session_state.session_context = session_context
+                elif final.get("context_delta"):
+                    st.session_state.session_context.update(final["context_delta"])
+                st.session_state.last_context = final.get("context") or {}
+
+                # Add assistant message with suggestions
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response_text,
+                    "suggestions": final.get("suggestions", [])
+                })
+
+            except Exception as e:
+                status.update(label="❌ Lỗi", state="error")
+                error_msg = f"❌ Lỗi: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": error_msg
+                })
+            else:
+                # Vẽ lại để sidebar/details nhận session context mới
+                st.rerun()
 
 with col2:
     st.header("📋 Details")
-    
+
     # Flight results display
-    if (hasattr(orchestrator, 'user_contexts') and 
-        st.session_state.user_id in orchestrator.user_contexts):
-        
-        context = orchestrator.user_contexts[st.session_state.user_id]
-        
-        if (hasattr(context, 'slots') and 
-            context.slots.get('last_search_results')):
-            
-            flights = context.slots['last_search_results']
-            
-            st.subheader("✈️ Available Flights")
-            
-            for i, flight in enumerate(flights, 1):
-                with st.expander(f"Flight {i}: {flight['airline']} {flight['flight_id']}"):
-                    col_a, col_b = st.columns(2)
-                    
-                    with col_a:
-                        st.write(f"**Route:** {flight['from_city']} → {flight['to_city']}")
-                        st.write(f"**Time:** {flight['time']}")
-                        st.write(f"**Date:** {flight['date']}")
-                    
-                    with col_b:
-                        st.write(f"**Price:** {flight['price']:,} VNĐ")
-                        st.write(f"**Seats:** {flight['seats_left']} left")
-                        st.write(f"**Class:** {flight['class_type']}")
-                    
-                    # Book button
-                    if st.button(f"📝 Book Flight {i}", key=f"book_{flight['service_id']}_{i}"):
-                        book_msg = f"Đặt vé {flight['airline']} {flight['flight_id']}"
-                        st.session_state.messages.append({
-                            "role": "user", 
-                            "content": book_msg
-                        })
-                        st.rerun()
-    
+    flights = (st.session_state.session_context.get('last_search_result') or {}).get('data', {}).get('flights') or []
+    if flights:
+        st.subheader("✈️ Available Flights")
+
+        for i, flight in enumerate(flights, 1):
+            with st.expander(f"Flight {i}: {flight['airline']} {flight['flight_id']}"):
+                col_a, col_b = st.columns(2)
+
+                with col_a:
+                    st.write(f"**Route:** {flight['from_city']} → {flight['to_city']}")
+                    st.write(f"**Time:** {flight['time']}")
+                    st.write(f"**Date:** {flight['date']}")
+
+                with col_b:
+                    st.write(f"**Price:** {flight['price']:,} VNĐ")
+                    st.write(f"**Seats:** {flight['seats_left']} left")
+                    st.write(f"**Class:** {flight['class_type']}")
+
+                # Book button
+                if st.button(f"📝 Book Flight {i}", key=f"book_{flight['service_id']}_{i}"):
+                    book_msg = f"Đặt vé {flight['airline']} {flight['flight_id']}"
+                    st.session_state.messages.append({
+                        "role": "user",
+                        "content": book_msg
+                    })
+                    st.rerun()
+
     # Debug info (collapsible)
     with st.expander("🔧 Debug Info"):
-        if (hasattr(orchestrator, 'user_contexts') and 
-            st.session_state.user_id in orchestrator.user_contexts):
-            
-            context = orchestrator.user_contexts[st.session_state.user_id]
-            
-            st.write("**Full Context:**")
-            st.json({
-                "user_id": context.user_id,
-                "intent": getattr(context, 'intent', None),
-                "previous_intent": getattr(context, 'previous_intent', None),
-                "slots_count": len(getattr(context, 'slots', {})),
-                "query_history_count": len(getattr(context, 'query_history', [])),
-                "last_updated": str(getattr(context, 'last_updated', None))
-            })
+        last_context = st.session_state.last_context
+        st.write("**Full Context:**")
+        st.json({
+            "user_id": st.session_state.user_id,
+            "agent_type": last_context.get("agent_type"),
+            "orchestrator_mode": last_context.get("orchestrator_mode"),
+            "llm_provider": last_context.get("llm_provider"),
+            "context_keys": sorted(st.session_state.session_context.keys()),
+            "messages_count": len(st.session_state.messages)
+        })
 
 # Footer
 st.markdown("---")
-st.markdown("*Powered by Smart Orchestrator with Context Awareness*")
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Columnar flight store - Định dạng nhị phân dạng cột cho mock data, load bằng mmap
+
+Thư mục `<tên>.flights/` gồm:
+- flights.npy : NumPy structured array (1 dòng / chuyến bay) cho các trường số,
+                các trường chuỗi lặp lại lưu dưới dạng index vào string table
+- details.bin : blob JSON (đã dedup) cho các trường chi tiết ít dùng
+                (aircraft, seating, baggage, services, policies...)
+- meta.json   : metadata, airports/routes..., string table, segment (tuyến, ngày)
+
+Nhiều worker mmap cùng file => dùng chung page cache, khởi động gần như tức thì.
+"""
+
+import json
+import mmap
+import os
+import shutil
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FORMAT_VERSION = 1
+COLUMNAR_SUFFIX = ".flights"
+
+# Trường số => dtype cố định
+NUMERIC_FIELDS = [
+    ("price", "<i4"),
+    ("base_fare", "<i4"),
+    ("taxes_fees", "<i4"),
+    ("service_fee", "<i4"),
+    ("distance", "<i4"),
+    ("seats_left", "<i2"),
+    ("total_seats", "<i2"),
+    ("day_of_week", "u1"),
+    ("is_weekend", "?"),
+    ("is_holiday", "?"),
+]
+
+# Trường chuỗi lặp lại => index (u4) vào string table
+STRING_FIELDS = [
+    "service_id", "flight_id", "airline", "airline_code",
+    "from_code", "to_code", "from_airport", "to_airport", "from_city", "to_city", "route",
+    "date", "date_display", "weekday", "season",
+    "departure_time", "arrival_time", "duration", "currency", "class_type",
+]
+
+FLIGHT_DTYPE = NUMERIC_FIELDS + [(field, "<u4") for field in STRING_FIELDS] + [
+    ("detail_offset", "<u8"),
+    ("detail_length", "<u4"),
+]
+
+_COLUMN_FIELDS = {name for name, _ in NUMERIC_FIELDS} | set(STRING_FIELDS)
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def columnar_path_for(json_path: str) -> str:
+    """vietjet_mock_data_X.json → vietjet_mock_data_X.flights"""
+    root, _ = os.path.splitext(json_path)
+    return root + COLUMNAR_SUFFIX
+
+
+def write_columnar(dataset: Dict[str, Any], path: str) -> str:
+    """Ghi dataset (format JSON của generate_mock_data) ra thư mục columnar"""
+    if np is None:
+        raise ImportError("numpy is required to write the columnar flight format")
+
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value) -> int:
+        value = "" if value is None else str(value)
+        idx = string_ids.get(value)
+        if idx is None:
+            idx = string_ids[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    rows = []
+    segments = []
+    field_order: List[str] = []
+    blob = bytearray()
+    blob_offsets: Dict[bytes, int] = {}
+
+    for date_key, routes in dataset.get("flights_by_date", {}).items():
+        for route_key, flights in routes.items():
+            segments.append([route_key, date_key, len(rows), len(flights)])
+            for flight in flights:
+                if not field_order:
+                    field_order = list(flight.keys())
+
+                details = {k: v for k, v in flight.items() if k not in _COLUMN_FIELDS}
+                encoded = json.dumps(details, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                offset = blob_offsets.get(encoded)
+                if offset is None:
+                    offset = blob_offsets[encoded] = len(blob)
+                    blob.extend(encoded)
+
+                rows.append(
+                    tuple(flight.get(name, 0) for name, _ in NUMERIC_FIELDS)
+                    + tuple(intern(flight.get(field)) for field in STRING_FIELDS)
+                    + (offset, len(encoded))
+                )
+
+    meta = {k: v for k, v in dataset.items() if k != "flights_by_date"}
+    meta["format"] = {
+        "version": FORMAT_VERSION,
+        "rows": len(rows),
+        "field_order": field_order,
+        "strings": strings,
+        "segments": segments,
+    }
+
+    # Ghi vào thư mục tạm rồi rename => reader không bao giờ thấy file dở dang
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    np.save(os.path.join(tmp_path, "flights.npy"), np.array(rows, dtype=FLIGHT_DTYPE))
+    with open(os.path.join(tmp_path, "details.bin"), "wb") as f:
+        f.write(bytes(blob))
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ColumnarFlightStore:
+    """Reader cho thư mục columnar - mmap, chỉ decode các dòng được truy vấn"""
+
+    def __init__(self, path: str):
+        if np is None:
+            raise ImportError("numpy is required to read the columnar flight format")
+
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        fmt = meta.pop("format")
+        if fmt.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version: {fmt.get('version')}")
+
+        # Phần metadata giống file JSON (airports, routes...), trừ flights_by_date
+        self.data = meta
+        self.strings: List[str] = fmt["strings"]
+        self.field_order: List[str] = fmt["field_order"]
+
+        # (route, date) → (start, count), giữ thứ tự trong file
+        self.segments: Dict[Tuple[str, str], Tuple[int, int]] = {
+            (route_key, date_key): (start, count) for route_key, date_key, start, count in fmt["segments"]
+        }
+
+        self.rows = np.load(os.path.join(path, "flights.npy"), mmap_mode="r")
+
+        details_path = os.path.join(path, "details.bin")
+        self._details_file = open(details_path, "rb")
+        self._details = (
+            mmap.mmap(self._details_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if os.path.getsize(details_path) else b""
+        )
+
+    def column(self, field: str):
+        return self.rows[field]
+
+    def string(self, idx: int) -> str:
+        return self.strings[idx]
+
+    def get_flights(self, route_key: str, date_key: str) -> List[Dict]:
+        """Flight của một (tuyến, ngày), không kèm trường chi tiết"""
+        segment = self.segments.get((route_key, date_key))
+        if not segment:
+            return []
+        start, count = segment
+        return [self._decode(start + i, with_details=False) for i in range(count)]
+
+    def get_flight(self, route_key: str, date_key: str, offset: int) -> Optional[Dict]:
+        """Một flight đầy đủ (kèm trường chi tiết)"""
+        segment = self.segments.get((route_key, date_key))
+        if not segment or offset >= segment[1]:
+            return None
+        return self._decode(segment[0] + offset, with_details=True)
+
+    def _decode(self, row_idx: int, with_details: bool) -> Dict:
+        row = self.rows[row_idx]
+        values: Dict[str, Any] = {}
+        for name, _ in NUMERIC_FIELDS:
+            values[name] = row[name].item()
+        for field in STRING_FIELDS:
+            values[field] = self.strings[int(row[field])]
+        if with_details:
+            start = int(row["detail_offset"])
+            end = start + int(row["detail_length"])
+            values.update(json.loads(self._details[start:end].decode("utf-8")))
+
+        # Giữ thứ tự key như dataset gốc
+        flight = {key: values.pop(key) for key in self.field_order if key in values}
+        flight.update(values)
+        return flight
+
+    def close(self):
+        if isinstance(self._details, mmap.mmap):
+            self._details.close()
+        self._details_file.close()
@@ -0,0 +1,289 @@
+"""
+Fare engine - Truy vấn giá vé dạng vector (NumPy) trên toàn bộ lịch bay đã load
+
+Trả lời trong một lần gọi: rẻ nhất theo từng ngày trong khoảng ngày, histogram giá
+của một tuyến, các chuyến trong ±N giờ quanh giờ mong muốn, top-k theo giá/số ghế.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from data.seat_inventory import seat_inventory
+
+_TIME_RE = re.compile(r'(\d{1,2})\s*(?:[:h]|giờ)\s*(\d{2})?')
+
+
+def parse_minutes(value: str) -> Optional[int]:
+    """'14:30' / '8h' / '8h15' / '9 giờ' → số phút trong ngày"""
+    if not value:
+        return None
+    match = _TIME_RE.search(str(value).lower())
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+class FareEngine:
+    """Các cột giá/ghế/giờ bay của mọi chuyến trong dataset, dựng một lần từ MockDataLoader"""
+
+    def __init__(self, loader):
+        if np is None:
+            raise ImportError("numpy is required for FareEngine")
+
+        self.loader = loader
+        index = loader.index
+
+        self.route_keys: List[str] = sorted({route_key for route_key, _ in index.prices})
+        route_ids = {route_key: i for i, route_key in enumerate(self.route_keys)}
+
+        routes, days, offsets, prices, seats, departures, keys = [], [], [], [], [], [], []
+        for route_key, date_key, segment in self._segments(loader):
+            ordinal = datetime.strptime(date_key, "%Y-%m-%d").toordinal()
+            for offset, (price, seats_left, departure, flight_id) in enumerate(segment):
+                routes.append(route_ids[route_key])
+                days.append(ordinal)
+                offsets.append(offset)
+                prices.append(price)
+                seats.append(seats_left)
+                departures.append(parse_minutes(departure) or 0)
+                keys.append(f"{flight_id}|{date_key}|{departure}")
+
+        self.route = np.array(routes, dtype=np.int16)
+        self.day = np.array(days, dtype=np.int32)
+        self.offset = np.array(offsets, dtype=np.int16)
+        self.price = np.array(prices, dtype=np.int64)
+        self.seats = np.array(seats, dtype=np.int16)
+        self.departure = np.array(departures, dtype=np.int16)
+        # inventory_key của từng dòng - chỉ đọc ở những ngày có ghế đang giữ / đã bán
+        self.inventory_keys = keys
+        self._indexed_days = set(days)
+        self._route_ids = route_ids
+
+    @classmethod
+    def _segments(cls, loader) -> Iterator[Tuple[str, str, List[Tuple[int, int, str, str]]]]:
+        """(route_key, date_key, cột của segment) cho mọi (tuyến, ngày) trong dataset
+
+        Dataset shard dựng từ tóm tắt trong manifest (như FlightIndex._index_summaries) => không đọc
+        shard nào, lazy load theo ngày và LRU của ShardedFlightStore không bị ảnh hưởng.
+        """
+        store = loader.store
+        if not hasattr(store, "summaries"):
+            for route_key, date_key in loader.index.prices:
+                yield route_key, date_key, cls._segment_columns(loader, route_key, date_key)
+            return
+
+        for route_key, date_key, flight_ids, prices, seats, minutes in store.summaries():
+            if minutes is None:
+                # Manifest cũ (chưa có departure_minutes) - chạy lại scripts/generate_mock_data.py để bỏ bước này
+                yield route_key, date_key, cls._segment_columns(loader, route_key, date_key)
+                continue
+            yield route_key, date_key, [
+                (price, seats_left, f"{minute // 60:02d}:{minute % 60:02d}", flight_id)
+                for price, seats_left, minute, flight_id in zip(prices, seats, minutes, flight_ids)
+            ]
+
+    @staticmethod
+    def _segment_columns(loader, route_key: str, date_key: str) -> List[Tuple[int, int, str, str]]:
+        """(price, seats_left, departure_time, flight_id) của một (tuyến, ngày) - đọc thẳng cột nếu là columnar
+
+        Dataset JSON (và manifest shard cũ) đọc flight qua index.
+        """
+        store = loader.store
+        if hasattr(store, "segments"):
+            start, count = store.segments[(route_key, date_key)]
+            rows = store.rows[start:start + count]
+            return [
+                (int(price), int(seats_left), store.string(int(departure)), store.string(int(flight_id)))
+                for price, seats_left, departure, flight_id
+                in zip(rows["price"], rows["seats_left"], rows["departure_time"], rows["flight_id"])
+            ]
+        return [
+            (flight["price"], flight["seats_left"], flight.get("departure_time", flight.get("time")), flight["flight_id"])
+            for flight in loader.index.get_flights(route_key, date_key)
+        ]
+
+    # ------------------------------------------------------------------
+    # Chọn dữ liệu
+    # ------------------------------------------------------------------
+
+    def _select(self, from_city: str, to_city: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Các cột của (tuyến, khoảng ngày); ngày ngoài dataset lấy từ dữ liệu generate động"""
+        from_code, to_code = self.loader.index.airport_code(from_city), self.loader.index.airport_code(to_city)
+        route_key = f"{from_code}-{to_code}"
+        start_day, end_day = start.toordinal(), end.toordinal()
+
+        route_id = self._route_ids.get(route_key)
+        if route_id is not None:
+            rows = np.nonzero((self.route == route_id) & (self.day >= start_day) & (self.day <= end_day))[0]
+        else:
+            rows = np.empty(0, dtype=np.int64)
+
+        # Ngày không có trong dataset => loader generate động (ít ngày, dựng mảng nhỏ)
+        extra: List[Dict] = []
+        extra_days: List[int] = []
+        for ordinal in range(start_day, end_day + 1):
+            if route_id is not None and ordinal in self._indexed_days:
+                continue
+            date_key = datetime.fromordinal(ordinal).strftime("%Y-%m-%d")
+            for flight in self.loader.get_flights_by_route_and_date(from_city, to_city, date_key):
+                extra.append(flight)
+                extra_days.append(ordinal)
+
+        # Flight generate động đã mang số ghế thật (loader.apply), các dòng trong dataset thì trừ
+        # số ghế giữ/bán ở đây; chuyến hết chỗ bị loại khỏi kết quả
+        seats = self._live_seats(route_key, rows)
+        available = seats > 0
+        rows, seats = rows[available], seats[available]
+        extra_days = [day for day, flight in zip(extra_days, extra) if flight["seats_left"] > 0]
+        extra = [flight for flight in extra if flight["seats_left"] > 0]
+
+        return {
+            "route_key": route_key,
+            "rows": rows,
+            "extra": extra,
+            "price": np.concatenate([self.price[rows], np.array([f["price"] for f in extra], dtype=np.int64)]),
+            "seats": np.concatenate([seats, np.array([f["seats_left"] for f in extra], dtype=np.int16)]),
+            "day": np.concatenate([self.day[rows], np.array(extra_days, dtype=np.int32)]),
+            "departure": np.concatenate([
+                self.departure[rows],
+                np.array([parse_minutes(f.get("time")) or 0 for f in extra], dtype=np.int16)
+            ]),
+        }
+
+    def _live_seats(self, route_key: str, rows) -> "np.ndarray":
+        """Số ghế còn của các dòng sau khi trừ ghế đang giữ / đã bán (seat_inventory)"""
+        seats = self.seats[rows].astype(np.int32)
+        if not len(rows):
+            return seats
+        ordinals = np.unique(self.day[rows])
+        date_keys = {datetime.fromordinal(int(ordinal)).strftime("%Y-%m-%d"): int(ordinal) for ordinal in ordinals}
+        busy_days = [date_keys[date_key] for date_key, used in seat_inventory.used_by_day(route_key, date_keys).items() if used]
+        if not busy_days:
+            return seats
+
+        positions = np.nonzero(np.isin(self.day[rows], busy_days))[0]
+        keys = [self.inventory_keys[int(rows[position])] for position in positions]
+        used = seat_inventory.used_many(keys)
+        seats[positions] -= np.array([used[key] for key in keys], dtype=np.int32)
+        return np.maximum(seats, 0)
+
+    def _flight(self, selection: Dict[str, Any], position: int) -> Dict:
+        """Vị trí trong selection → flight view của loader"""
+        rows = selection["rows"]
+        if position >= len(rows):
+            return selection["extra"][position - len(rows)]
+        row = rows[position]
+        date_key = datetime.fromordinal(int(self.day[row])).strftime("%Y-%m-%d")
+        return self.loader.get_flight_at((date_key, selection["route_key"], int(self.offset[row])))
+
+    def _date_bounds(self, start_date: str, end_date: str = None) -> Tuple[datetime, datetime]:
+        start = self.loader._parse_date(start_date)
+        end = self.loader._parse_date(end_date) if end_date else start
+        return (start, end) if start <= end else (end, start)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def cheapest_per_day(self, from_city: str, to_city: str, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """Chuyến rẻ nhất của từng ngày trong khoảng [start_date, end_date]"""
+        start, end = self._date_bounds(start_date, end_date)
+        selection = self._select(from_city, to_city, start, end)
+        if not len(selection["price"]):
+            return []
+
+        # Sort theo (ngày, giá) rồi lấy dòng đầu tiên của mỗi ngày
+        order = np.lexsort((selection["price"], selection["day"]))
+        _, first = np.unique(selection["day"][order], return_index=True)
+
+        result = []
+        for position in order[first]:
+            result.append({
+                "date": datetime.fromordinal(int(selection["day"][position])).strftime("%Y-%m-%d"),
+                "price": int(selection["price"][position]),
+                "flight": self._flight(selection, int(position))
+            })
+        return result
+
+    def fare_histogram(self, from_city: str, to_city: str, start_date: str, end_date: str = None,
+                       bins: int = 8) -> Dict[str, Any]:
+        """Phân bố giá vé của tuyến trong khoảng ngày"""
+        start, end = self._date_bounds(start_date, end_date)
+        prices = self._select(from_city, to_city, start, end)["price"]
+        if not len(prices):
+            return {"count": 0, "min": 0, "max": 0, "median": 0, "edges": [], "counts": []}
+
+        counts, edges = np.histogram(prices, bins=bins)
+        return {
+            "count": int(len(prices)),
+            "min": int(prices.min()),
+            "max": int(prices.max()),
+            "median": int(np.median(prices)),
+            "edges": [int(edge) for edge in edges],
+            "counts": counts.tolist()
+        }
+
+    def flights_near_time(self, from_city: str, to_city: str, date: str, time: str,
+                          window_hours: float = 2) -> List[Dict]:
+        """Các chuyến khởi hành trong ±window_hours quanh giờ mong muốn, gần nhất trước"""
+        target = parse_minutes(time)
+        start, end = self._date_bounds(date)
+        selection = self._select(from_city, to_city, start, end)
+        if target is None:
+            return [self._flight(selection, i) for i in range(len(selection["price"]))]
+
+        distance = np.abs(selection["departure"].astype(np.int32) - target)
+        matches = np.nonzero(distance <= int(window_hours * 60))[0]
+        order = matches[np.lexsort((selection["price"][matches], distance[matches]))]
+        return [self._flight(selection, int(position)) for position in order]
+
+    def top_k(self, from_city: str, to_city: str, start_date: str, end_date: str = None,
+              k: int = 5, by: str = "price") -> List[Dict]:
+        """Top-k chuyến theo giá (rẻ trước) hoặc theo số ghế còn (nhiều trước)"""
+        start, end = self._date_bounds(start_date, end_date)
+        selection = self._select(from_city, to_city, start, end)
+        total = len(selection["price"])
+        if not total or k <= 0:
+            return []
+
+        if by == "seats":
+            keys = (selection["price"], -selection["seats"].astype(np.int32))
+        else:
+            keys = (-selection["seats"].astype(np.int32), selection["price"])
+
+        # argpartition chọn k ứng viên O(n), chỉ sort k phần tử đó
+        primary = keys[1]
+        if k < total:
+            candidates = np.argpartition(primary, k - 1)[:k]
+            threshold = primary[candidates].max()
+            candidates = np.nonzero(primary <= threshold)[0]  # giữ đủ các phần tử bằng nhau
+        else:
+            candidates = np.arange(total)
+        order = candidates[np.lexsort((keys[0][candidates], primary[candidates]))][:k]
+        return [self._flight(selection, int(position)) for position in order]
+
+
+# Global instance
+_fare_engine: Optional[FareEngine] = None
+
+
+def get_fare_engine() -> Optional[FareEngine]:
+    """FareEngine dùng chung, None nếu chưa cài numpy"""
+    global _fare_engine
+    if np is None:
+        return None
+
+    from data.mock_data_loader import get_mock_data_loader
+    loader = get_mock_data_loader()
+    if _fare_engine is None or _fare_engine.loader is not loader:
+        _fare_engine = FareEngine(loader)
+    return _fare_engine
@@ -0,0 +1,129 @@
+"""
+Flight index - Index dựng một lần khi load mock data, thay cho việc duyệt nested dict
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Any, Optional, Tuple
+
+from utils.gazetteer import gazetteer
+
+# (date_key, route_key, offset) trỏ vào data["flights_by_date"][date_key][route_key][offset]
+FlightLocation = Tuple[str, str, int]
+
+
+class FlightIndex:
+    """Index theo mã chuyến, theo (tuyến, ngày) đã sort theo giá, và city→code"""
+
+    def __init__(self, data: Dict[str, Any], store=None):
+        # store: ColumnarFlightStore (mmap) hoặc None nếu data là JSON đã load
+        self.store = store
+        self.flights_by_date: Dict[str, Dict[str, List[Dict]]] = data.get("flights_by_date", {})
+
+        # city → code (cho phép truyền thẳng airport code)
+        self.city_to_code: Dict[str, str] = {}
+        for code, airport in data.get("airports", {}).items():
+            self.city_to_code[airport["city"]] = code
+            self.city_to_code.setdefault(code, code)
+
+        # flight_code → [(date, route, offset)] theo thứ tự ngày trong file
+        self.by_code: Dict[str, List[FlightLocation]] = {}
+
+        # (route, date) → (giá tăng dần, offset tương ứng)
+        self.prices: Dict[Tuple[str, str], Tuple[List[int], List[int]]] = {}
+
+        # (route, date) → tổng số ghế còn
+        self.seats_left: Dict[Tuple[str, str], int] = {}
+
+        if store is None:
+            self._index_dicts()
+        elif hasattr(store, "summaries"):
+            self._index_summaries(store)
+        else:
+            self._index_columns(store)
+
+    def _index_dicts(self):
+        for date_key, routes in self.flights_by_date.items():
+            for route_key, flights in routes.items():
+                for offset, flight in enumerate(flights):
+                    self.by_code.setdefault(flight["flight_id"], []).append((date_key, route_key, offset))
+
+                order = sorted(range(len(flights)), key=lambda i: flights[i]["price"])
+                self.prices[(route_key, date_key)] = ([flights[i]["price"] for i in order], order)
+                self.seats_left[(route_key, date_key)] = sum(flight["seats_left"] for flight in flights)
+
+    def _index_columns(self, store):
+        """Dựng index trực tiếp từ cột, không decode flight nào"""
+        flight_ids = store.column("flight_id")
+        prices = store.column("price")
+        seats = store.column("seats_left")
+        for (route_key, date_key), (start, count) in store.segments.items():
+            segment_prices = prices[start:start + count]
+            order = segment_prices.argsort(kind="stable").tolist()
+            self.prices[(route_key, date_key)] = (segment_prices[order].tolist(), order)
+            self.seats_left[(route_key, date_key)] = int(seats[start:start + count].sum())
+
+            for offset, string_idx in enumerate(flight_ids[start:start + count].tolist()):
+                self.by_code.setdefault(store.string(string_idx), []).append((date_key, route_key, offset))
+
+    def _index_summaries(self, store):
+        """Dựng index từ tóm tắt trong manifest (ShardedFlightStore), không đọc shard nào"""
+        for route_key, date_key, flight_ids, prices, seats, _ in store.summaries():
+            for offset, flight_id in enumerate(flight_ids):
+                self.by_code.setdefault(flight_id, []).append((date_key, route_key, offset))
+
+            order = sorted(range(len(prices)), key=lambda i: prices[i])
+            self.prices[(route_key, date_key)] = ([prices[i] for i in order], order)
+            self.seats_left[(route_key, date_key)] = sum(seats)
+
+    def airport_code(self, city: str) -> str:
+        """Tên thành phố → airport code (qua gazetteer nếu dataset không biết, giữ nguyên nếu không nhận ra)"""
+        return self.city_to_code.get(city) or gazetteer.to_iata(city) or city
+
+    def get_flights(self, route_key: str, date_key: str) -> List[Dict]:
+        """Flight gốc (raw) của một tuyến trong một ngày"""
+        if self.store is not None:
+            return self.store.get_flights(route_key, date_key)
+        return self.flights_by_date.get(date_key, {}).get(route_key, [])
+
+    def locate(self, flight_code: str) -> Optional[FlightLocation]:
+        """Vị trí đầu tiên của mã chuyến bay - O(1)"""
+        locations = self.by_code.get(flight_code)
+        return locations[0] if locations else None
+
+    def resolve(self, location: FlightLocation) -> Dict:
+        date_key, route_key, offset = location
+        if self.store is not None:
+            return self.store.get_flight(route_key, date_key, offset)
+        return self.flights_by_date[date_key][route_key][offset]
+
+    def cheapest_offset(self, route_key: str, date_key: str) -> Optional[int]:
+        """Offset của chuyến rẻ nhất - O(1)"""
+        entry = self.prices.get((route_key, date_key))
+        return entry[1][0] if entry and entry[1] else None
+
+    def route_dates(self, route_key: str) -> List[str]:
+        """Các ngày có dữ liệu của một tuyến (YYYY-MM-DD, tăng dần)"""
+        return sorted(date_key for key, date_key in self.prices if key == route_key)
+
+    def min_price(self, route_key: str, date_key: str) -> Optional[int]:
+        entry = self.prices.get((route_key, date_key))
+        return entry[0][0] if entry and entry[0] else None
+
+    def offsets_in_price_range(self, route_key: str, date_key: str,
+                               min_price: int = None, max_price: int = None) -> List[int]:
+        """Offset các chuyến trong khoảng giá, tăng dần theo giá - O(log n)"""
+        entry = self.prices.get((route_key, date_key))
+        if not entry:
+            return []
+        prices, order = entry
+        lo = bisect_left(prices, min_price) if min_price is not None else 0
+        hi = bisect_right(prices, max_price) if max_price is not None else len(prices)
+        return order[lo:hi]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "dates": len({date_key for _, date_key in self.prices}),
+            "route_days": len(self.prices),
+            "flight_codes": len(self.by_code),
+            "flights": sum(len(entry[1]) for entry in self.prices.values())
+        }
@@ -2,6 +2,11 @@ from datetime import datetime, timedelta
 import random
 import uuid
 
+from utils.gazetteer import gazetteer
+from utils.logger import get_logger
+
+log = get_logger("data.mock_data")
+
 # Dynamic Flight Generator
 class FlightDataGenerator:
     def __init__(self):
@@ -10,25 +15,9 @@ class FlightDataGenerator:
             "VJ": {"name": "VietJet Air", "price_factor": 1.0, "quality": "sovico_premium"}
         }
         
-        # Airport codes mapping
-        self.airport_codes = {
-            "Hanoi": "HAN", "Ho Chi Minh City": "SGN", "Da Nang": "DAD",
-            "Phu Quoc": "PQC", "Nha Trang": "CXR", "Da Lat": "DLI",
-            "Can Tho": "VCA", "Hai Phong": "HPH", "Hue": "HUI",
-            "Vung Tau": "VTG", "Quy Nhon": "UIH", "Vinh": "VII",
-            "Pleiku": "PXU", "Buon Ma Thuot": "BMV", "Con Dao": "VCS",
-            "Rach Gia": "VKG", "Ca Mau": "CAH"
-        }
-        
-        # Airport full names
-        self.airport_names = {
-            "HAN": "Sân bay Nội Bài", "SGN": "Sân bay Tân Sơn Nhất", "DAD": "Sân bay Đà Nẵng",
-            "PQC": "Sân bay Phú Quốc", "CXR": "Sân bay Cam Ranh", "DLI": "Sân bay Liên Khương",
-            "VCA": "Sân bay Cần Thơ", "HPH": "Sân bay Cát Bi", "HUI": "Sân bay Phú Bài",
-            "VTG": "Sân bay Vũng Tàu", "UIH": "Sân bay Phù Cát", "VII": "Sân bay Vinh",
-            "PXU": "Sân bay Pleiku", "BMV": "Sân bay Buôn Ma Thuột", "VCS": "Sân bay Côn Đảo",
-            "VKG": "Sân bay Rạch Giá", "CAH": "Sân bay Cà Mau"
-        }
+        # Airport codes / tên sân bay - từ gazetteer dùng chung
+        self.airport_codes = gazetteer.city_codes()
+        self.airport_names = gazetteer.airport_names()
         
         # Real VietJet flight schedules by route (based on actual VietJet timetables)
         self.real_flights = {
@@ -297,8 +286,8 @@ class FlightDataGenerator:
                 seats_left = max(1, int(base_seats * day_factor * time_factor * advance_factor))
                 
                 # Airport codes và tên
-                from_code = self.airport_codes.get(from_city, from_city[:3].upper())
-                to_code = self.airport_codes.get(to_city, to_city[:3].upper())
+                from_code = self.airport_codes.get(from_city) or gazetteer.to_iata(from_city) or from_city[:3].upper()
+                to_code = self.airport_codes.get(to_city) or gazetteer.to_iata(to_city) or to_city[:3].upper()
                 from_airport = self.airport_names.get(from_code, f"Sân bay {from_city}")
                 to_airport = self.airport_names.get(to_code, f"Sân bay {to_city}")
                 
@@ -789,9 +778,9 @@ def get_flights_by_route(from_city: str, to_city: str, date: str = None):
         if not date:
             date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
         
-        print(f"DEBUG: get_flights_by_route called with from_city={from_city}, to_city={to_city}, date={date}")
+        log.debug("get_flights_by_route called with from_city=%s, to_city=%s, date=%s", from_city, to_city, date)
         flights = flight_generator.generate_flights(from_city, to_city, date)
-        print(f"DEBUG: Generated {len(flights)} flights")
+        log.debug("Generated %s flights", len(flights))
         return flights
 
 def get_cheapest_flight(from_city: str, to_city: str, date: str = None):
@@ -2,33 +2,164 @@
 Mock data loader - Tải dữ liệu từ file JSON đã generate
 """
 
+import hashlib
 import json
 import os
+import statistics
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from data.flight_index import FlightIndex
+from data.columnar_store import ColumnarFlightStore, COLUMNAR_SUFFIX, columnar_path_for, is_available as columnar_available
+from data.shard_store import ShardedFlightStore, SHARDS_DIR_NAME, MANIFEST_NAME, is_sharded
+from data.seat_inventory import seat_inventory
+
+# Số (tuyến, ngày) generate động được giữ lại (LRU)
+DYNAMIC_CACHE_SIZE = int(os.getenv("MOCK_DYNAMIC_CACHE_SIZE", "4096"))
+
+# Lịch giá: số (tuyến, tháng) giữ trong cache (LRU) và số ngày tối đa của một truy vấn
+CALENDAR_CACHE_SIZE = int(os.getenv("MOCK_CALENDAR_CACHE_SIZE", "512"))
+MAX_CALENDAR_DAYS = 366
+
+# Hot reload: chu kỳ (giây) kiểm tra dataset mới, 0 = tắt
+RELOAD_INTERVAL = float(os.getenv("MOCK_RELOAD_INTERVAL", "30"))
+
+# Dataset shard: tổng kích thước các ngày giữ trong bộ nhớ, số ngày tới được đọc trước khi warm-up
+SHARD_CACHE_BYTES = int(float(os.getenv("MOCK_SHARD_CACHE_MB", "64")) * 1024 * 1024)
+PREWARM_DAYS = int(os.getenv("MOCK_PREWARM_DAYS", "3"))
+
+
+def stable_seed(text: str) -> int:
+    """Seed 64-bit ổn định giữa các process (hash() của str bị salt theo từng process)"""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def find_latest_dataset(generated_dir: str = None) -> Optional[str]:
+    """Dataset mới nhất: thư mục shard (load lười), sau đó file JSON mới nhất (ưu tiên bản columnar đi kèm)"""
+    generated_dir = generated_dir or os.path.join(os.path.dirname(__file__), "generated")
+    if is_sharded(os.path.join(generated_dir, SHARDS_DIR_NAME)):
+        return os.path.join(generated_dir, SHARDS_DIR_NAME)
+    
+    data_file = None
+    if os.path.exists(generated_dir):
+        files = [f for f in os.listdir(generated_dir) if f.startswith("vietjet_mock_data_") and f.endswith(".json")]
+        if files:
+            data_file = os.path.join(generated_dir, sorted(files)[-1])
+    
+    # Ưu tiên bản columnar (mmap) đi kèm file JSON nếu có numpy
+    if data_file and columnar_available() and os.path.isdir(columnar_path_for(data_file)):
+        data_file = columnar_path_for(data_file)
+    return data_file
+
+
+def dataset_signature(data_file: str) -> Optional[tuple]:
+    """(đường dẫn, mtime, size) của file đánh dấu một lần generate - đổi khi có dataset mới"""
+    if not data_file:
+        return None
+    if is_sharded(data_file):
+        marker = os.path.join(data_file, MANIFEST_NAME)
+    elif os.path.isdir(data_file):
+        marker = os.path.join(data_file, "meta.json")
+    else:
+        marker = data_file
+    try:
+        stat = os.stat(marker)
+    except OSError:
+        return None
+    return (data_file, stat.st_mtime_ns, stat.st_size)
+
+
 class MockDataLoader:
     def __init__(self, data_file: str = None):
         """Khởi tạo loader với file data"""
-        if not data_file:
-            # Tìm file mới nhất trong thư mục generated
-            generated_dir = os.path.join(os.path.dirname(__file__), "generated")
-            if os.path.exists(generated_dir):
-                files = [f for f in os.listdir(generated_dir) if f.startswith("vietjet_mock_data_") and f.endswith(".json")]
-                if files:
-                    data_file = os.path.join(generated_dir, sorted(files)[-1])
+        data_file = data_file or find_latest_dataset()
         
         if not data_file or not os.path.exists(data_file):
             raise FileNotFoundError("Không tìm thấy file mock data. Hãy chạy scripts/generate_mock_data.py trước.")
         
         self.data_file = data_file
+        self.store = None  # ColumnarFlightStore / ShardedFlightStore, None nếu load JSON
         self.data = self._load_data()
+        self.index = FlightIndex(self.data, self.store)
+        
+        # View đã convert, dựng một lần cho mỗi (tuyến, ngày) / mỗi flight
+        # Các dict này được dùng chung giữa các request => caller chỉ đọc, không sửa
+        self._route_views: Dict[tuple, List[Dict]] = {}
+        self._detail_views: Dict[tuple, Dict] = {}
+        self._views_lock = threading.Lock()
+        
+        # Fare calendar: thống kê theo ngày của từng tuyến + cache theo (tuyến, tháng)
+        self._route_fare_stats: Dict[str, Dict[str, tuple]] = {}
+        self._calendar_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        self._calendar_lock = threading.Lock()
+        
+        # Flights generate động theo (tuyến, ngày) - LRU có giới hạn, dùng chung giữa các thread
+        self._dynamic_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        self._dynamic_lock = threading.Lock()
+        self.dynamic_cache_size = DYNAMIC_CACHE_SIZE
         
     def _load_data(self) -> Dict:
-        """Load data từ file JSON"""
+        """Load data từ file JSON, thư mục columnar (.flights) hoặc thư mục shards (chỉ đọc manifest)"""
+        if is_sharded(self.data_file):
+            self.store = ShardedFlightStore(self.data_file, max_bytes=SHARD_CACHE_BYTES, on_evict=self._drop_date_views)
+            return self.store.data
+        
+        if self.data_file.rstrip(os.sep).endswith(COLUMNAR_SUFFIX):
+            self.store = ColumnarFlightStore(self.data_file)
+            return self.store.data
+        
         with open(self.data_file, 'r', encoding='utf-8') as f:
             return json.load(f)
     
+    def _drop_date_views(self, date_key: str):
+        """Shard của một ngày bị đẩy khỏi LRU => bỏ luôn các view dựng từ ngày đó"""
+        with self._views_lock:
+            for key in list(self._route_views):
+                if key[1] == date_key:
+                    self._route_views.pop(key, None)
+            for location in list(self._detail_views):
+                if location[0] == date_key:
+                    self._detail_views.pop(location, None)
+    
+    def _cache_view(self, views: Dict[tuple, Any], key: tuple, date_key: str, view):
+        """Cache view của một ngày - bỏ qua nếu shard của ngày đó đã bị đẩy ra trong lúc dựng view
+
+        Kiểm tra và ghi cùng lock với _drop_date_views: on_evict chạy sau khi ngày rời LRU, nên
+        view ghi trước lần kiểm tra sẽ bị on_evict bỏ, view dựng sau đó thì không được ghi.
+        """
+        with self._views_lock:
+            if hasattr(self.store, "is_loaded") and not self.store.is_loaded(date_key):
+                return
+            views[key] = view
+    
+    def prewarm(self, days: int = PREWARM_DAYS) -> int:
+        """Đọc trước shard của hôm nay + `days` ngày tới (chỉ với dataset shard)"""
+        if not hasattr(self.store, "prewarm"):
+            return 0
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.store.prewarm((today + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days + 1))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cho /status: dataset đang dùng, index và cache"""
+        stats = {
+            "data_file": self.data_file,
+            "index": self.index.stats(),
+            "route_views": len(self._route_views),
+            "dynamic_cached": len(self._dynamic_cache),
+            "calendar_cached": len(self._calendar_cache)
+        }
+        if hasattr(self.store, "stats"):
+            stats["shards"] = self.store.stats()
+        return stats
+    
     def get_flights_by_route_and_date(self, from_city: str, to_city: str, date: str) -> List[Dict]:
         """Lấy chuyến bay theo tuyến và ngày - Generate động nếu cần"""
         target_date = self._parse_date(date)
@@ -41,10 +172,11 @@ class MockDataLoader:
             # Generate dữ liệu động nếu không có
             flights = self._generate_dynamic_flights(from_city, to_city, from_code, to_code, target_date)
         
-        return flights
+        # Số ghế thật sau các lượt giữ chỗ / đã bán
+        return seat_inventory.apply(flights)
     
-    def _parse_date(self, date: str) -> datetime:
-        """Parse ngày linh hoạt"""
+    def _parse_date(self, date: str, strict: bool = False) -> datetime:
+        """Parse ngày linh hoạt - ngày không hợp lệ thành ngày mai, hoặc ValueError nếu strict"""
         try:
             if date in ["hôm nay", "today"]:
                 return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -54,41 +186,198 @@ class MockDataLoader:
                 return datetime.strptime(date, "%d/%m/%Y")
             else:
                 return datetime.strptime(date, "%Y-%m-%d")
-        except:
+        except (ValueError, TypeError):
+            if strict:
+                raise ValueError(f"Invalid date: {date!r} (expected YYYY-MM-DD or dd/mm/yyyy)")
             return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
     
+    def get_cheapest_flight(self, from_city: str, to_city: str, date: str) -> Optional[Dict]:
+        """Chuyến rẻ nhất theo tuyến và ngày - dùng price index nếu có dữ liệu sẵn"""
+        target_date = self._parse_date(date)
+        from_code, to_code = self._get_airport_codes(from_city, to_city)
+        route_key = f"{from_code}-{to_code}"
+        date_key = target_date.strftime("%Y-%m-%d")
+        
+        offset = self.index.cheapest_offset(route_key, date_key)
+        if offset is not None:
+            return seat_inventory.apply([self._get_existing_flights(from_code, to_code, target_date)[offset]])[0]
+        
+        flights = self._generate_dynamic_flights(from_city, to_city, from_code, to_code, target_date)
+        return seat_inventory.apply([min(flights, key=lambda x: x["price"])])[0] if flights else None
+    
+    def get_fare_calendar(self, from_city: str, to_city: str, start: str, end: str) -> Dict[str, Any]:
+        """Lịch giá: giá thấp nhất/trung vị và số ghế còn của từng ngày trong [start, end]
+        
+        ValueError nếu ngày không hợp lệ hoặc khoảng ngày dài hơn MAX_CALENDAR_DAYS.
+        """
+        start_date, end_date = self._parse_date(start, strict=True), self._parse_date(end, strict=True)
+        if end_date < start_date:
+            start_date, end_date = end_date, start_date
+        if (end_date - start_date).days + 1 > MAX_CALENDAR_DAYS:
+            raise ValueError(f"Date range too long: at most {MAX_CALENDAR_DAYS} days")
+        from_code, to_code = self._get_airport_codes(from_city, to_city)
+        route_key = f"{from_code}-{to_code}"
+        start_key, end_key = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        
+        days = []
+        month = start_date.replace(day=1)
+        while month <= end_date:
+            for day in self._get_month_calendar(from_city, to_city, route_key, month):
+                if start_key <= day["date"] <= end_key:
+                    days.append(day)
+            month = (month + timedelta(days=32)).replace(day=1)
+        
+        # Cache tháng giữ số ghế lúc generate, số ghế đang giữ / đã bán trừ lúc đọc
+        used = seat_inventory.used_by_day(route_key, (day["date"] for day in days))
+        days = [
+            dict(day, seats_left=max(0, day["seats_left"] - used[day["date"]])) if used[day["date"]] else day
+            for day in days
+        ]
+        
+        priced_days = [day for day in days if day["flights"]]
+        return {
+            "route": route_key,
+            "from_city": from_city,
+            "to_city": to_city,
+            "start": start_key,
+            "end": end_key,
+            "days": days,
+            "cheapest_day": min(priced_days, key=lambda x: x["min_price"]) if priced_days else None
+        }
+    
+    def _get_month_calendar(self, from_city: str, to_city: str, route_key: str, month: datetime) -> List[Dict]:
+        """Lịch giá của cả tháng cho một tuyến - cache theo (tuyến, tháng)"""
+        cache_key = (route_key, month.strftime("%Y-%m"))
+        with self._calendar_lock:
+            cached = self._calendar_cache.get(cache_key)
+            if cached is not None:
+                self._calendar_cache.move_to_end(cache_key)
+                return cached
+        
+        stats = self._get_route_fare_stats(route_key)
+        from_code, to_code = route_key.split("-", 1)
+        
+        calendar = []
+        day = month
+        while day.month == month.month:
+            date_key = day.strftime("%Y-%m-%d")
+            entry = stats.get(date_key)
+            if entry is None:
+                # Ngày ngoài dataset => dữ liệu generate động
+                flights = self._generate_dynamic_flights(from_city, to_city, from_code, to_code, day)
+                prices = sorted(f["price"] for f in flights)
+                seats = sum(f["seats_left"] for f in flights)
+                entry = (prices[0], int(statistics.median(prices)), seats, len(prices)) if prices else (0, 0, 0, 0)
+            min_price, median_price, seats_left, count = entry
+            calendar.append({
+                "date": date_key,
+                "weekday": day.strftime("%A"),
+                "min_price": min_price,
+                "median_price": median_price,
+                "seats_left": seats_left,
+                "flights": count
+            })
+            day += timedelta(days=1)
+        
+        with self._calendar_lock:
+            self._calendar_cache[cache_key] = calendar
+            while len(self._calendar_cache) > CALENDAR_CACHE_SIZE:
+                self._calendar_cache.popitem(last=False)
+        return calendar
+    
+    def _get_route_fare_stats(self, route_key: str) -> Dict[str, tuple]:
+        """date → (min, median, seats_left, số chuyến) cho mọi ngày trong dataset của tuyến
+        
+        Dựng một lần từ ma trận giá [ngày × chuyến] (padding NaN) nếu có numpy.
+        """
+        stats = self._route_fare_stats.get(route_key)
+        if stats is not None:
+            return stats
+        
+        dates = [date_key for date_key in self.index.route_dates(route_key) if self.index.prices[(route_key, date_key)][0]]
+        price_lists = [self.index.prices[(route_key, date_key)][0] for date_key in dates]
+        seats = [self.index.seats_left[(route_key, date_key)] for date_key in dates]
+        
+        if np is not None and dates:
+            matrix = np.full((len(dates), max(map(len, price_lists))), np.nan)
+            for row, prices in enumerate(price_lists):
+                matrix[row, :len(prices)] = prices
+            mins = np.nanmin(matrix, axis=1)
+            medians = np.nanmedian(matrix, axis=1)
+            counts = (~np.isnan(matrix)).sum(axis=1)
+            stats = {
+                date_key: (int(mins[i]), int(medians[i]), seats[i], int(counts[i]))
+                for i, date_key in enumerate(dates)
+            }
+        else:
+            stats = {
+                date_key: (prices[0], int(statistics.median(prices)), seats[i], len(prices))
+                for i, (date_key, prices) in enumerate(zip(dates, price_lists))
+            }
+        
+        # Tuyến không có trong dataset (tên tùy ý từ client) không được cache
+        if dates:
+            self._route_fare_stats[route_key] = stats
+        return stats
+    
+    def get_flight_at(self, location: tuple) -> Optional[Dict]:
+        """Flight view tại (date_key, route_key, offset) của index"""
+        date_key, route_key, offset = location
+        from_code, to_code = route_key.split("-", 1)
+        flights = self._get_existing_flights(from_code, to_code, datetime.strptime(date_key, "%Y-%m-%d"))
+        return seat_inventory.apply([flights[offset]])[0] if offset < len(flights) else None
+
     def _get_airport_codes(self, from_city: str, to_city: str) -> tuple:
         """Lấy airport codes"""
-        city_to_code = {}
-        for code, airport in self.data["airports"].items():
-            city_to_code[airport["city"]] = code
-        
-        from_code = city_to_code.get(from_city, from_city)
-        to_code = city_to_code.get(to_city, to_city)
-        return from_code, to_code
+        return self.index.airport_code(from_city), self.index.airport_code(to_city)
     
     def _get_existing_flights(self, from_code: str, to_code: str, target_date: datetime) -> List[Dict]:
         """Lấy flights có sẵn"""
         route_key = f"{from_code}-{to_code}"
         date_key = target_date.strftime("%Y-%m-%d")
         
-        if date_key in self.data["flights_by_date"] and route_key in self.data["flights_by_date"][date_key]:
-            flights = self.data["flights_by_date"][date_key][route_key]
-            return self._convert_flights(flights, target_date)
-        return []
+        views = self._route_views.get((route_key, date_key))
+        if views is None:
+            flights = self.index.get_flights(route_key, date_key)
+            if not flights:
+                return []
+            views = self._convert_flights(flights, target_date)
+            self._cache_view(self._route_views, (route_key, date_key), date_key, views)
+        # List mới (caller có thể sort/filter), các dict bên trong dùng chung
+        return list(views)
     
     def _generate_dynamic_flights(self, from_city: str, to_city: str, from_code: str, to_code: str, target_date: datetime) -> List[Dict]:
-        """Generate flights động cho bất kỳ tuyến và ngày nào"""
-        import random
-        
-        # Tạo seed cố định dựa trên route và ngày để đảm bảo dữ liệu nhất quán
-        seed_string = f"{from_code}-{to_code}-{target_date.strftime('%Y-%m-%d')}"
-        random.seed(hash(seed_string) % (2**32))
+        """Generate flights động cho bất kỳ tuyến và ngày nào - memo theo (tuyến, ngày)
         
+        Kết quả chỉ phụ thuộc (tuyến, ngày) nên mọi worker trả cùng một danh sách.
+        Các dict bên trong dùng chung giữa các request => caller chỉ đọc, không sửa.
+        """
         # Kiểm tra xem có phải tuyến hợp lệ không
         if not self._is_valid_route(from_code, to_code):
             return []
         
+        cache_key = (f"{from_code}-{to_code}", target_date.strftime("%Y-%m-%d"))
+        with self._dynamic_lock:
+            flights = self._dynamic_cache.get(cache_key)
+            if flights is not None:
+                self._dynamic_cache.move_to_end(cache_key)
+                return list(flights)
+        
+        flights = self._build_dynamic_flights(from_code, to_code, target_date)
+        with self._dynamic_lock:
+            # Thread khác có thể đã generate cùng key => giữ bản đầu tiên
+            flights = self._dynamic_cache.setdefault(cache_key, flights)
+            while len(self._dynamic_cache) > self.dynamic_cache_size:
+                self._dynamic_cache.popitem(last=False)
+        return list(flights)
+    
+    def _build_dynamic_flights(self, from_code: str, to_code: str, target_date: datetime) -> List[Dict]:
+        """Dựng danh sách flights của (tuyến, ngày) - tất định, không đụng tới random toàn cục"""
+        # Seed cố định dựa trên route và ngày để đảm bảo dữ liệu nhất quán giữa các process
+        seed = stable_seed(f"{from_code}-{to_code}-{target_date.strftime('%Y-%m-%d')}")
+        from_city = self._get_city_name(from_code)
+        to_city = self._get_city_name(to_code)
+        
         flights = []
         flight_times = ["06:00", "08:30", "10:15", "12:45", "15:20", "17:30", "19:45", "21:15"]
         base_prices = {"HAN-SGN": 1500000, "SGN-HAN": 1500000, "SGN-DAD": 1200000, "DAD-SGN": 1200000}
@@ -97,7 +386,7 @@ class MockDataLoader:
         base_price = base_prices.get(route_key, 1300000)
         
         # Số lượng chuyến bay cố định dựa trên seed
-        num_flights = 5 + (hash(seed_string) % 4)  # 5-8 chuyến
+        num_flights = 5 + (seed % 4)  # 5-8 chuyến
         
         for i, time in enumerate(flight_times[:num_flights]):
             # Tạo giá và mã chuyến cố định dựa trên index
@@ -137,6 +426,10 @@ class MockDataLoader:
         valid_routes = ["HAN-SGN", "SGN-HAN", "SGN-DAD", "DAD-SGN", "SGN-PQC", "PQC-SGN"]
         return f"{from_code}-{to_code}" in valid_routes
     
+    def _get_city_name(self, code: str) -> str:
+        """Tên thành phố chuẩn của airport code (theo dataset)"""
+        return self.data.get("airports", {}).get(code, {}).get("city", code)
+    
     def _get_airport_name(self, code: str) -> str:
         """Lấy tên sân bay"""
         airport_names = {
@@ -158,9 +451,8 @@ class MockDataLoader:
     
     def _convert_flights(self, flights: List[Dict], target_date: datetime) -> List[Dict]:
         """Convert flights với ngày đích"""
-        for flight in flights:
-            flight["date"] = target_date.strftime("%d/%m/%Y")
-            flight["date_display"] = target_date.strftime("%A, %d/%m/%Y")
+        date_str = target_date.strftime("%d/%m/%Y")
+        date_display = target_date.strftime("%A, %d/%m/%Y")
         
         converted_flights = []
         for flight in flights:
@@ -177,14 +469,14 @@ class MockDataLoader:
                 "to_airport": flight.get("to_airport", self._get_airport_name(flight["to_code"])),
                 "route": flight["route"],
                 "route_detail": f"{flight.get('from_airport', '')} → {flight.get('to_airport', '')}",
-                "date": flight["date"],
+                "date": date_str,
                 "time": flight.get("departure_time", flight.get("time")),
                 "price": flight["price"],
                 "seats_left": flight["seats_left"],
                 "class_type": flight["class_type"],
                 "quality": "sovico_premium",
                 "duration": flight.get("duration", "2h00m"),
-                "date_display": flight["date_display"],
+                "date_display": date_display,
                 "weekday": flight.get("weekday", target_date.strftime("%A")),
                 "is_weekend": flight.get("is_weekend", target_date.weekday() >= 5)
             }
@@ -201,13 +493,15 @@ class MockDataLoader:
                     return flight
         
         # Tìm trong tất cả ngày nếu không có thông tin cụ thể
-        for date_data in self.data["flights_by_date"].values():
-            for route_flights in date_data.values():
-                for flight in route_flights:
-                    if flight["flight_id"] == flight_code:
-                        return self._convert_flight_format(flight)
+        location = self.index.locate(flight_code)
+        if location is None:
+            return None
         
-        return None
+        view = self._detail_views.get(location)
+        if view is None:
+            view = self._convert_flight_format(self.index.resolve(location))
+            self._cache_view(self._detail_views, location, location[0], view)
+        return seat_inventory.apply([view])[0]
     
     def _convert_flight_format(self, flight: Dict) -> Dict:
         """Chuyển đổi format flight để tương thích"""
@@ -242,15 +536,120 @@ class MockDataLoader:
             "policies": flight["policies"]
         }
 
+class MockDataReloader:
+    """Hot reload kiểu RCU cho MockDataLoader
+    
+    Thread nền kiểm tra chữ ký dataset (manifest / file JSON mới nhất) mỗi `interval` giây. Khi có
+    dataset mới: dựng MockDataLoader mới (index, prewarm) ở nền rồi thay reference một lần. Request
+    đang chạy vẫn giữ snapshot cũ tới khi xong; request mới nhận snapshot mới.
+    """
+    
+    def __init__(self, interval: float = RELOAD_INTERVAL):
+        self.interval = interval
+        self._loader: Optional[MockDataLoader] = None
+        self._signature: Optional[tuple] = None
+        self._build_lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        
+        self.version = 0
+        self.loaded_at: Optional[str] = None
+        self.last_reload_ms: Optional[float] = None
+        self.last_check: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.stats_counters = {"checks": 0, "reloads": 0, "failures": 0}
+    
+    def current(self) -> MockDataLoader:
+        """Snapshot hiện tại (dựng lần đầu nếu chưa có)"""
+        loader = self._loader
+        if loader is None:
+            with self._build_lock:
+                if self._loader is None:
+                    self._swap(*self._build(find_latest_dataset()))
+                loader = self._loader
+            self._ensure_worker()
+        return loader
+    
+    def _build(self, data_file: Optional[str]):
+        start = time.perf_counter()
+        signature = dataset_signature(data_file)
+        loader = MockDataLoader(data_file)
+        loader.prewarm()
+        return loader, signature, round((time.perf_counter() - start) * 1000, 2)
+    
+    def _swap(self, loader: MockDataLoader, signature: Optional[tuple], build_ms: float):
+        self._loader = loader
+        self._signature = signature
+        self.version += 1
+        self.loaded_at = datetime.now().isoformat()
+        self.last_reload_ms = build_ms
+    
+    def check(self) -> bool:
+        """Reload nếu có dataset mới - True nếu đã swap sang snapshot mới"""
+        self.stats_counters["checks"] += 1
+        self.last_check = datetime.now().isoformat()
+        data_file = find_latest_dataset()
+        signature = dataset_signature(data_file)
+        if signature is None or signature == self._signature:
+            return False
+        
+        with self._build_lock:
+            if signature == self._signature:
+                return False
+            try:
+                loader, signature, build_ms = self._build(data_file)
+            except Exception as e:
+                # Dataset đang ghi dở / lỗi => giữ snapshot cũ, thử lại ở lần kiểm tra sau
+                self.stats_counters["failures"] += 1
+                self.last_error = str(e)
+                print(f"⚠️ Mock data reload failed ({data_file}): {e}")
+                return False
+            self._swap(loader, signature, build_ms)
+            self.stats_counters["reloads"] += 1
+            self.last_error = None
+        print(f"🔄 Mock data reloaded: v{self.version} {data_file} in {build_ms}ms")
+        return True
+    
+    def _ensure_worker(self):
+        if self.interval <= 0 or (self._worker is not None and self._worker.is_alive()):
+            return
+        self._stopped.clear()
+        self._worker = threading.Thread(target=self._run_worker, name="mock-data-reloader", daemon=True)
+        self._worker.start()
+    
+    def _run_worker(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Mock data reload check failed: {e}")
+    
+    def stop(self):
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cho /status: version snapshot, thời gian dựng lần reload gần nhất"""
+        loader = self._loader
+        return {
+            "version": self.version,
+            "data_file": loader.data_file if loader else None,
+            "generated_at": loader.data.get("metadata", {}).get("generated_at") if loader else None,
+            "loaded_at": self.loaded_at,
+            "last_reload_ms": self.last_reload_ms,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "interval": self.interval,
+            **self.stats_counters
+        }
+
 # Global instance
-mock_data_loader = None
+mock_data_reloader = MockDataReloader()
 
 def get_mock_data_loader():
-    """Lấy instance của mock data loader"""
-    global mock_data_loader
-    if mock_data_loader is None:
-        mock_data_loader = MockDataLoader()
-    return mock_data_loader
+    """Snapshot hiện tại của mock data (đổi sang snapshot mới khi dataset được generate lại)"""
+    return mock_data_reloader.current()
 
 # Compatibility functions cho hệ thống cũ
 def get_flights_by_route(from_city: str, to_city: str, date: str = None):
@@ -263,10 +662,11 @@ def get_flights_by_route(from_city: str, to_city: str, date: str = None):
 
 def get_cheapest_flight(from_city: str, to_city: str, date: str = None):
     """Lấy chuyến bay rẻ nhất"""
-    flights = get_flights_by_route(from_city, to_city, date)
-    if flights:
-        return min(flights, key=lambda x: x["price"])
-    return None
+    if not date:
+        date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    
+    loader = get_mock_data_loader()
+    return loader.get_cheapest_flight(from_city, to_city, date)
 
 def get_flight_by_flight_code(flight_code: str, from_city: str = None, to_city: str = None, date: str = None):
     """Tìm chuyến bay theo mã"""
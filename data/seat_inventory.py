@@ -0,0 +1,419 @@
+"""
+Seat inventory - Số ghế còn lại theo thời gian thực cho (flight_id, ngày, giờ bay)
+
+`seats_left` trong mock data là số ghế lúc generate (sức chứa). Inventory đếm số ghế đã
+giữ + đã bán cho từng chuyến, còn lại = seats_left - used:
+
+- hold(flight, seats, ttl)  : giữ chỗ có hạn (từ chối nếu không đủ ghế) → hold_id
+- extend(hold_id, ttl)      : đổi hạn giữ chỗ (PaymentAgent đặt bằng hạn của payment session)
+- confirm(hold_id)          : thanh toán xong, ghế chuyển thành đã bán
+- release(hold_id)          : hủy giữ chỗ, trả ghế
+- apply(flights)            : gắn seats_left thật vào kết quả search (O(1) mỗi chuyến),
+                              sức chứa gốc giữ ở seat_capacity
+
+Ngoài số ghế theo chuyến, ledger đếm tổng theo (tuyến, ngày) => lịch giá / FareEngine chỉ cần
+đọc từng chuyến ở những ngày có người giữ chỗ. Hold hết hạn tự trả ghế (kiểm tra lười ở lần truy cập sau). Ledger chọn theo STATE_BACKEND:
+"sqlite:///..." dùng chung giữa các worker (UPDATE có điều kiện trong transaction),
+còn lại là in-process với lock theo từng nhóm chuyến bay.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.state_backends import shard_for
+
+SEAT_HOLD_TTL = float(os.getenv("SEAT_HOLD_TTL", str(15 * 60)))
+LOCK_STRIPES = 64
+
+
+def _date_key(flight: Dict[str, Any]) -> str:
+    """Ngày YYYY-MM-DD của flight - ngày dạng dd/mm/yyyy (view đã convert) được chuẩn hóa"""
+    date = str(flight.get("date", ""))
+    if "/" in date:
+        try:
+            return datetime.strptime(date, "%d/%m/%Y").strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return date
+
+
+def inventory_key(flight: Dict[str, Any]) -> str:
+    """Key `flight_id|YYYY-MM-DD|HH:MM`"""
+    departure = flight.get("time") or flight.get("departure_time") or ""
+    return f"{flight.get('flight_id', '')}|{_date_key(flight)}|{departure}"
+
+
+def route_day_key(route_key: str, date_key: str) -> str:
+    """Key tổng theo (tuyến, ngày) `SGN-HAN|YYYY-MM-DD` - cho lịch giá, bộ lọc theo ngày"""
+    return f"{route_key}|{date_key}"
+
+
+def flight_day_key(flight: Dict[str, Any]) -> Optional[str]:
+    if not flight.get("from_code") or not flight.get("to_code"):
+        return None
+    return route_day_key(f"{flight['from_code']}-{flight['to_code']}", _date_key(flight))
+
+
+def seat_capacity(flight: Dict[str, Any]) -> int:
+    """Số ghế lúc generate - flight đã qua apply() mang seats_left thật nên giữ sức chứa ở seat_capacity"""
+    return int(flight.get("seat_capacity", flight.get("seats_left", 0)))
+
+
+class MemorySeatLedger:
+    """Ledger trong process - mỗi key khóa theo stripe, hold hết hạn nằm trong một heap"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._used: Dict[str, int] = {}
+        self._day_used: Dict[str, int] = {}
+        self._holds: Dict[str, Dict[str, Any]] = {}
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._expiry: List[tuple] = []
+        self._expiry_lock = threading.Lock()
+        self.expired = 0
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        return self._locks[shard_for(key, LOCK_STRIPES)]
+
+    def expire_due(self, now: float = None) -> int:
+        now = now or time.time()
+        # Peek không cần lock: phần lớn lần gọi không có hold nào tới hạn
+        if not self._expiry or self._expiry[0][0] > now:
+            return 0
+        due = []
+        with self._expiry_lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                due.append(heapq.heappop(self._expiry)[1])
+        expired = 0
+        for hold_id in due:
+            hold = self._holds.get(hold_id)
+            # Hold đã extend thì entry cũ trong heap bị bỏ qua
+            if hold is not None and hold["expires_at"] <= now and self._release(hold_id):
+                expired += 1
+        self.expired += expired
+        return expired
+
+    def _add_day(self, day_key: Optional[str], seats: int):
+        if day_key:
+            with self._lock_for(day_key):
+                self._day_used[day_key] = self._day_used.get(day_key, 0) + seats
+
+    def hold(self, key: str, seats: int, capacity: int, expires_at: float, owner: str = None,
+             day_key: str = None) -> Optional[str]:
+        self.expire_due()
+        with self._lock_for(key):
+            used = self._used.get(key, 0)
+            if used + seats > capacity:
+                return None
+            self._used[key] = used + seats
+            hold_id = uuid.uuid4().hex
+            self._holds[hold_id] = {"key": key, "day_key": day_key, "seats": seats,
+                                    "expires_at": expires_at, "owner": owner}
+        self._add_day(day_key, seats)
+        with self._expiry_lock:
+            heapq.heappush(self._expiry, (expires_at, hold_id))
+        return hold_id
+
+    def extend(self, hold_id: str, expires_at: float) -> bool:
+        self.expire_due()
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            return False
+        with self._lock_for(hold["key"]):
+            if hold_id not in self._holds:
+                return False
+            hold["expires_at"] = expires_at
+        with self._expiry_lock:
+            heapq.heappush(self._expiry, (expires_at, hold_id))
+        return True
+
+    def confirm(self, hold_id: str) -> bool:
+        self.expire_due()
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            return False
+        with self._lock_for(hold["key"]):
+            # Ghế giữ nguyên trong _used (đã bán), chỉ bỏ hold
+            return self._holds.pop(hold_id, None) is not None
+
+    def release(self, hold_id: str) -> bool:
+        return self._release(hold_id)
+
+    def _release(self, hold_id: str) -> bool:
+        hold = self._holds.get(hold_id)
+        if hold is None:
+            return False
+        with self._lock_for(hold["key"]):
+            if self._holds.pop(hold_id, None) is None:
+                return False
+            self._used[hold["key"]] -= hold["seats"]
+        self._add_day(hold["day_key"], -hold["seats"])
+        return True
+
+    def is_active(self, hold_id: str) -> bool:
+        hold = self._holds.get(hold_id)
+        return hold is not None and hold["expires_at"] > time.time()
+
+    def used_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        self.expire_due()
+        used = self._used
+        return {key: used.get(key, 0) for key in keys}
+
+    def used_by_day(self, day_keys: Iterable[str]) -> Dict[str, int]:
+        self.expire_due()
+        used = self._day_used
+        return {day_key: used.get(day_key, 0) for day_key in day_keys}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active_holds": len(self._holds), "tracked_flights": len(self._used), "expired": self.expired}
+
+
+class SQLiteSeatLedger:
+    """Ledger trong SQLite WAL dùng chung giữa các worker
+
+    Mỗi thao tác ghi là một transaction BEGIN IMMEDIATE (khóa ghi của cả file), giữ chỗ là
+    `UPDATE seat_used SET used = used + n WHERE used + n <= capacity` => hai worker không bao
+    giờ cùng lấy được ghế cuối. Hold hết hạn được dọn ở đầu mỗi transaction ghi, còn lúc đọc
+    thì trừ thẳng ra (đọc không cần khóa ghi).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seat_used (key TEXT PRIMARY KEY, used INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seat_day_used (day_key TEXT PRIMARY KEY, used INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seat_holds (hold_id TEXT PRIMARY KEY, key TEXT NOT NULL, "
+            "seats INTEGER NOT NULL, expires_at REAL NOT NULL, owner TEXT, day_key TEXT)"
+        )
+        try:
+            self._conn.execute("ALTER TABLE seat_holds ADD COLUMN day_key TEXT")
+        except sqlite3.OperationalError:
+            pass  # đã có cột
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seat_holds_expiry ON seat_holds(expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seat_holds_key ON seat_holds(key, expires_at)")
+        self.expired = 0
+
+    def _write(self, operation):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_due_locked(time.time())
+                result = operation(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _expire_due_locked(self, now: float):
+        due = self._conn.execute(
+            "SELECT hold_id, key, seats, day_key FROM seat_holds WHERE expires_at <= ?", (now,)
+        ).fetchall()
+        for hold_id, key, seats, day_key in due:
+            self._delete_hold(self._conn, hold_id, key, seats, day_key)
+        self.expired += len(due)
+
+    @staticmethod
+    def _delete_hold(conn, hold_id: str, key: str, seats: int, day_key: Optional[str]):
+        conn.execute("DELETE FROM seat_holds WHERE hold_id = ?", (hold_id,))
+        conn.execute("UPDATE seat_used SET used = used - ? WHERE key = ?", (seats, key))
+        if day_key:
+            conn.execute("UPDATE seat_day_used SET used = used - ? WHERE day_key = ?", (seats, day_key))
+
+    def expire_due(self, now: float = None) -> int:
+        before = self.expired
+        self._write(lambda conn: None)
+        return self.expired - before
+
+    def hold(self, key: str, seats: int, capacity: int, expires_at: float, owner: str = None,
+             day_key: str = None) -> Optional[str]:
+        def operation(conn):
+            conn.execute("INSERT OR IGNORE INTO seat_used VALUES (?, 0)", (key,))
+            cursor = conn.execute(
+                "UPDATE seat_used SET used = used + ? WHERE key = ? AND used + ? <= ?", (seats, key, seats, capacity)
+            )
+            if cursor.rowcount == 0:
+                return None
+            hold_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO seat_holds (hold_id, key, seats, expires_at, owner, day_key) VALUES (?, ?, ?, ?, ?, ?)",
+                (hold_id, key, seats, expires_at, owner, day_key)
+            )
+            if day_key:
+                conn.execute("INSERT OR IGNORE INTO seat_day_used VALUES (?, 0)", (day_key,))
+                conn.execute("UPDATE seat_day_used SET used = used + ? WHERE day_key = ?", (seats, day_key))
+            return hold_id
+        return self._write(operation)
+
+    def extend(self, hold_id: str, expires_at: float) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "UPDATE seat_holds SET expires_at = ? WHERE hold_id = ?", (expires_at, hold_id)
+        ).rowcount == 1)
+
+    def confirm(self, hold_id: str) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "DELETE FROM seat_holds WHERE hold_id = ?", (hold_id,)
+        ).rowcount == 1)
+
+    def release(self, hold_id: str) -> bool:
+        def operation(conn):
+            row = conn.execute("SELECT key, seats, day_key FROM seat_holds WHERE hold_id = ?", (hold_id,)).fetchone()
+            if row is None:
+                return False
+            self._delete_hold(conn, hold_id, *row)
+            return True
+        return self._write(operation)
+
+    def is_active(self, hold_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM seat_holds WHERE hold_id = ?", (hold_id,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def used_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        return self._read_used(keys, "seat_used", "key")
+
+    def used_by_day(self, day_keys: Iterable[str]) -> Dict[str, int]:
+        return self._read_used(day_keys, "seat_day_used", "day_key")
+
+    def _read_used(self, keys: Iterable[str], table: str, column: str) -> Dict[str, int]:
+        """Số ghế đã dùng theo key, trừ các hold đã hết hạn nhưng chưa được dọn"""
+        keys = list(keys)
+        result = dict.fromkeys(keys, 0)
+        if not keys:
+            return result
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            used = self._conn.execute(
+                f"SELECT {column}, used FROM {table} WHERE {column} IN ({placeholders})", keys
+            ).fetchall()
+            expired = self._conn.execute(
+                f"SELECT {column}, SUM(seats) FROM seat_holds WHERE {column} IN ({placeholders}) "
+                f"AND expires_at <= ? GROUP BY {column}",
+                [*keys, time.time()]
+            ).fetchall()
+        for key, count in used:
+            result[key] = count
+        for key, seats in expired:
+            result[key] -= seats
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = self._conn.execute("SELECT COUNT(*) FROM seat_holds").fetchone()[0]
+            tracked = self._conn.execute("SELECT COUNT(*) FROM seat_used").fetchone()[0]
+        return {"active_holds": active, "tracked_flights": tracked, "expired": self.expired}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_ledger(spec: str = None):
+    """Ledger theo STATE_BACKEND - chỉ SQLite có giữ chỗ nguyên tử giữa các worker"""
+    spec = (spec or os.getenv("STATE_BACKEND", "memory")).strip()
+    if spec.startswith("sqlite:///"):
+        return SQLiteSeatLedger(spec[len("sqlite:///"):])
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        print("⚠️ Seat inventory chưa hỗ trợ Redis - dùng ledger in-process (mỗi worker đếm riêng)")
+    return MemorySeatLedger()
+
+
+class SeatInventory:
+    """Giữ chỗ / xác nhận / trả ghế cho các chuyến bay trong mock data"""
+
+    def __init__(self, ledger=None):
+        self._ledger = ledger
+        self._init_lock = threading.Lock()
+        self.stats_counters = {"holds": 0, "rejected": 0, "confirmed": 0, "released": 0}
+
+    @property
+    def ledger(self):
+        if self._ledger is None:
+            with self._init_lock:
+                if self._ledger is None:
+                    self._ledger = create_ledger()
+        return self._ledger
+
+    def hold(self, flight: Dict[str, Any], seats: int = 1, ttl: float = None,
+             owner: str = None) -> Optional[Dict[str, Any]]:
+        """Giữ `seats` ghế trên chuyến `flight` (dict có flight_id, date, time, seats_left), None nếu hết chỗ"""
+        key = inventory_key(flight)
+        expires_at = time.time() + (ttl or SEAT_HOLD_TTL)
+        hold_id = self.ledger.hold(key, seats, seat_capacity(flight), expires_at, owner, flight_day_key(flight))
+        if hold_id is None:
+            self.stats_counters["rejected"] += 1
+            return None
+        self.stats_counters["holds"] += 1
+        return {
+            "hold_id": hold_id,
+            "key": key,
+            "seats": seats,
+            "expires_at": datetime.fromtimestamp(expires_at).isoformat()
+        }
+
+    def extend(self, hold_id: str, ttl: float = None) -> bool:
+        """Đặt lại hạn giữ chỗ = bây giờ + ttl (False nếu hold đã hết hạn / không tồn tại)"""
+        return self.ledger.extend(hold_id, time.time() + (ttl or SEAT_HOLD_TTL))
+
+    def confirm(self, hold_id: str) -> bool:
+        confirmed = self.ledger.confirm(hold_id)
+        self.stats_counters["confirmed"] += confirmed
+        return confirmed
+
+    def release(self, hold_id: str) -> bool:
+        released = self.ledger.release(hold_id)
+        self.stats_counters["released"] += released
+        return released
+
+    def is_active(self, hold_id: str) -> bool:
+        return self.ledger.is_active(hold_id)
+
+    def used_many(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Số ghế đang giữ + đã bán theo inventory_key"""
+        return self.ledger.used_many(keys)
+
+    def used_by_day(self, route_key: str, date_keys: Iterable[str]) -> Dict[str, int]:
+        """Số ghế đang giữ + đã bán của cả tuyến theo từng ngày - date_key → số ghế"""
+        date_keys = list(date_keys)
+        used = self.ledger.used_by_day(route_day_key(route_key, date_key) for date_key in date_keys)
+        return {date_key: used[route_day_key(route_key, date_key)] for date_key in date_keys}
+
+    def available(self, flight: Dict[str, Any]) -> int:
+        used = self.ledger.used_many([inventory_key(flight)])
+        return max(0, seat_capacity(flight) - sum(used.values()))
+
+    def apply(self, flights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """seats_left thật cho danh sách chuyến - chuyến chưa ai giữ/mua giữ nguyên object (view đã cache)"""
+        if not flights:
+            return flights
+        keys = [inventory_key(flight) for flight in flights]
+        used = self.ledger.used_many(keys)
+        if not any(used.values()) and not any("seat_capacity" in flight for flight in flights):
+            return flights
+        return [
+            dict(flight, seats_left=max(0, seat_capacity(flight) - used[key]), seat_capacity=seat_capacity(flight))
+            if used[key] or "seat_capacity" in flight else flight
+            for flight, key in zip(flights, keys)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.ledger.name, "hold_ttl": SEAT_HOLD_TTL, **self.stats_counters, **self.ledger.stats()}
+
+
+# Global instance
+seat_inventory = SeatInventory()
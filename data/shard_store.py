@@ -0,0 +1,243 @@
+"""
+Sharded flight store - Mock data chia theo ngày, load lười từng ngày
+
+Thư mục `vietjet_mock_data.shards/` gồm:
+- manifest.json      : metadata (airports, routes...), và với mỗi ngày: file shard, fingerprint
+                       từng tuyến, tóm tắt từng tuyến (mã chuyến, giá, số ghế, phút khởi hành) để
+                       dựng FlightIndex / FareEngine mà không cần đọc shard nào
+- days/<YYYY-MM-DD>-<fingerprint>.json : {route_key: [flight, ...]} của một ngày
+
+scripts/generate_mock_data.py chỉ generate lại các (ngày, tuyến) có fingerprint thay đổi,
+shard và manifest đều ghi file tạm rồi rename => reader không bao giờ thấy file dở dang.
+Tên shard gắn fingerprint nên file không bị ghi đè: snapshot cũ (hot reload) vẫn đọc được
+shard của lần generate trước. Shard hết được manifest hiện tại tham chiếu được ghi vào
+manifest["retired"] và chỉ bị xóa sau SHARD_RETENTION giây (lâu hơn nhiều so với chu kỳ reload),
+nên worker giữ snapshot cũ hơn một thế hệ vẫn đọc được.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Any, Optional
+
+FORMAT_VERSION = 1
+SHARDS_SUFFIX = ".shards"
+SHARDS_DIR_NAME = "vietjet_mock_data" + SHARDS_SUFFIX
+MANIFEST_NAME = "manifest.json"
+DAYS_DIR = "days"
+# Giữ shard không còn được tham chiếu thêm N giây trước khi xóa - phải lớn hơn MOCK_RELOAD_INTERVAL
+SHARD_RETENTION = float(os.getenv("MOCK_SHARD_RETENTION", "3600"))
+
+
+def is_sharded(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def shard_file_for(date_key: str, fingerprint: str) -> str:
+    """Đường dẫn tương đối (so với thư mục shards) của shard một ngày"""
+    return f"{DAYS_DIR}/{date_key}-{fingerprint[:12]}.json"
+
+
+def _write_json_atomic(path: str, value: Any):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    """Manifest của thư mục shards (None nếu chưa có / khác version)"""
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format_version") == FORMAT_VERSION else None
+
+
+def read_shard(path: str, file_name: str) -> Dict[str, List[Dict]]:
+    with open(os.path.join(path, file_name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def departure_minutes(departure_time: str) -> int:
+    """'HH:MM' → số phút trong ngày"""
+    hour, minute = departure_time.split(":")[:2]
+    return int(hour) * 60 + int(minute)
+
+
+def summarize_routes(routes: Dict[str, List[Dict]]) -> Dict[str, Dict[str, List]]:
+    """Tóm tắt từng tuyến của một ngày cho manifest"""
+    return {
+        route_key: {
+            "flight_ids": [flight["flight_id"] for flight in flights],
+            "prices": [flight["price"] for flight in flights],
+            "seats_left": [flight["seats_left"] for flight in flights],
+            "departure_minutes": [departure_minutes(flight["departure_time"]) for flight in flights]
+        }
+        for route_key, flights in routes.items()
+    }
+
+
+def has_full_summary(entry: Dict[str, Any]) -> bool:
+    """Entry manifest đã có đủ cột (manifest cũ thiếu departure_minutes)"""
+    return all("departure_minutes" in summary for summary in entry["routes"].values())
+
+
+def write_shard(path: str, date_key: str, fingerprint: str, routes: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    """Ghi shard một ngày, trả về entry cho manifest (chưa có fingerprint từng tuyến)"""
+    os.makedirs(os.path.join(path, DAYS_DIR), exist_ok=True)
+    file_name = shard_file_for(date_key, fingerprint)
+    _write_json_atomic(os.path.join(path, file_name), routes)
+    return {"file": file_name, "routes": summarize_routes(routes)}
+
+
+def write_manifest(path: str, manifest: Dict[str, Any]):
+    os.makedirs(path, exist_ok=True)
+    manifest["format_version"] = FORMAT_VERSION
+    _write_json_atomic(os.path.join(path, MANIFEST_NAME), manifest)
+
+
+def remove_unreferenced_shards(path: str, manifest: Dict[str, Any], previous: Optional[Dict[str, Any]] = None,
+                               retention: float = SHARD_RETENTION) -> int:
+    """Đánh dấu shard `manifest` không tham chiếu vào manifest["retired"], xóa shard đã retired quá
+    `retention` giây; trả về số file đã xóa. Gọi trước write_manifest để lưu lại thời điểm retired.
+    """
+    referenced = {entry["file"] for entry in manifest["days"].values()}
+    previous_retired = (previous or {}).get("retired", {})
+    now = time.time()
+    retired: Dict[str, float] = {}
+    days_dir = os.path.join(path, DAYS_DIR)
+    removed = 0
+    for name in os.listdir(days_dir) if os.path.isdir(days_dir) else []:
+        file_name = f"{DAYS_DIR}/{name}"
+        if not name.endswith(".json") or file_name in referenced:
+            continue
+        retired_at = previous_retired.get(file_name, now)
+        if now - retired_at < retention:
+            retired[file_name] = retired_at
+            continue
+        try:
+            os.remove(os.path.join(days_dir, name))
+            removed += 1
+        except OSError:
+            retired[file_name] = retired_at
+    manifest["retired"] = retired
+    return removed
+
+
+class ShardedFlightStore:
+    """Reader cho thư mục shards - chỉ đọc manifest khi khởi tạo, shard ngày được đọc ở lần truy cập đầu
+
+    Các ngày đã đọc nằm trong LRU giới hạn theo tổng kích thước file shard (max_bytes), ngày ít
+    dùng bị đẩy ra => bộ nhớ không tăng theo số ngày của lịch bay. on_evict(date_key) báo cho
+    loader bỏ các view đã dựng từ ngày đó.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024,
+                 on_evict: Callable[[str], None] = None):
+        self.path = path
+        manifest = read_manifest(path)
+        if manifest is None:
+            raise ValueError(f"Missing or unsupported shard manifest in {path}")
+
+        self.days: Dict[str, Dict[str, Any]] = manifest.pop("days")
+        manifest.pop("retired", None)
+        # Phần metadata giống file JSON (airports, routes...), trừ flights_by_date
+        self.data = manifest
+
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        # date_key -> (routes, kích thước file)
+        self._loaded: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats_counters = {"hits": 0, "loads": 0, "evictions": 0, "missing": 0}
+
+    def summaries(self):
+        """(route_key, date_key, flight_ids, prices, seats_left, departure_minutes) của mọi segment - từ manifest
+
+        departure_minutes là None với manifest generate trước khi có cột này.
+        """
+        for date_key, entry in self.days.items():
+            for route_key, summary in entry["routes"].items():
+                yield (route_key, date_key, summary["flight_ids"], summary["prices"], summary["seats_left"],
+                       summary.get("departure_minutes"))
+
+    def _day(self, date_key: str) -> Dict[str, List[Dict]]:
+        with self._lock:
+            loaded = self._loaded.get(date_key)
+            if loaded is not None:
+                self._loaded.move_to_end(date_key)
+                self.stats_counters["hits"] += 1
+                return loaded[0]
+        entry = self.days.get(date_key)
+        if entry is None:
+            return {}
+
+        # Đọc file ngoài lock => request vào ngày khác không phải chờ
+        try:
+            routes = read_shard(self.path, entry["file"])
+            size = os.path.getsize(os.path.join(self.path, entry["file"]))
+        except FileNotFoundError:
+            # Snapshot quá cũ (reload lỗi lâu hơn SHARD_RETENTION) => ngày trống thay vì lỗi 500,
+            # snapshot mới từ MockDataReloader sẽ có shard đúng
+            self.stats_counters["missing"] += 1
+            print(f"⚠️ Shard missing for {date_key} ({entry['file']}) - snapshot outdated, waiting for reload")
+            return {}
+        evicted = []
+        with self._lock:
+            loaded = self._loaded.get(date_key)
+            if loaded is not None:
+                return loaded[0]
+            self._loaded[date_key] = (routes, size)
+            self._bytes += size
+            self.stats_counters["loads"] += 1
+            # Luôn giữ lại ít nhất ngày vừa đọc
+            while self._bytes > self.max_bytes and len(self._loaded) > 1:
+                old_key, (_, old_size) = self._loaded.popitem(last=False)
+                self._bytes -= old_size
+                self.stats_counters["evictions"] += 1
+                evicted.append(old_key)
+        if self.on_evict:
+            for old_key in evicted:
+                self.on_evict(old_key)
+        return routes
+
+    def is_loaded(self, date_key: str) -> bool:
+        """Ngày còn trong LRU không (loader chỉ cache view của ngày còn được giữ)"""
+        with self._lock:
+            return date_key in self._loaded
+
+    def prewarm(self, date_keys: Iterable[str]) -> int:
+        """Đọc trước các ngày (thường là hôm nay + N ngày tới), trả về số ngày có shard"""
+        warmed = 0
+        for date_key in date_keys:
+            if date_key in self.days:
+                self._day(date_key)
+                warmed += 1
+        return warmed
+
+    def get_flights(self, route_key: str, date_key: str) -> List[Dict]:
+        return self._day(date_key).get(route_key, [])
+
+    def get_flight(self, route_key: str, date_key: str, offset: int) -> Optional[Dict]:
+        flights = self.get_flights(route_key, date_key)
+        return flights[offset] if offset < len(flights) else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "days": len(self.days),
+                "loaded_days": len(self._loaded),
+                "loaded_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self.stats_counters
+            }
+
+    def close(self):
+        with self._lock:
+            self._loaded.clear()
+            self._bytes = 0
@@ -4,42 +4,49 @@ User Data Manager - Quản lý thông tin người dùng
 
 import json
 import os
+import threading
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import uuid
 
+from data.user_store import UserStore
+
 class UserDataManager:
     """Quản lý dữ liệu người dùng"""
     
-    def __init__(self, data_file: str = None):
+    def __init__(self, data_file: str = None, db_file: str = None):
         if not data_file:
             data_dir = os.path.join(os.path.dirname(__file__), "generated")
             os.makedirs(data_dir, exist_ok=True)
             data_file = os.path.join(data_dir, "user_data.json")
         
+        # data_file (JSON) chỉ còn dùng để migrate dữ liệu cũ sang SQLite
         self.data_file = data_file
-        self.users = self._load_users()
-    
-    def _load_users(self) -> Dict[str, Any]:
-        """Load dữ liệu user từ file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                pass
-        
-        # Tạo dữ liệu mặc định
-        return {
-            "users": {},
-            "bookings": {},
-            "preferences": {}
-        }
-    
-    def _save_users(self):
-        """Lưu dữ liệu user vào file"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.users, f, ensure_ascii=False, indent=2)
+        self.db_file = db_file or os.path.splitext(data_file)[0] + ".db"
+        self.store = UserStore(
+            self.db_file,
+            batch_size=int(os.getenv("USER_STORE_BATCH_SIZE", "64")),
+            flush_interval=float(os.getenv("USER_STORE_FLUSH_INTERVAL", "0.5"))
+        )
+        # Khóa cho các thao tác read-modify-write (update_user, add_booking...)
+        self._lock = threading.RLock()
+        self._migrate_legacy_file()
+    
+    def _migrate_legacy_file(self):
+        """Import user_data.json cũ vào SQLite nếu DB còn trống"""
+        if self.store.count_users() or not os.path.exists(self.data_file):
+            return
+        try:
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return
+        imported = self.store.import_legacy(legacy)
+        print(f"📦 Migrated {imported} users from {self.data_file} to {self.db_file}")
+    
+    def flush(self):
+        """Ghi ngay các thay đổi đang chờ group commit"""
+        self.store.flush()
     
     def create_user(self, user_info: Dict[str, Any]) -> str:
         """Tạo user mới"""
@@ -60,142 +67,120 @@ class UserDataManager:
             "total_bookings": 0
         }
         
-        self.users["users"][user_id] = user_data
-        self.users["preferences"][user_id] = {
+        self.store.put_user(user_data)
+        self.store.put_preferences(user_id, {
             "preferred_airlines": ["VietJet Air"],
             "preferred_class": "Economy",
             "preferred_payment": "momo",
             "notification_email": True,
             "notification_sms": True
-        }
-        
-        self._save_users()
+        })
         return user_id
     
     def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Lấy thông tin user"""
-        return self.users["users"].get(user_id)
+        return self.store.get_user(user_id)
     
     def update_user(self, user_id: str, updates: Dict[str, Any]) -> bool:
         """Cập nhật thông tin user"""
-        if user_id not in self.users["users"]:
-            return False
-        
-        user_data = self.users["users"][user_id]
-        user_data.update(updates)
-        user_data["updated_at"] = datetime.now().isoformat()
-        
-        self._save_users()
-        return True
+        with self._lock:
+            user_data = self.store.get_user(user_id)
+            if not user_data:
+                return False
+            
+            user_data.update(updates)
+            user_data["updated_at"] = datetime.now().isoformat()
+            
+            self.store.put_user(user_data)
+            return True
     
     def find_user_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
         """Tìm user theo số điện thoại"""
-        for user_id, user_data in self.users["users"].items():
-            if user_data.get("phone") == phone:
-                return user_data
-        return None
+        return self.store.find_user("phone", phone)
     
     def find_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Tìm user theo email"""
-        for user_id, user_data in self.users["users"].items():
-            if user_data.get("email") == email:
-                return user_data
-        return None
+        return self.store.find_user("email", email)
     
     def add_booking(self, user_id: str, booking_data: Dict[str, Any]) -> str:
         """Thêm booking cho user"""
-        booking_id = str(uuid.uuid4())
-        
-        booking_record = {
-            "booking_id": booking_id,
-            "user_id": user_id,
-            "service_type": booking_data.get("service_type"),
-            "service_id": booking_data.get("service_id"),
-            "booking_reference": booking_data.get("booking_reference"),
-            "confirmation_code": booking_data.get("confirmation_code"),
-            "total_amount": booking_data.get("total_amount", 0),
-            "payment_status": booking_data.get("payment_status", "pending"),
-            "booking_status": booking_data.get("booking_status", "pending"),
-            "created_at": datetime.now().isoformat(),
-            "booking_details": booking_data
-        }
-        
-        self.users["bookings"][booking_id] = booking_record
-        
-        # Cập nhật thống kê user
-        if user_id in self.users["users"]:
-            self.users["users"][user_id]["total_bookings"] += 1
-            if booking_data.get("payment_status") == "completed":
-                points = int(booking_data.get("total_amount", 0) / 10000)  # 1 điểm/10k VNĐ
-                self.users["users"][user_id]["loyalty_points"] += points
-        
-        self._save_users()
-        return booking_id
+        with self._lock:
+            booking_id = str(uuid.uuid4())
+            
+            booking_record = {
+                "booking_id": booking_id,
+                "user_id": user_id,
+                "service_type": booking_data.get("service_type"),
+                "service_id": booking_data.get("service_id"),
+                "booking_reference": booking_data.get("booking_reference"),
+                "confirmation_code": booking_data.get("confirmation_code"),
+                "total_amount": booking_data.get("total_amount", 0),
+                "payment_status": booking_data.get("payment_status", "pending"),
+                "booking_status": booking_data.get("booking_status", "pending"),
+                "created_at": datetime.now().isoformat(),
+                "booking_details": booking_data
+            }
+            
+            self.store.put_booking(booking_record)
+            
+            # Cập nhật thống kê user
+            user = self.store.get_user(user_id)
+            if user:
+                user["total_bookings"] += 1
+                if booking_data.get("payment_status") == "completed":
+                    points = int(booking_data.get("total_amount", 0) / 10000)  # 1 điểm/10k VNĐ
+                    user["loyalty_points"] += points
+                self.store.put_user(user)
+            
+            return booking_id
     
     def get_user_bookings(self, user_id: str) -> List[Dict[str, Any]]:
-        """Lấy danh sách booking của user"""
-        bookings = []
-        for booking_id, booking_data in self.users["bookings"].items():
-            if booking_data["user_id"] == user_id:
-                bookings.append(booking_data)
-        
-        # Sắp xếp theo thời gian tạo (mới nhất trước)
-        return sorted(bookings, key=lambda x: x["created_at"], reverse=True)
+        """Lấy danh sách booking của user (mới nhất trước)"""
+        return self.store.get_user_bookings(user_id)
     
     def get_booking(self, booking_id: str) -> Optional[Dict[str, Any]]:
         """Lấy thông tin booking"""
-        return self.users["bookings"].get(booking_id)
+        return self.store.get_booking(booking_id)
     
     def update_booking_status(self, booking_id: str, status: str, payment_status: str = None) -> bool:
         """Cập nhật trạng thái booking"""
-        if booking_id not in self.users["bookings"]:
-            return False
-        
-        booking = self.users["bookings"][booking_id]
-        booking["booking_status"] = status
-        
-        if payment_status:
-            booking["payment_status"] = payment_status
-        
-        booking["updated_at"] = datetime.now().isoformat()
-        
-        self._save_users()
-        return True
+        with self._lock:
+            booking = self.store.get_booking(booking_id)
+            if not booking:
+                return False
+            
+            booking["booking_status"] = status
+            
+            if payment_status:
+                booking["payment_status"] = payment_status
+            
+            booking["updated_at"] = datetime.now().isoformat()
+            
+            self.store.put_booking(booking)
+            return True
     
     def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
         """Lấy preferences của user"""
-        return self.users["preferences"].get(user_id, {})
+        return self.store.get_preferences(user_id) or {}
     
     def update_user_preferences(self, user_id: str, preferences: Dict[str, Any]) -> bool:
         """Cập nhật preferences của user"""
-        if user_id not in self.users["users"]:
-            return False
-        
-        if user_id not in self.users["preferences"]:
-            self.users["preferences"][user_id] = {}
-        
-        self.users["preferences"][user_id].update(preferences)
-        self._save_users()
-        return True
+        with self._lock:
+            if not self.store.get_user(user_id):
+                return False
+            
+            current = self.store.get_preferences(user_id) or {}
+            current.update(preferences)
+            self.store.put_preferences(user_id, current)
+            return True
     
     def get_frequent_travelers(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Lấy danh sách khách hàng thường xuyên"""
-        users = list(self.users["users"].values())
-        sorted_users = sorted(users, key=lambda x: x.get("total_bookings", 0), reverse=True)
-        return sorted_users[:limit]
+        return self.store.top_users(limit)
     
     def search_users(self, query: str) -> List[Dict[str, Any]]:
         """Tìm kiếm user theo tên, email, phone"""
-        results = []
-        query_lower = query.lower()
-        
-        for user_data in self.users["users"].values():
-            if (query_lower in user_data.get("full_name", "").lower() or
-                query_lower in user_data.get("email", "").lower() or
-                query_lower in user_data.get("phone", "")):
-                results.append(user_data)
-        
-        return results
+        return self.store.search_users(query)
     
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Lấy thống kê của user"""
@@ -0,0 +1,212 @@
+"""
+User Store - Lưu user/booking/preferences trong SQLite (WAL) có index phụ
+
+Thay cho việc ghi lại toàn bộ user_data.json ở mỗi thay đổi:
+- Mỗi thay đổi chỉ ghi đúng một dòng
+- Index trên phone, email, total_bookings và (user_id, created_at) của bookings
+- Group commit: gom nhiều thay đổi vào một transaction, commit khi đủ batch_size
+  hoặc sau flush_interval giây (WAL + synchronous=NORMAL => fsync theo batch)
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    phone TEXT,
+    email TEXT,
+    total_bookings INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_total_bookings ON users(total_bookings);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS preferences (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _casefold(value: Optional[str]) -> Optional[str]:
+    return value.casefold() if isinstance(value, str) else value
+
+
+def _escape_like(value: str) -> str:
+    """Input của user là chuỗi thường, không phải pattern: escape wildcard của LIKE"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class UserStore:
+    """SQLite store cho UserDataManager"""
+
+    def __init__(self, db_path: str, batch_size: int = 64, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # isolation_level=None => tự quản lý BEGIN/COMMIT để group commit
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # lower()/LIKE của SQLite chỉ fold ASCII => tên tiếng Việt (Đặng, Ánh...) dùng str.casefold
+        self._conn.create_function("casefold", 1, _casefold, deterministic=True)
+        self._conn.executescript(_SCHEMA)
+
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    # ------------------------------------------------------------------
+    # Transaction / group commit
+    # ------------------------------------------------------------------
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            if not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            self._conn.execute(sql, params)
+            self._pending += 1
+
+            if self._pending >= self.batch_size:
+                self._commit()
+            elif self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            elif self.flush_interval <= 0:
+                self._commit()
+
+    def _commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+        self._pending = 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def flush(self):
+        """Commit các thay đổi đang chờ"""
+        with self._lock:
+            try:
+                self._commit()
+            except sqlite3.ProgrammingError:
+                pass  # connection đã đóng
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+
+    def put_user(self, user: Dict[str, Any]):
+        self._write(
+            "INSERT OR REPLACE INTO users (user_id, phone, email, total_bookings, data) VALUES (?, ?, ?, ?, ?)",
+            (user["user_id"], user.get("phone", ""), user.get("email", ""),
+             user.get("total_bookings", 0), json.dumps(user, ensure_ascii=False))
+        )
+
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM users WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def find_user(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        """Tìm theo cột có index (phone / email)"""
+        if field not in ("phone", "email"):
+            raise ValueError(f"Unindexed user field: {field}")
+        rows = self._query(f"SELECT data FROM users WHERE {field} = ? LIMIT 1", (value,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def top_users(self, limit: int) -> List[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM users ORDER BY total_bookings DESC LIMIT ?", (limit,))
+        return [json.loads(row[0]) for row in rows]
+
+    def search_users(self, query: str) -> List[Dict[str, Any]]:
+        """Tìm theo tên, email, phone (chứa chuỗi, không phân biệt hoa thường kể cả chữ có dấu)"""
+        pattern = f"%{_escape_like(query.casefold())}%"
+        rows = self._query(
+            "SELECT data FROM users WHERE casefold(json_extract(data, '$.full_name')) LIKE ? ESCAPE '\\' "
+            "OR casefold(email) LIKE ? ESCAPE '\\' OR phone LIKE ? ESCAPE '\\'",
+            (pattern, pattern, pattern)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def count_users(self) -> int:
+        return self._query("SELECT COUNT(*) FROM users")[0][0]
+
+    # ------------------------------------------------------------------
+    # Bookings
+    # ------------------------------------------------------------------
+
+    def put_booking(self, booking: Dict[str, Any]):
+        self._write(
+            "INSERT OR REPLACE INTO bookings (booking_id, user_id, created_at, data) VALUES (?, ?, ?, ?)",
+            (booking["booking_id"], booking["user_id"], booking["created_at"], json.dumps(booking, ensure_ascii=False))
+        )
+
+    def get_booking(self, booking_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM bookings WHERE booking_id = ?", (booking_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_user_bookings(self, user_id: str) -> List[Dict[str, Any]]:
+        """Booking của user, mới nhất trước (dùng index (user_id, created_at))"""
+        rows = self._query(
+            "SELECT data FROM bookings WHERE user_id = ? ORDER BY created_at DESC", (user_id,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Preferences
+    # ------------------------------------------------------------------
+
+    def put_preferences(self, user_id: str, preferences: Dict[str, Any]):
+        self._write(
+            "INSERT OR REPLACE INTO preferences (user_id, data) VALUES (?, ?)",
+            (user_id, json.dumps(preferences, ensure_ascii=False))
+        )
+
+    def get_preferences(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT data FROM preferences WHERE user_id = ?", (user_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def import_legacy(self, legacy: Dict[str, Any]) -> int:
+        """Import dữ liệu từ user_data.json cũ (chạy một lần khi DB còn trống)"""
+        with self._lock:
+            for user in legacy.get("users", {}).values():
+                self.put_user(user)
+            for booking in legacy.get("bookings", {}).values():
+                self.put_booking(booking)
+            for user_id, preferences in legacy.get("preferences", {}).items():
+                self.put_preferences(user_id, preferences)
+            self.flush()
+        return len(legacy.get("users", {}))
@@ -0,0 +1,103 @@
+"""
+Batch Runner - Chạy hàng loạt (user_id, message) qua orchestrator dùng chung (/chat/batch, scripts/chat_batch.py)
+
+- Message của cùng một user chạy tuần tự theo thứ tự input (context hội thoại giống chat thật)
+- Các user khác nhau chạy song song, tối đa `concurrency` user cùng lúc
+- Prompt extract của các user đang chạy được gom thành llm.abatch (utils.llm_batcher)
+- Kết quả trả về ngay khi xong (không theo thứ tự input) - mỗi dòng mang `index` của dòng input
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from contextvars import copy_context
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from utils.llm_batcher import llm_batching
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+
+
+def parse_jsonl(lines: Iterable[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Dòng JSONL {"user_id", "message"} => (items, lỗi theo từng dòng); index = số thứ tự dòng (từ 0)"""
+    items, errors = [], []
+    for index, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            errors.append({"index": index, "error": f"Invalid JSON: {e}"})
+            continue
+        if not isinstance(record, dict) or not isinstance(record.get("user_id"), str) \
+                or not isinstance(record.get("message"), str):
+            errors.append({"index": index, "error": "Each line needs string fields user_id and message"})
+            continue
+        items.append({"index": index, "user_id": record["user_id"], "message": record["message"]})
+    return items, errors
+
+
+def group_by_user(items: List[Dict[str, Any]]) -> "OrderedDict[str, List[Dict[str, Any]]]":
+    """Nhóm theo user_id, giữ thứ tự message trong từng user"""
+    groups: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+    for item in items:
+        groups.setdefault(item["user_id"], []).append(item)
+    return groups
+
+
+async def run_batch(orchestrator, items: List[Dict[str, Any]], concurrency: int = None,
+                    include_context: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Chạy items qua orchestrator.process_message, yield kết quả theo thứ tự hoàn thành"""
+    concurrency = max(1, min(concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    groups: asyncio.Queue = asyncio.Queue()
+    for messages in group_by_user(items).values():
+        groups.put_nowait(messages)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def process(item: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        result = {"index": item["index"], "user_id": item["user_id"]}
+        try:
+            output = await orchestrator.process_message(item["user_id"], item["message"])
+            result["response"] = output.get("response", "")
+            result["suggestions"] = output.get("suggestions", [])
+            if include_context:
+                result["context"] = output.get("context", {})
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    async def worker():
+        while True:
+            try:
+                messages = groups.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            for item in messages:
+                results.put_nowait(await process(item))
+        results.put_nowait(None)
+
+    workers = []
+    for _ in range(min(concurrency, groups.qsize())):
+        # Mỗi worker một context riêng (span hiện tại của tracer là ContextVar), đều bật llm_batching
+        context = copy_context()
+        context.run(llm_batching.set, True)
+        workers.append(asyncio.create_task(worker(), context=context))
+
+    try:
+        remaining = len(workers)
+        while remaining:
+            result = await results.get()
+            if result is None:
+                remaining -= 1
+            else:
+                yield result
+    finally:
+        # Client ngắt kết nối giữa chừng => dừng các user chưa chạy xong
+        for task in workers:
+            task.cancel()
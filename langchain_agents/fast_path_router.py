@@ -0,0 +1,297 @@
+"""
+Fast Path Router - Trả lời tìm chuyến / hỏi giá bằng NLU tất định, không gọi LLM
+
+Tầng 1 (fast path): VietnameseNLU, SemanticParser và SmartIntentAgent cùng đồng ý
+intent (flight_search / price_check) với độ tin cậy đủ cao và đủ slot bắt buộc
+(điểm đi, điểm đến, ngày) => gọi thẳng SearchAgent / PriceAgent, render theo template.
+Tầng 2: mọi trường hợp còn lại escalate sang IntelligentReasoningAgent (3 bước LLM).
+
+Kết quả fast path có cùng dạng với IntelligentReasoningAgent.process() để
+SmartBookingOrchestrator merge session context như bình thường.
+"""
+
+import json
+import os
+import time
+from collections import Counter
+from typing import Dict, Any, Optional
+
+from agents.search_agent import SearchAgent
+from models.schemas import AgentRequest, ConversationContext
+from utils.async_bridge import async_bridge
+from utils.gazetteer import gazetteer
+from utils.logger import get_logger
+from utils.nlu import VietnameseNLU
+from utils.semantic_parser import SemanticParser
+from utils.tracing import tracer
+
+try:
+    from agents.price_agent import PriceAgent
+except ImportError:
+    PriceAgent = None
+
+
+log = get_logger("langchain_agents.fast_path_router")
+
+# intent của SemanticParser -> intent của VietnameseNLU
+SEMANTIC_TO_NLU_INTENT = {
+    "search": "flight_search",
+    "price_check": "price_check",
+}
+
+FAST_PATH_INTENTS = ("flight_search", "price_check")
+
+
+class FastPathRouter:
+    """Router 2 tầng: rule-first, LLM khi các parser không chắc chắn"""
+
+    def __init__(self, min_confidence: float = None, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+        self.min_confidence = min_confidence if min_confidence is not None else float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.6"))
+        self.nlu = VietnameseNLU()
+        self.semantic_parser = SemanticParser()
+        self.search_agent = SearchAgent()
+        self.price_agent = PriceAgent() if PriceAgent else None
+
+        self.requests = 0
+        self.hits = 0
+        self.hits_by_intent: Counter = Counter()
+        self.escalations: Counter = Counter()
+        self.fast_path_ms = 0.0
+
+    def decide(self, message: str, booking_decision: Dict[str, Any] = None) -> Dict[str, Any]:
+        """So khớp kết quả các parser tất định
+
+        Trả về {"fast_path": bool, "reason", "intent", "confidence", "slots"}
+        """
+        nlu_intent, nlu_slots = self.nlu.process(message)
+        scores = self.nlu.intent_scores(message)
+        details = self.semantic_parser.extract_intent_details(message)
+        semantic_info = details["semantic_info"]
+
+        semantic_intent = SEMANTIC_TO_NLU_INTENT.get(details["intent_type"])
+        if semantic_intent == "flight_search" and (semantic_info.get("price_range") or {}).get("type") == "cheapest":
+            semantic_intent = "price_check"
+
+        decision = {"fast_path": False, "intent": nlu_intent, "confidence": 0.0, "slots": {}}
+
+        if nlu_intent not in FAST_PATH_INTENTS:
+            return dict(decision, reason="unsupported_intent")
+        if semantic_intent != nlu_intent:
+            return dict(decision, reason="intent_disagreement")
+
+        # Độ tin cậy NLU = tỷ trọng điểm của intent thắng trên tổng điểm
+        total = sum(scores.values())
+        nlu_confidence = scores.get(nlu_intent, 0.0) / total if total else 0.0
+
+        # SmartIntentAgent đã chạy trong should_proceed_with_booking: chọn search thì góp độ tin cậy,
+        # "unknown" (không nhận ra intent nào) là bỏ phiếu trắng, chọn intent khác (đặt vé, hỏi thông tin) thì chặn
+        booking_decision = booking_decision or {}
+        smart_intent = booking_decision.get("intent") or "unknown"
+        if smart_intent == "unknown":
+            confidence = round(nlu_confidence, 4)
+        elif smart_intent == "search_flight":
+            confidence = round(min(nlu_confidence, booking_decision.get("confidence", 0.0)), 4)
+        else:
+            confidence = 0.0
+        decision["confidence"] = confidence
+        if confidence < self.min_confidence:
+            return dict(decision, reason="low_confidence")
+
+        slots, conflict = self._merge_slots(nlu_slots, semantic_info)
+        decision["slots"] = slots
+        if conflict:
+            return dict(decision, reason="slot_conflict")
+        if not (slots.get("from_city") and slots.get("to_city") and slots.get("date")):
+            return dict(decision, reason="missing_slots")
+
+        return dict(decision, fast_path=True, reason="confident")
+
+    def _merge_slots(self, nlu_slots: Dict[str, Any], semantic_info: Dict[str, Any]) -> tuple:
+        """Gộp slot của NLU (IATA) và SemanticParser (city) - (slots, có mâu thuẫn không)"""
+        locations = semantic_info.get("locations") or {}
+        time_info = semantic_info.get("time_info") or {}
+        slots = {}
+
+        for slot, key in (("from_city", "from"), ("to_city", "to")):
+            nlu_place = gazetteer.resolve(nlu_slots.get(slot) or "", fuzzy=False)
+            semantic_place = gazetteer.resolve(locations.get(key) or "", fuzzy=False)
+            if nlu_place and semantic_place and nlu_place.iata != semantic_place.iata:
+                return slots, True
+            place = nlu_place or semantic_place
+            if place:
+                slots[slot] = place.city
+
+        nlu_date, semantic_date = nlu_slots.get("date"), time_info.get("date")
+        if nlu_date and semantic_date and nlu_date != semantic_date:
+            return slots, True
+        if nlu_date or semantic_date:
+            slots["date"] = nlu_date or semantic_date
+            slots["date_text"] = time_info.get("original", "")
+
+        if nlu_slots.get("selection_criteria") == "cheapest":
+            slots["selection_criteria"] = "cheapest"
+        return slots, False
+
+    async def route(self, message: str, context: Dict[str, Any] = None,
+                    booking_decision: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Kết quả dạng IntelligentReasoningAgent.process() nếu đi fast path, None nếu cần LLM"""
+        self.requests += 1
+        if not self.enabled:
+            self.escalations["disabled"] += 1
+            return None
+
+        start = time.perf_counter()
+        with tracer.span("nlu") as span:
+            decision = self.decide(message, booking_decision)
+            span.set(intent=decision["intent"], confidence=decision["confidence"], reason=decision["reason"])
+        log.debug("Fast path decision: %s (intent=%s, confidence=%s)", decision['reason'], decision['intent'], decision['confidence'])
+        if not decision["fast_path"]:
+            self.escalations[decision["reason"]] += 1
+            return None
+
+        slots = decision["slots"]
+        try:
+            with tracer.span(f"agent.{decision['intent']}"):
+                if decision["intent"] == "price_check":
+                    execution_result = await self._call_price_agent(slots)
+                else:
+                    execution_result = await async_bridge.run("SearchAgent", self._call_search_agent, message, slots)
+        except Exception as e:
+            log.debug("Fast path agent failed: %s", e)
+            execution_result = {"success": False, "error": str(e)}
+
+        if not execution_result.get("success"):
+            self.escalations["agent_error"] += 1
+            return None
+
+        with tracer.span("render"):
+            response = self._render(decision["intent"], slots, execution_result)
+        self.hits += 1
+        self.hits_by_intent[decision["intent"]] += 1
+        self.fast_path_ms += (time.perf_counter() - start) * 1000
+        return self._build_result(context, decision, slots, execution_result, response)
+
+    def _call_search_agent(self, message: str, slots: Dict[str, Any]) -> Dict[str, Any]:
+        request = AgentRequest(
+            intent="flight_search",
+            user_input=message,
+            slots={
+                "from_city": slots["from_city"],
+                "to_city": slots["to_city"],
+                "date": slots["date"],
+                "user_input": message.lower()
+            },
+            context=ConversationContext(user_id="session_user")
+        )
+        result = self.search_agent.process_sync(request)
+        # Không có chuyến vẫn là câu trả lời hợp lệ - chỉ escalate khi agent lỗi
+        return {
+            "success": result.success or "flights" in result.data,
+            "agent": "SearchAgent",
+            "data": result.data,
+            "message": result.message
+        }
+
+    async def _call_price_agent(self, slots: Dict[str, Any]) -> Dict[str, Any]:
+        if self.price_agent is None:
+            return {"success": False, "error": "PriceAgent not available"}
+
+        # "tuần sau", "tháng này"... PriceAgent tra cả khoảng ngày
+        data = await self.price_agent.search_prices(
+            slots["from_city"], slots["to_city"], slots["date"], date_text=slots.get("date_text", ""),
+            price_intent="find_cheapest" if slots.get("selection_criteria") == "cheapest" else "check_price"
+        )
+        return {
+            "success": data.get("success", False),
+            "agent": "PriceAgent",
+            "data": data,
+            "message": data.get("error", "")
+        }
+
+    def _render(self, intent: str, slots: Dict[str, Any], execution_result: Dict[str, Any]) -> str:
+        """Template trả lời - cùng giọng với synthesize của IntelligentReasoningAgent"""
+        data = execution_result.get("data", {})
+        from_name = self._display_name(slots["from_city"])
+        to_name = self._display_name(slots["to_city"])
+        when = slots.get("date_text") or slots["date"]
+
+        if intent == "price_check":
+            if data.get("type") == "cheapest":
+                flight = data.get("flight")
+                if not flight:
+                    return f"😔 Hiện chưa có vé từ {from_name} đến {to_name} {when}. Bạn muốn thử ngày khác không?"
+                return (f"💰 Vé rẻ nhất từ {from_name} đến {to_name} {when}:\n"
+                        f"{self._flight_line(flight)}\n\n"
+                        f"Bạn muốn đặt chuyến này không?")
+            flights = data.get("flights") or []
+            if not flights:
+                return f"😔 Hiện chưa có vé từ {from_name} đến {to_name} {when}. Bạn muốn thử ngày khác không?"
+            price_range = data.get("price_range") or {}
+            lines = [f"💰 Giá vé từ {from_name} đến {to_name} {when}: "
+                     f"{price_range.get('min', 0):,} - {price_range.get('max', 0):,} VNĐ"]
+            lines.extend(self._flight_line(flight) for flight in flights[:5])
+            lines.append("\nBạn muốn đặt chuyến nào?")
+            return "\n".join(lines)
+
+        flights = data.get("flights") or []
+        if not flights:
+            return f"😔 Không tìm thấy chuyến bay từ {from_name} đến {to_name} {when}. Bạn muốn thử ngày khác không?"
+        if slots.get("selection_criteria") == "cheapest":
+            flights = sorted(flights, key=lambda flight: flight.get("price", 0))
+        lines = [f"✈️ Tìm thấy {len(flights)} chuyến bay từ {from_name} đến {to_name} {when}:"]
+        lines.extend(self._flight_line(flight) for flight in flights[:5])
+        if len(flights) > 5:
+            lines.append(f"... và {len(flights) - 5} chuyến khác")
+        lines.append("\nBạn muốn đặt chuyến nào?")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _display_name(city: str) -> str:
+        place = gazetteer.resolve(city, fuzzy=False)
+        return place.name if place else city
+
+    @staticmethod
+    def _flight_line(flight: Dict[str, Any]) -> str:
+        return (f"• {flight.get('flight_id', '')} {flight.get('date', '')} lúc {flight.get('time', '')} - "
+                f"{flight.get('price', 0):,} VNĐ (còn {flight.get('seats_left', '?')} ghế)")
+
+    def _build_result(self, context: Dict[str, Any], decision: Dict[str, Any], slots: Dict[str, Any],
+                      execution_result: Dict[str, Any], response: str) -> Dict[str, Any]:
+        updated_context = dict(context or {})
+        updated_context["locations"] = {"from": slots["from_city"], "to": slots["to_city"]}
+        updated_context["time"] = {"date": slots["date"]}
+        updated_context["last_search_result"] = execution_result
+
+        data = execution_result.get("data", {})
+        flights = data.get("flights") or ([data["flight"]] if data.get("flight") else [])
+        if flights:
+            updated_context["selected_flight_id"] = flights[0].get("flight_id")
+
+        return {
+            "success": True,
+            "response": response,
+            "reasoning_steps": [
+                {"step": "fast_path", "result": json.dumps(
+                    {k: decision[k] for k in ("intent", "confidence", "reason")}, ensure_ascii=False)},
+                {"step": "execute", "result": json.dumps(execution_result, ensure_ascii=False)}
+            ],
+            "extracted_info": updated_context,
+            "fast_path": True
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0,
+            "hits_by_intent": dict(self.hits_by_intent),
+            "escalations": dict(self.escalations),
+            "avg_fast_path_ms": round(self.fast_path_ms / self.hits, 2) if self.hits else 0.0
+        }
+
+
+# Global instance
+fast_path_router = FastPathRouter()
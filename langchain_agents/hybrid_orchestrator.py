@@ -1,6 +1,7 @@
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator
 import os
 from .smart_orchestrator import SmartBookingOrchestrator, FallbackOrchestrator
+from utils.tracing import tracer
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -36,9 +37,43 @@ class HybridOrchestrator:
     async def process_message(self, user_id: str, message: str) -> Dict[str, Any]:
         """Process message với hybrid approach"""
         
-        # Thêm thông tin về mode vào response
-        result = await self.orchestrator.process_message(user_id, message)
+        with tracer.trace("chat_turn", user_id=user_id, mode=self.mode, stream=False):
+            # Thêm thông tin về mode vào response
+            result = await self.orchestrator.process_message(user_id, message)
+            return self._decorate(result)
+    
+    async def process_message_stream(self, user_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming: start → step → token... → done. Orchestrator không hỗ trợ stream thì trả một token duy nhất"""
+        with tracer.trace("chat_turn", user_id=user_id, mode=self.mode, stream=True):
+            if not hasattr(self.orchestrator, "process_message_stream"):
+                yield {"event": "start", "user_id": user_id}
+                result = await self.orchestrator.process_message(user_id, message)
+                result = self._decorate(result)
+                yield {"event": "token", "text": result["response"]}
+                yield {"event": "done", **result, "context_delta": {}}
+                return
         
+            async for event in self.orchestrator.process_message_stream(user_id, message):
+                if event["event"] == "start":
+                    yield event
+                    # Icon provider đi trước các token của câu trả lời
+                    yield {"event": "token", "text": self._response_prefix()}
+                elif event["event"] == "done":
+                    yield self._decorate(event)
+                else:
+                    yield event
+    
+    def _response_prefix(self) -> str:
+        """Provider-specific icon"""
+        if self.mode == "langchain":
+            if self.llm_provider == "gemini":
+                return "🔥 "
+            elif self.llm_provider == "openai":
+                return "🧠 "
+            return ""
+        return "🔧 "
+    
+    def _decorate(self, result: Dict[str, Any]) -> Dict[str, Any]:
         # Đảm bảo có context key
         if "context" not in result:
             result["context"] = {}
@@ -47,13 +82,7 @@ class HybridOrchestrator:
         result["context"]["llm_provider"] = self.llm_provider
         
         # Enhance response với provider-specific icons
-        if self.mode == "langchain":
-            if self.llm_provider == "gemini":
-                result["response"] = f"🔥 {result['response']}"
-            elif self.llm_provider == "openai":
-                result["response"] = f"🧠 {result['response']}"
-        else:
-            result["response"] = f"🔧 {result['response']}"
+        result["response"] = f"{self._response_prefix()}{result['response']}"
         
         return result
     
@@ -0,0 +1,134 @@
+"""
+Orchestrator Pool - Khởi tạo orchestrator một lần và dùng chung cho mọi request
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from utils.async_bridge import async_bridge
+from utils.llm_cache import llm_cache
+from utils.context_storage import context_storage
+
+
+class OrchestratorPool:
+    """Giữ một HybridOrchestrator dùng chung, được warm-up khi app khởi động"""
+
+    def __init__(self):
+        self._orchestrator = None
+        self._lock = asyncio.Lock()
+        self.state = "cold"  # cold -> warming -> ready / degraded
+        self.started_at: Optional[str] = None
+        self.warmup_ms: Optional[float] = None
+        self.components: Dict[str, Any] = {}
+
+    async def start(self):
+        """Build orchestrator và pre-warm các thành phần nặng (gọi từ lifespan)"""
+        async with self._lock:
+            if self._orchestrator is not None:
+                return self._orchestrator
+
+            self.state = "warming"
+            self.started_at = datetime.now().isoformat()
+            start = time.perf_counter()
+
+            # Constructor đọc env, tạo LLM client... => chạy ngoài event loop
+            self._orchestrator = await async_bridge.run("OrchestratorPool", self._build_orchestrator)
+            await async_bridge.run("OrchestratorPool", self._warm_components)
+
+            self.warmup_ms = round((time.perf_counter() - start) * 1000, 2)
+            failed = [name for name, info in self.components.items() if not info.get("ok")]
+            self.state = "degraded" if failed else "ready"
+            print(f"🔥 Orchestrator pool {self.state} in {self.warmup_ms}ms")
+            return self._orchestrator
+
+    async def stop(self):
+        """Giải phóng orchestrator khi app tắt"""
+        async with self._lock:
+            self._orchestrator = None
+            self.state = "cold"
+
+    async def get(self):
+        """Lấy orchestrator dùng chung, tự khởi tạo nếu lifespan chưa chạy"""
+        if self._orchestrator is None:
+            return await self.start()
+        return self._orchestrator
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state in ("ready", "degraded")
+
+    def _build_orchestrator(self):
+        from langchain_agents.hybrid_orchestrator import HybridOrchestrator
+        return HybridOrchestrator()
+
+    def _warm_components(self):
+        """Pre-warm MockDataLoader để request đầu tiên không phải chờ, ghi lại trạng thái LLM client"""
+        self.components["mock_data_loader"] = self._warm(self._warm_mock_data_loader)
+        self.components["llm"] = self._warm(self._describe_llm_client)
+
+    def _warm(self, func) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            detail = func()
+            return {"ok": True, "ms": round((time.perf_counter() - start) * 1000, 2), "detail": detail}
+        except Exception as e:
+            print(f"⚠️ Warm-up failed for {func.__name__}: {e}")
+            return {"ok": False, "ms": round((time.perf_counter() - start) * 1000, 2), "error": str(e)}
+
+    def _warm_mock_data_loader(self) -> str:
+        from data.mock_data_loader import get_mock_data_loader
+        loader = get_mock_data_loader()
+        # Dataset shard: đọc trước các ngày sắp tới (phần lớn truy vấn rơi vào đây)
+        warmed = loader.prewarm()
+        return f"{loader.data_file} (prewarmed {warmed} days)" if warmed else loader.data_file
+
+    def _describe_llm_client(self) -> str:
+        """Loại LLM client đang cấu hình (cho /status) - không gọi LLM, kết nối vẫn tạo ở lần gọi đầu"""
+        orchestrator = getattr(self._orchestrator, "orchestrator", None)
+        reasoning_agent = getattr(orchestrator, "reasoning_agent", None)
+        if reasoning_agent is None:
+            return "no LLM (custom mode)"
+
+        llm = getattr(reasoning_agent, "llm", None)
+        if llm is None:
+            return "LLM not configured"
+
+        client = getattr(llm, "client", None)
+        return type(client).__name__ if client is not None else type(llm).__name__
+
+    def _fast_path_router(self):
+        """Router rule-first của SmartBookingOrchestrator (None ở chế độ custom)"""
+        orchestrator = getattr(self._orchestrator, "orchestrator", None)
+        return getattr(orchestrator, "fast_path_router", None)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Trạng thái warm-up cho readiness probe"""
+        status = {
+            "ready": self.is_ready,
+            "state": self.state,
+            "started_at": self.started_at,
+            "warmup_ms": self.warmup_ms,
+            "components": self.components,
+            "llm_cache": llm_cache.stats(),
+            "context_storage": context_storage.stats(),
+            "async_bridge": async_bridge.stats()
+        }
+        mock_data = self.components.get("mock_data_loader")
+        if mock_data and mock_data.get("ok"):
+            from data.mock_data_loader import get_mock_data_loader, mock_data_reloader
+            status["mock_data"] = get_mock_data_loader().stats()
+            status["mock_data"]["snapshot"] = mock_data_reloader.stats()
+            from data.seat_inventory import seat_inventory
+            status["seat_inventory"] = seat_inventory.stats()
+        fast_path = self._fast_path_router()
+        if fast_path is not None:
+            status["fast_path"] = fast_path.stats()
+        if self._orchestrator is not None:
+            status.update(self._orchestrator.get_status())
+        return status
+
+
+# Global instance
+orchestrator_pool = OrchestratorPool()
@@ -3,10 +3,15 @@ Smart Orchestrator - Điều phối thông minh với LLM
 """
 
 import asyncio
+import copy
 import json
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List
 import os
+from utils.logger import get_logger
+from utils.tracing import tracer
+
+log = get_logger("langchain_agents.smart_orchestrator")
 
 class SmartBookingOrchestrator:
     """Orchestrator sử dụng IntelligentReasoningAgent với system prompt"""
@@ -18,12 +23,14 @@ class SmartBookingOrchestrator:
         from agents.booking_intent_agent import booking_intent_agent
         from agents.upselling_agent_v2 import upsell_agent
         from utils.context_storage import context_storage
+        from langchain_agents.fast_path_router import fast_path_router
         
         self.reasoning_agent = IntelligentReasoningAgent()
         self.smart_intent_agent = smart_intent_agent
         self.booking_intent_agent = booking_intent_agent
         self.upsell_agent = upsell_agent
         self.context_storage = context_storage
+        self.fast_path_router = fast_path_router
         
         # System prompt cho context
         self.system_context = self._get_system_prompt()
@@ -79,81 +86,133 @@ QUAN TRỌNG:
     
     async def process_message(self, user_id: str, message: str) -> Dict[str, Any]:
         """Process message với smart intent detection và booking flow"""
+        response = {}
+        async for event in self.process_message_stream(user_id, message, stream_tokens=False):
+            if event["event"] == "done":
+                response = event
+        return {key: value for key, value in response.items() if key not in ("event", "context_delta")}
+    
+    async def process_message_stream(self, user_id: str, message: str, stream_tokens: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Như process_message nhưng phát event dần cho /chat/stream:
+        start → step (extract/reason/execute) → token... → done (response, suggestions, context, context_delta)
+        """
+        yield {"event": "start", "user_id": user_id}
+        context_before = {}
+        streamed = False
         try:
             # Load session context from storage
-            session_context = self.context_storage.load_context(user_id) or {}
+            with tracer.span("context.load"):
+                session_context = await self.context_storage.aload_context(user_id) or {}
+            # Bản chụp để tính context_delta (các nhánh bên dưới có thể sửa dict lồng nhau tại chỗ)
+            context_before = copy.deepcopy(session_context) if stream_tokens else {}
             
             # Kiểm tra xem có đang trong quá trình booking không
             booking_session = session_context.get('booking_session') if session_context else None
             
             if booking_session and isinstance(booking_session, dict) and 'session_id' in booking_session:
                 # Xử lý booking flow
-                return await self._handle_booking_flow(user_id, message, booking_session)
-            
-            # Phân tích intent bằng SmartIntentAgent trước
-            booking_decision = self.smart_intent_agent.should_proceed_with_booking(message, user_id)
-            
-            # Debug intent detection
-            print(f"DEBUG: Booking decision: {booking_decision}")
-            
-            if booking_decision['should_book']:
-                # Bắt đầu quá trình đặt vé
-                return await self._start_booking_process(user_id, message)
-            elif booking_decision.get('should_confirm'):
-                # Hỏi xác nhận trước khi đặt vé
-                return self._ask_booking_confirmation(message)
+                response = await self._handle_booking_flow(user_id, message, booking_session)
             else:
-                # Xử lý bình thường (tìm kiếm, hỏi thông tin)
-                result = await self.reasoning_agent.process(message, session_context)
-            
-                # Update session context cho search
-                updated_context = session_context.copy() if session_context else {}
-                
-                if result.get("success") and result.get("extracted_info"):
-                    new_info = result.get("extracted_info", {})
-                    
-                    # Safe merge locations
-                    if new_info.get('locations'):
-                        updated_context.setdefault('locations', {}).update(new_info['locations'])
-                    
-                    # Safe merge time info
-                    if new_info.get('time'):
-                        updated_context.setdefault('time', {}).update(new_info['time'])
-                    
-                    # Update other fields
-                    for key in ['passengers', 'last_search_result', 'selected_flight_id']:
-                        if key in new_info:
-                            updated_context[key] = new_info[key]
-                    
-                    # Cập nhật context cho SmartIntentAgent
-                    if new_info.get('last_search_result'):
-                        self.smart_intent_agent.update_context(user_id, 'last_search', new_info['last_search_result'])
-                    
-                    # Lưu toàn bộ kết quả search cho booking
-                    if result.get('success') and 'data' in result:
-                        self.smart_intent_agent.update_context(user_id, 'last_search', result)
-                    
-                    self.context_storage.save_context(user_id, updated_context)
+                # Phân tích intent bằng SmartIntentAgent trước
+                with tracer.span("intent.smart") as span:
+                    booking_decision = self.smart_intent_agent.should_proceed_with_booking(message, user_id)
+                    span.set(intent=booking_decision.get("intent"), should_book=booking_decision["should_book"])
                 
-                # Generate contextual suggestions
-                suggestions = self._generate_contextual_suggestions(message, result, updated_context)
+                # Debug intent detection
+                log.debug("Booking decision: %s", booking_decision)
                 
-                return {
-                    "response": result.get("response", "Xin lỗi, tôi không hiểu yêu cầu của bạn."),
-                    "suggestions": suggestions,
-                    "context": {
-                        "agent_type": "intelligent_reasoning", 
-                        "user_id": user_id,
-                        "session_context": updated_context
-                    }
-                }
+                if booking_decision['should_book']:
+                    # Bắt đầu quá trình đặt vé
+                    response = await self._start_booking_process(user_id, message)
+                elif booking_decision.get('should_confirm'):
+                    # Hỏi xác nhận trước khi đặt vé
+                    response = self._ask_booking_confirmation(message)
+                else:
+                    # Xử lý bình thường (tìm kiếm, hỏi thông tin)
+                    # Fast path: NLU tất định đủ chắc chắn => không cần 3 bước LLM
+                    with tracer.span("fast_path") as span:
+                        result = await self.fast_path_router.route(message, session_context, booking_decision)
+                        span.set(hit=result is not None)
+                    if result is not None:
+                        for step in result.get("reasoning_steps", []):
+                            yield {"event": "step", **step}
+                    elif stream_tokens:
+                        with tracer.span("reasoning", stream=True):
+                            async for event in self.reasoning_agent.process_stream(message, session_context):
+                                if event["event"] == "result":
+                                    result = event["result"]
+                                else:
+                                    streamed = streamed or event["event"] == "token"
+                                    yield event
+                    else:
+                        with tracer.span("reasoning", stream=False):
+                            result = await self.reasoning_agent.process(message, session_context)
+                    
+                    response = self._apply_reasoning_result(user_id, message, session_context, result)
             
         except Exception as e:
-            return {
+            response = {
                 "response": f"😅 Xin lỗi, có lỗi xảy ra: {str(e)}. Bạn có thể thử lại không?",
                 "suggestions": ["🔄 Thử lại", "🆘 Hỗ trợ"],
                 "context": {"error": str(e)}
             }
+        
+        if not streamed:
+            yield {"event": "token", "text": response["response"]}
+        
+        context_delta = {}
+        if stream_tokens:
+            with tracer.span("context.load", purpose="delta"):
+                updated_context = await self.context_storage.aload_context(user_id) or {}
+            context_delta = {key: value for key, value in updated_context.items() if context_before.get(key) != value}
+        yield {"event": "done", **response, "context_delta": context_delta}
+    
+    def _apply_reasoning_result(self, user_id: str, message: str, session_context: Dict[str, Any],
+                                result: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge kết quả reasoning/fast path vào session context và tạo response"""
+        # Update session context cho search
+        updated_context = session_context.copy() if session_context else {}
+        
+        if result.get("success") and result.get("extracted_info"):
+            new_info = result.get("extracted_info", {})
+            
+            # Safe merge locations
+            if new_info.get('locations'):
+                updated_context.setdefault('locations', {}).update(new_info['locations'])
+            
+            # Safe merge time info
+            if new_info.get('time'):
+                updated_context.setdefault('time', {}).update(new_info['time'])
+            
+            # Update other fields
+            for key in ['passengers', 'last_search_result', 'selected_flight_id']:
+                if key in new_info:
+                    updated_context[key] = new_info[key]
+            
+            # Cập nhật context cho SmartIntentAgent
+            if new_info.get('last_search_result'):
+                self.smart_intent_agent.update_context(user_id, 'last_search', new_info['last_search_result'])
+            
+            # Lưu toàn bộ kết quả search cho booking
+            if result.get('success') and 'data' in result:
+                self.smart_intent_agent.update_context(user_id, 'last_search', result)
+            
+            with tracer.span("context.save"):
+                self.context_storage.save_context(user_id, updated_context)
+        
+        # Generate contextual suggestions
+        with tracer.span("render"):
+            suggestions = self._generate_contextual_suggestions(message, result, updated_context)
+        
+        return {
+            "response": result.get("response", "Xin lỗi, tôi không hiểu yêu cầu của bạn."),
+            "suggestions": suggestions,
+            "context": {
+                "agent_type": "fast_path" if result.get("fast_path") else "intelligent_reasoning",
+                "user_id": user_id,
+                "session_context": updated_context
+            }
+        }
     
     def _generate_contextual_suggestions(self, user_message: str, result: Dict[str, Any], session_context: Dict[str, Any]) -> List[str]:
         """Generate contextual suggestions based on conversation flow"""
@@ -191,11 +250,11 @@ QUAN TRỌNG:
             
             # Đảm bảo booking_session tồn tại và là dict
             if 'booking_session' not in session_context:
-                print(f"DEBUG: No booking_session found for user {user_id}")
+                log.debug("No booking_session found for user %s", user_id)
                 return False
             
             if not isinstance(session_context['booking_session'], dict):
-                print(f"DEBUG: booking_session is not dict for user {user_id}")
+                log.debug("booking_session is not dict for user %s", user_id)
                 return False
             
             # Chỉ cập nhật booking_session, giữ nguyên tất cả context khác
@@ -203,7 +262,7 @@ QUAN TRỌNG:
             
             # Lưu lại toàn bộ context an toàn
             self.context_storage.save_context(user_id, session_context)
-            print(f"DEBUG: Updated booking_session for user {user_id}: {updates}")
+            log.debug("Updated booking_session for user %s: %s", user_id, updates)
             return True
             
         except Exception as e:
@@ -221,7 +280,7 @@ QUAN TRỌNG:
                 
                 # Đảm bảo không mất bất kỳ thông tin nào khác
                 self.context_storage.save_context(user_id, session_context)
-                print(f"DEBUG: Removed booking_session for user {user_id}, kept other context")
+                log.debug("Removed booking_session for user %s, kept other context", user_id)
             
             return True
             
@@ -236,13 +295,13 @@ QUAN TRỌNG:
         intent_result = self.smart_intent_agent.analyze_intent(message, user_id=user_id)
         flight_info = intent_result.get('extracted_info', {})
         
-        print(f"DEBUG _start_booking_process: intent_result={intent_result}")
-        print(f"DEBUG _start_booking_process: flight_info={flight_info}")
+        log.debug("_start_booking_process: intent_result=%s", intent_result)
+        log.debug("_start_booking_process: flight_info=%s", flight_info)
         
         # Bắt đầu booking process
         booking_result = self.booking_intent_agent.start_booking_process(flight_info)
         
-        print(f"DEBUG _start_booking_process: booking_result={booking_result}")
+        log.debug("_start_booking_process: booking_result=%s", booking_result)
         
         if booking_result['success']:
             # Lưu session booking vào context (không ảnh hưởng context khác)
@@ -254,7 +313,7 @@ QUAN TRỌNG:
             }
             self.context_storage.save_context(user_id, session_context)
             
-            print(f"DEBUG _start_booking_process: Saved booking session for user {user_id}")
+            log.debug("_start_booking_process: Saved booking session for user %s", user_id)
             
             return {
                 "response": booking_result['message'],
@@ -266,7 +325,7 @@ QUAN TRỌNG:
                 }
             }
         else:
-            print(f"DEBUG _start_booking_process: Booking failed: {booking_result}")
+            log.debug("_start_booking_process: Booking failed: %s", booking_result)
             return {
                 "response": booking_result.get('message', 'Không thể bắt đầu đặt vé. Vui lòng thử lại.'),
                 "suggestions": ["🔍 Tìm chuyến bay", "🆘 Hỗ trợ"]
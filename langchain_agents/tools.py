@@ -3,12 +3,18 @@ from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field
 import json
 
+from utils.async_bridge import async_bridge
+
 # Tool để tích hợp với custom agents
 class FlightSearchTool(BaseTool):
     name: str = "flight_search"
     description: str = "Tìm kiếm chuyến bay từ điểm A đến điểm B vào ngày cụ thể"
     
     def _run(self, from_city: str, to_city: str, date: str) -> str:
+        """Bản sync - chạy _arun trên event loop nền của async_bridge"""
+        return async_bridge.run_sync(self._arun(from_city, to_city, date))
+    
+    async def _arun(self, from_city: str, to_city: str, date: str) -> str:
         """Gọi custom Search Agent"""
         from agents.search_agent import SearchAgent
         from models.schemas import AgentRequest, ConversationContext
@@ -24,9 +30,7 @@ class FlightSearchTool(BaseTool):
             context=context
         )
         
-        # Chạy sync version
-        import asyncio
-        result = asyncio.run(agent.process(request))
+        result = await agent.process(request)
         
         if result.success:
             flights = result.data.get("flights", [])
@@ -46,6 +50,10 @@ class PriceCheckTool(BaseTool):
     description: str = "Kiểm tra giá vé máy bay rẻ nhất cho route cụ thể"
     
     def _run(self, from_city: str, to_city: str, date: str = "") -> str:
+        """Bản sync - chạy _arun trên event loop nền của async_bridge"""
+        return async_bridge.run_sync(self._arun(from_city, to_city, date))
+    
+    async def _arun(self, from_city: str, to_city: str, date: str = "") -> str:
         """Gọi custom Price Agent với intelligent reasoning"""
         from agents.price_agent import PriceAgent
         from models.schemas import AgentRequest, ConversationContext
@@ -69,8 +77,7 @@ class PriceCheckTool(BaseTool):
             context=context
         )
         
-        import asyncio
-        result = asyncio.run(agent.process(request))
+        result = await agent.process(request)
         
         if result.success:
             data = result.data
@@ -101,6 +108,10 @@ class BookingTool(BaseTool):
     description: str = "Đặt vé máy bay với flight_id cụ thể"
     
     def _run(self, flight_id: str, user_context: str = "{}") -> str:
+        """Bản sync - chạy _arun trên event loop nền của async_bridge"""
+        return async_bridge.run_sync(self._arun(flight_id, user_context))
+    
+    async def _arun(self, flight_id: str, user_context: str = "{}") -> str:
         """Gọi custom Booking Agent"""
         from agents.booking_agent import BookingAgent
         from models.schemas import AgentRequest, ConversationContext
@@ -125,8 +136,7 @@ class BookingTool(BaseTool):
             context=context
         )
         
-        import asyncio
-        result = asyncio.run(agent.process(request))
+        result = await agent.process(request)
         
         if result.success:
             return json.dumps({
@@ -1,10 +1,52 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from pydantic import BaseModel
 from typing import Dict, Any
 import json
+import os
 from datetime import datetime
 
-app = FastAPI(title="Booking Agent API")
+from langchain_agents.orchestrator_pool import orchestrator_pool
+from langchain_agents.batch_runner import parse_jsonl, run_batch
+from utils.async_bridge import async_bridge
+from utils.context_storage import context_storage
+from utils.context_sweeper import create_context_sweeper
+from utils.tracing import tracer
+from utils.shared_state import shared_state_stats, worker_count
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build orchestrator một lần khi khởi động, dùng chung cho mọi request"""
+    await orchestrator_pool.start()
+
+    # Sweeper nền duy nhất cho context: xóa session hết hạn (LRU + backend), compact data/contexts nếu là FileBackend
+    sweep_task = None
+    sweep_interval = float(os.getenv("CONTEXT_SWEEP_INTERVAL", "900"))
+    sweeper = create_context_sweeper(context_storage) if sweep_interval > 0 else None
+    if sweeper:
+        app.state.context_sweeper = sweeper
+        sweep_task = asyncio.create_task(sweeper.run_forever(sweep_interval))
+
+    yield
+
+    if sweep_task:
+        sweep_task.cancel()
+        try:
+            await sweep_task
+        except asyncio.CancelledError:
+            pass
+    await orchestrator_pool.stop()
+    from data.mock_data_loader import mock_data_reloader
+    mock_data_reloader.stop()
+    # Flush các session context còn dirty trước khi tắt
+    await async_bridge.run("ContextStorage", context_storage.stop)
+    async_bridge.shutdown()
+
+app = FastAPI(title="Booking Agent API", lifespan=lifespan)
 
 # Basic models
 class ChatRequest(BaseModel):
@@ -16,29 +58,124 @@ class ChatResponse(BaseModel):
     context: Dict[str, Any]
     suggestions: list = []
 
-# In-memory context storage (sẽ thay bằng Redis sau)
-user_contexts = {}
-
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """Main chat endpoint"""
-    from langchain_agents.hybrid_orchestrator import HybridOrchestrator
-    
-    orchestrator = HybridOrchestrator()
+    orchestrator = await orchestrator_pool.get()
     result = await orchestrator.process_message(request.user_id, request.message)
-    
+
     return ChatResponse(**result)
 
+def _sse(event: Dict[str, Any]) -> str:
+    """Một event Server-Sent Events: `event: <loại>` + `data: <json>`"""
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Chat streaming (SSE): start → step (extract/reason/execute) → token... → done (suggestions + context_delta)"""
+    orchestrator = await orchestrator_pool.get()
+
+    async def events():
+        async for event in orchestrator.process_message_stream(request.user_id, request.message):
+            yield _sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: Request, concurrency: int = None, include_context: bool = False):
+    """Chat hàng loạt: body JSONL ({"user_id", "message"} mỗi dòng) → JSONL kết quả theo thứ tự hoàn thành
+
+    Mỗi dòng kết quả có `index` (số dòng input), response/suggestions hoặc error.
+    Message cùng user chạy tuần tự, các user chạy song song tối đa `concurrency`.
+    """
+    try:
+        body = (await request.body()).decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be UTF-8 JSONL: {e}")
+    items, errors = parse_jsonl(body.splitlines())
+    orchestrator = await orchestrator_pool.get()
+
+    async def lines():
+        for error in errors:
+            yield json.dumps(error, ensure_ascii=False) + "\n"
+        async for result in run_batch(orchestrator, items, concurrency, include_context):
+            yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Chat streaming qua WebSocket - gửi {"user_id", "message"}, nhận cùng các event như /chat/stream"""
+    await websocket.accept()
+    orchestrator = await orchestrator_pool.get()
+    try:
+        while True:
+            try:
+                request = ChatRequest(**await websocket.receive_json())
+            except (ValidationError, ValueError, TypeError) as e:
+                await websocket.send_text(json.dumps({"event": "error", "detail": str(e)}, ensure_ascii=False))
+                continue
+
+            async for event in orchestrator.process_message_stream(request.user_id, request.message):
+                await websocket.send_text(json.dumps(event, ensure_ascii=False, default=str))
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/fares/calendar")
+async def fare_calendar(from_city: str, to_city: str, start: str, end: str):
+    """Lịch giá: giá thấp nhất/trung vị và số ghế còn theo từng ngày (YYYY-MM-DD hoặc dd/mm/yyyy)"""
+    from data.mock_data_loader import get_mock_data_loader
+    try:
+        loader = get_mock_data_loader()
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    try:
+        return await async_bridge.run("MockDataLoader", loader.get_fare_calendar, from_city, to_city, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/")
 async def root():
     return {"message": "Booking Agent API is running"}
 
 @app.get("/status")
-async def get_status():
-    """Get orchestrator status"""
-    orchestrator = HybridOrchestrator()
-    return orchestrator.get_status()
+async def get_status(response: Response):
+    """Readiness probe: trạng thái warm-up và orchestrator"""
+    if not orchestrator_pool.is_ready:
+        response.status_code = 503
+    status = orchestrator_pool.get_status()
+    sweeper = getattr(app.state, "context_sweeper", None)
+    if sweeper:
+        status["context_sweeper"] = sweeper.stats()
+    status["shared_state"] = shared_state_stats()
+    return status
+
+@app.get("/debug/traces")
+async def debug_traces(limit: int = 20, trace_id: str = None, name: str = None):
+    """Trace gần nhất của các lượt chat (span: NLU, LLM, agent, context, render) + p50/p95 theo span"""
+    if trace_id:
+        trace = tracer.get(trace_id)
+        if trace is None:
+            raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+        return trace
+    return {
+        "stats": tracer.stats(),
+        "summary": tracer.summary(),
+        "traces": tracer.recent(limit, name)
+    }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    workers = worker_count()
+    if workers > 1:
+        # Nhiều worker: state phải nằm ở backend dùng chung (STATE_BACKEND / CONTEXT_BACKEND)
+        if os.getenv("STATE_BACKEND", "memory") == "memory":
+            print("⚠️ API_WORKERS > 1 nhưng STATE_BACKEND=memory - session đặt vé/OTP sẽ không dùng chung giữa các worker")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Load test / latency benchmark cho /chat với fake LLM tất định
+
+Phát lại các hội thoại trong AI_TEST_SCENARIOS.md và realistic_examples.md vào FastAPI app
+(uvicorn chạy trong cùng process trên cổng ngẫu nhiên) ở nhiều mức concurrency. ChatGoogleGenerativeAI được
+thay bằng utils.fake_llm.FakeChatModel (JSON soạn sẵn sau --llm-delay-ms). Báo cáo requests/sec,
+p50/p95/p99 end-to-end và theo từng stage (span của utils.tracing), lưu JSON để so sánh giữa các commit.
+
+    python scripts/benchmark_chat.py --concurrency 1,8,32 --rounds 3
+    python scripts/benchmark_chat.py --stream --compare data/benchmarks/chat_abc1234.json
+    python scripts/benchmark_chat.py --url http://localhost:8000   # server thật (stage lấy từ /debug/traces)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+DEFAULT_SCENARIOS = ["AI_TEST_SCENARIOS.md", "realistic_examples.md"]
+
+_HEADING = re.compile(r'^#{2,4}\s+(.*)')
+_SINGLE = re.compile(r'^(?:Q:|\*\*User Input:\*\*)\s*"([^"]+)"')
+_TURN = re.compile(r'^(?:User|Step \d+):\s*"([^"]+)"')
+_BARE = re.compile(r'^"([^"]+)"\s*$')
+
+
+def load_conversations(paths: List[str]) -> List[Dict[str, Any]]:
+    """Hội thoại từ các file markdown kịch bản test
+
+    - `User: "..."` / `Step N: "..."` trong cùng một code block => một hội thoại nhiều lượt
+    - `Q: "..."`, `**User Input:** "..."` và câu trong block **INPUT:** => hội thoại một lượt
+    """
+    conversations, seen = [], set()
+
+    def add(name: str, source: str, messages: List[str]):
+        key = tuple(messages)
+        if messages and key not in seen:
+            seen.add(key)
+            conversations.append({"name": name, "source": source, "messages": list(messages)})
+
+    for path in paths:
+        source = os.path.basename(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = [line.strip() for line in f]
+
+        heading, in_block, expect_input, turns = source, False, False, []
+        for line in lines:
+            if line.startswith("```"):
+                if in_block:
+                    add(heading, source, turns)
+                    turns = []
+                else:
+                    turns = []
+                in_block = not in_block
+                continue
+
+            match = _HEADING.match(line)
+            if match and not in_block:
+                heading = re.sub(r'[*#]', '', match.group(1)).strip()
+                continue
+            if line == "**INPUT:**":
+                expect_input = True
+                continue
+
+            match = _TURN.match(line)
+            if match and in_block:
+                turns.append(match.group(1))
+                continue
+            match = _SINGLE.match(line) or (_BARE.match(line) if in_block and expect_input else None)
+            if match:
+                add(heading, source, [match.group(1)])
+                expect_input = False
+    return conversations
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(values[min(len(values) - 1, int(round(q * (len(values) - 1))))], 3)
+
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(values[-1], 3)
+    }
+
+
+class StageCollector:
+    """Exporter cho utils.tracing: gom duration theo tên span"""
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {}
+
+    def __call__(self, trace: Dict[str, Any]):
+        stack = [trace]
+        while stack:
+            span = stack.pop()
+            self.durations.setdefault(span["name"], []).append(span["duration_ms"])
+            stack.extend(span.get("children", ()))
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {name: percentiles(values) for name, values in sorted(self.durations.items())}
+
+
+async def run_conversation(client, conversation: Dict[str, Any], user_id: str, stream: bool, sample: Dict[str, List]):
+    """Gửi lần lượt các message của một hội thoại với cùng user_id"""
+    for message in conversation["messages"]:
+        payload = {"user_id": user_id, "message": message}
+        started = time.perf_counter()
+        first_token = None
+        try:
+            if stream:
+                async with client.stream("POST", "/chat/stream", json=payload) as response:
+                    ok = response.status_code == 200
+                    tokens = 0
+                    async for line in response.aiter_lines():
+                        if first_token is not None or not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[len("data: "):])["event"]
+                        # Token đầu tiên là icon provider (gửi ngay sau start) => đo token thứ hai
+                        tokens += event == "token"
+                        if tokens >= 2 or event == "done":
+                            first_token = time.perf_counter()
+            else:
+                response = await client.post("/chat", json=payload)
+                ok = response.status_code == 200
+        except Exception as e:
+            print(f"   ⚠️ {conversation['name']}: {e}")
+            ok = False
+        finished = time.perf_counter()
+
+        sample["latency"].append((finished - started) * 1000)
+        if first_token is not None:
+            sample["first_token"].append((first_token - started) * 1000)
+        if not ok:
+            sample["errors"] += 1
+
+
+async def run_level(client, conversations: List[Dict[str, Any]], concurrency: int, rounds: int,
+                    stream: bool, run_tag: str) -> Dict[str, Any]:
+    """Chạy conversations × rounds với tối đa `concurrency` hội thoại song song"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for round_index in range(rounds):
+        for index, conversation in enumerate(conversations):
+            queue.put_nowait((f"bench_{run_tag}_c{concurrency}_r{round_index}_{index}", conversation))
+
+    sample = {"latency": [], "first_token": [], "errors": 0}
+
+    async def worker():
+        while True:
+            try:
+                user_id, conversation = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await run_conversation(client, conversation, user_id, stream, sample)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    requests = len(sample["latency"])
+    result = {
+        "concurrency": concurrency,
+        "conversations": len(conversations) * rounds,
+        "requests": requests,
+        "errors": sample["errors"],
+        "duration_s": round(duration, 3),
+        "requests_per_sec": round(requests / duration, 2) if duration else 0.0,
+        "latency_ms": percentiles(sample["latency"])
+    }
+    if stream:
+        result["first_token_ms"] = percentiles(sample["first_token"])
+    return result
+
+
+def start_server(app):
+    """Chạy uvicorn trong thread nền trên cổng ngẫu nhiên (ASGITransport gom cả response nên không đo được stream)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("Benchmark server failed to start")
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def run_inprocess(args, conversations: List[Dict[str, Any]], levels: List[int]) -> List[Dict[str, Any]]:
+    """App chạy trong process với fake LLM + tracing 100% để có số liệu theo stage"""
+    import httpx
+    import main
+    from langchain_agents.orchestrator_pool import orchestrator_pool
+    from utils.tracing import tracer
+
+    tracer.sample_rate = 1.0
+    results = []
+    server, thread, base_url = start_server(main.app)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            if args.warmup:
+                await run_level(client, conversations, max(levels), 1, args.stream, "warmup")
+
+            for concurrency in levels:
+                collector = StageCollector()
+                tracer.add_exporter(collector)
+                try:
+                    result = await run_level(client, conversations, concurrency, args.rounds, args.stream, args.tag)
+                finally:
+                    tracer.remove_exporter(collector)
+                result["stages"] = collector.report()
+                status = orchestrator_pool.get_status()
+                result["fast_path"] = status.get("fast_path")
+                result["llm_cache"] = status.get("llm_cache")
+                result["orchestrator_mode"] = status.get("mode")
+                results.append(result)
+                print_level(result)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+    return results
+
+
+async def run_remote(args, conversations: List[Dict[str, Any]], levels: List[int]) -> List[Dict[str, Any]]:
+    """Server đang chạy: stage lấy từ /debug/traces (chỉ các lượt được server sample)"""
+    import httpx
+
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        for concurrency in levels:
+            result = await run_level(client, conversations, concurrency, args.rounds, args.stream, args.tag)
+            try:
+                result["stages"] = (await client.get("/debug/traces", params={"limit": 0})).json().get("summary", {})
+            except Exception as e:
+                print(f"   ⚠️ /debug/traces unavailable: {e}")
+            results.append(result)
+            print_level(result)
+    return results
+
+
+def print_level(result: Dict[str, Any]):
+    latency = result["latency_ms"]
+    print(f"\n⚡ concurrency={result['concurrency']}: {result['requests']} requests in {result['duration_s']}s "
+          f"→ {result['requests_per_sec']} req/s, errors={result['errors']}")
+    print(f"   end-to-end  p50={latency.get('p50')}ms p95={latency.get('p95')}ms p99={latency.get('p99')}ms")
+    if "first_token_ms" in result:
+        first = result["first_token_ms"]
+        print(f"   first token p50={first.get('p50')}ms p95={first.get('p95')}ms p99={first.get('p99')}ms")
+    for name, stats in result.get("stages", {}).items():
+        print(f"   {name:<45} n={stats.get('count', 0):<5} p50={stats.get('p50', stats.get('p50_ms'))}ms "
+              f"p95={stats.get('p95', stats.get('p95_ms'))}ms p99={stats.get('p99', '-')}ms")
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """In chênh lệch so với một file kết quả trước đó (cùng mức concurrency)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {run["concurrency"]: run for run in json.load(f)["runs"]}
+
+    def delta(new, old) -> str:
+        if new is None or old in (None, 0):
+            return "n/a"
+        return f"{old} → {new} ({(new - old) / old * 100:+.1f}%)"
+
+    print(f"\n📊 So với {baseline_path}")
+    for run in results:
+        old = baseline.get(run["concurrency"])
+        if not old:
+            print(f"   concurrency={run['concurrency']}: không có trong baseline")
+            continue
+        print(f"   concurrency={run['concurrency']}: req/s {delta(run['requests_per_sec'], old['requests_per_sec'])}")
+        for q in ("p50", "p95", "p99"):
+            print(f"      {q} {delta(run['latency_ms'].get(q), old['latency_ms'].get(q))} ms")
+        for name, stats in run.get("stages", {}).items():
+            old_stats = old.get("stages", {}).get(name)
+            if old_stats and "p95" in stats:
+                print(f"      {name} p95 {delta(stats['p95'], old_stats.get('p95'))} ms")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /chat với fake LLM")
+    parser.add_argument("--scenarios", nargs="+", default=DEFAULT_SCENARIOS)
+    parser.add_argument("--concurrency", default="1,8,32", help="Các mức concurrency, vd 1,8,32")
+    parser.add_argument("--rounds", type=int, default=2, help="Số lần lặp toàn bộ hội thoại ở mỗi mức")
+    parser.add_argument("--stream", action="store_true", help="Dùng /chat/stream và đo time-to-first-token")
+    parser.add_argument("--llm-delay-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--llm-cache", action="store_true", help="Giữ LLM response cache (mặc định tắt để mỗi lượt đều gọi LLM)")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--url", help="Benchmark server đang chạy thay vì app in-process (không dùng fake LLM)")
+    parser.add_argument("--output", help="File JSON kết quả (mặc định data/benchmarks/chat_<commit>.json)")
+    parser.add_argument("--compare", help="File JSON của lần chạy trước để so sánh")
+    args = parser.parse_args()
+
+    conversations = load_conversations(args.scenarios)
+    if not conversations:
+        print(f"❌ Không tìm thấy hội thoại trong {args.scenarios}")
+        return 1
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    commit = git_commit()
+    args.tag = f"{commit}_{int(time.time())}"
+
+    fake_llm = None
+    if not args.url:
+        # Cấu hình phải xong trước khi import main/orchestrator
+        os.environ["CONTEXT_BACKEND"] = "memory"
+        os.environ["CONTEXT_SWEEP_INTERVAL"] = "0"
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if not args.llm_cache:
+            os.environ["LLM_CACHE_SIZE"] = "0"
+            os.environ.pop("LLM_CACHE_PATH", None)
+        from utils.fake_llm import install_fake_llm
+        fake_llm = install_fake_llm(args.llm_delay_ms / 1000, args.llm_jitter_ms / 1000, args.seed)
+
+    turns = sum(len(c["messages"]) for c in conversations)
+    print(f"📋 {len(conversations)} conversations ({turns} turns) from {', '.join(args.scenarios)}")
+    print(f"   concurrency={levels}, rounds={args.rounds}, stream={args.stream}, "
+          f"target={'in-process + fake LLM' if fake_llm else args.url}")
+
+    runner = run_remote if args.url else run_inprocess
+    results = asyncio.run(runner(args, conversations, levels))
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "target": args.url or "in-process",
+            "fake_llm": fake_llm,
+            "llm_cache": args.llm_cache,
+            "stream": args.stream,
+            "rounds": args.rounds,
+            "scenarios": args.scenarios,
+            "conversations": len(conversations),
+            "turns_per_round": turns
+        },
+        "runs": results
+    }
+    output = args.output or os.path.join("data", "benchmarks", f"chat_{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Saved {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
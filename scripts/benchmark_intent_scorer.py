@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: intent scorer biên dịch sẵn (IntentScorer) so với scorer cũ
+
+Lấy các câu test trong AI_TEST_SCENARIOS.md (dòng Q: "..." và **User Input:** "..."),
+chấm điểm bằng cả hai cách, in thời gian trung bình mỗi câu và các câu ra intent khác nhau.
+
+    python scripts/benchmark_intent_scorer.py --rounds 200
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from utils.nlu import VietnameseNLU, SEMANTIC_KEYWORDS
+
+
+def load_utterances(path: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return re.findall(r'(?:Q:|\*\*User Input:\*\*)\s*"([^"]+)"', text)
+
+
+def legacy_normalize(text: str) -> str:
+    """_normalize_vietnamese trước khi biên dịch regex"""
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def legacy_semantic_scores(message: str) -> dict:
+    """_calculate_semantic_scores bản cũ: dựng lại bảng keyword và quét từng keyword mỗi lần gọi"""
+    semantic_keywords = {intent: {level: list(keywords) for level, keywords in levels.items()}
+                         for intent, levels in SEMANTIC_KEYWORDS.items()}
+    scores = {}
+    for intent, keywords in semantic_keywords.items():
+        score = 0.0
+        for keyword in keywords['strong']:
+            if keyword in message:
+                score += 3.0
+        for keyword in keywords['medium']:
+            if keyword in message:
+                score += 1.0
+        for keyword in keywords['weak']:
+            if keyword in message:
+                score += 0.3
+        scores[intent] = score
+    return scores
+
+
+def best_intent(scores: dict) -> str:
+    best = max(scores, key=scores.get)
+    return best if scores[best] >= 0.3 else "ambiguous"
+
+
+def bench(func, messages: list, rounds: int) -> float:
+    """Thời gian trung bình mỗi câu (µs)"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            func(message)
+    return (time.perf_counter() - started) / (rounds * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent scorer")
+    parser.add_argument("--scenarios", default=os.path.join(ROOT, "AI_TEST_SCENARIOS.md"))
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    utterances = load_utterances(args.scenarios)
+    if not utterances:
+        print(f"❌ Không tìm thấy câu test trong {args.scenarios}")
+        return 1
+
+    nlu = VietnameseNLU()
+    legacy_messages = [legacy_normalize(u.lower()) for u in utterances]
+    messages = [nlu._normalize_vietnamese(u.lower()) for u in utterances]
+
+    legacy_us = bench(lambda m: legacy_semantic_scores(legacy_normalize(m)), legacy_messages, args.rounds)
+    compiled_us = bench(lambda m: nlu._calculate_semantic_scores(nlu._normalize_vietnamese(m)), messages, args.rounds)
+
+    print(f"📋 {len(utterances)} utterances from {os.path.basename(args.scenarios)}, {args.rounds} rounds")
+    print(f"   Legacy scorer  : {legacy_us:8.2f} µs/utterance")
+    print(f"   Compiled scorer: {compiled_us:8.2f} µs/utterance ({legacy_us / compiled_us:.1f}x)")
+
+    changed = []
+    for utterance, legacy_message, message in zip(utterances, legacy_messages, messages):
+        before = best_intent(legacy_semantic_scores(legacy_message))
+        after = best_intent(nlu._calculate_semantic_scores(message))
+        if before != after:
+            changed.append((utterance, before, after))
+
+    print(f"   Same top intent: {len(utterances) - len(changed)}/{len(utterances)}")
+    for utterance, before, after in changed:
+        print(f"   ≠ {utterance!r}: {before} → {after}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Chạy hàng loạt message qua pipeline chat (backfill analytics, offline eval)
+
+Input JSONL: mỗi dòng {"user_id": "...", "message": "..."}. Output JSONL: mỗi dòng
+{"index", "user_id", "response", "suggestions", "latency_ms"} hoặc {"index", "error"}.
+Message cùng user chạy tuần tự, các user chạy song song (--concurrency).
+
+    python scripts/chat_batch.py eval.jsonl -o results.jsonl --concurrency 32
+    cat eval.jsonl | python scripts/chat_batch.py - --sorted
+    python scripts/chat_batch.py eval.jsonl --url http://localhost:8000   # qua /chat/batch của server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+async def run_inprocess(lines, args):
+    """Orchestrator dùng chung trong process (không qua HTTP)"""
+    from langchain_agents.orchestrator_pool import orchestrator_pool
+    from langchain_agents.batch_runner import parse_jsonl, run_batch
+
+    items, errors = parse_jsonl(lines)
+    orchestrator = await orchestrator_pool.get()
+    for error in errors:
+        yield error
+    async for result in run_batch(orchestrator, items, args.concurrency, args.include_context):
+        yield result
+
+
+async def run_remote(lines, args):
+    """POST /chat/batch lên server đang chạy, đọc JSONL stream về"""
+    import httpx
+
+    params = {"include_context": str(args.include_context).lower()}
+    if args.concurrency:
+        params["concurrency"] = args.concurrency
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        async with client.stream("POST", "/chat/batch", params=params, content="\n".join(lines).encode("utf-8"),
+                                 headers={"Content-Type": "application/x-ndjson"}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+async def run(args) -> dict:
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with source:
+        lines = source.read().splitlines()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    results = run_remote(lines, args) if args.url else run_inprocess(lines, args)
+    summary = {"total": 0, "errors": 0}
+    buffered = []
+    start = time.perf_counter()
+    try:
+        async for result in results:
+            summary["total"] += 1
+            summary["errors"] += "error" in result
+            if args.sorted:
+                buffered.append(result)
+            else:
+                out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+        for result in sorted(buffered, key=lambda r: r["index"]):
+            out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    summary["elapsed_s"] = round(elapsed, 2)
+    summary["messages_per_s"] = round(summary["total"] / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat hàng loạt từ file JSONL")
+    parser.add_argument("input", help="File JSONL input ('-' = stdin)")
+    parser.add_argument("-o", "--output", help="File JSONL kết quả (mặc định stdout)")
+    parser.add_argument("--concurrency", type=int, help="Số user chạy song song (mặc định BATCH_CONCURRENCY)")
+    parser.add_argument("--include-context", action="store_true", help="Kèm context sau mỗi lượt")
+    parser.add_argument("--sorted", action="store_true", help="Ghi kết quả theo thứ tự input (chờ chạy xong)")
+    parser.add_argument("--url", help="Gửi lên /chat/batch của server thay vì chạy in-process")
+    args = parser.parse_args()
+
+    # Agent đọc data/ theo đường dẫn tương đối => chạy từ thư mục gốc repo
+    if args.input != "-":
+        args.input = os.path.abspath(args.input)
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    os.chdir(ROOT)
+
+    summary = asyncio.run(run(args))
+    print(f"✅ {summary['total']} messages ({summary['errors']} errors) in {summary['elapsed_s']}s "
+          f"- {summary['messages_per_s']} msg/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,38 @@
 #!/usr/bin/env python3
 """
 Script tạo mock data đầy đủ và chi tiết như thực tế cho hệ thống booking VietJet
+
+Mặc định ghi shard theo ngày + manifest vào data/generated/vietjet_mock_data.shards/ và chỉ
+generate lại các (ngày, tuyến) có input thay đổi (lịch bay, giá gốc, ngày, mốc đặt trước),
+các partition được chia cho process pool:
+
+    python scripts/generate_mock_data.py --days 365 --workers 8
+    python scripts/generate_mock_data.py --force           # generate lại toàn bộ
+    python scripts/generate_mock_data.py --format json     # một file JSON lớn như cũ (+ columnar)
 """
 
+import argparse
+import hashlib
 import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from data.columnar_store import write_columnar, columnar_path_for, is_available as columnar_available
+from data.shard_store import (SHARDS_DIR_NAME, read_manifest, read_shard, write_shard, write_manifest,
+                              remove_unreferenced_shards, has_full_summary, summarize_routes)
+
+# Tăng khi đổi logic generate => mọi shard bị coi là thay đổi
+GENERATOR_VERSION = 1
 
 class MockDataGenerator:
-    def __init__(self):
-        self.base_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    def __init__(self, base_date: datetime = None):
+        self.base_date = base_date or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Thông tin hãng bay
         self.airlines = {
@@ -387,9 +409,32 @@ class MockDataGenerator:
         else:
             return "Mùa thu"
     
-    def generate_full_dataset(self, days_ahead: int = 30) -> Dict:
-        """Tạo dataset đầy đủ cho nhiều ngày"""
-        dataset = {
+    def partition_fingerprint(self, route_key: str, date: datetime) -> str:
+        """Fingerprint mọi input của generate_flights_for_date(tuyến, ngày)
+        
+        Giá và số ghế chỉ phụ thuộc days_ahead qua các mốc (3/7/14/30 ngày) => dùng mốc thay cho
+        days_ahead để shard không bị coi là thay đổi mỗi ngày.
+        """
+        from_code, to_code = route_key.split('-')
+        days_ahead = (date - self.base_date).days
+        schedules = self.flight_schedules.get(route_key, [])
+        inputs = {
+            "version": GENERATOR_VERSION,
+            "date": date.strftime("%Y-%m-%d"),
+            "advance": [days_ahead <= 3, days_ahead <= 7, days_ahead >= 3, days_ahead >= 7,
+                        days_ahead >= 14, days_ahead >= 30],
+            "schedules": schedules,
+            "route": self.routes.get(route_key),
+            "airports": [self.airports.get(from_code), self.airports.get(to_code)],
+            "aircraft": {s["aircraft"]: self.aircraft_configs.get(s["aircraft"]) for s in schedules},
+            "airline": self.airlines["VJ"]
+        }
+        encoded = json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+    
+    def dataset_header(self, days_ahead: int) -> Dict:
+        """Phần metadata chung của dataset (không gồm flights_by_date)"""
+        return {
             "metadata": {
                 "generated_at": datetime.now().isoformat(),
                 "base_date": self.base_date.isoformat(),
@@ -401,9 +446,13 @@ class MockDataGenerator:
             "airlines": self.airlines,
             "airports": self.airports,
             "routes": self.routes,
-            "aircraft_configs": self.aircraft_configs,
-            "flights_by_date": {}
+            "aircraft_configs": self.aircraft_configs
         }
+    
+    def generate_full_dataset(self, days_ahead: int = 30) -> Dict:
+        """Tạo dataset đầy đủ cho nhiều ngày"""
+        dataset = self.dataset_header(days_ahead)
+        dataset["flights_by_date"] = {}
         
         # Tạo chuyến bay cho từng ngày
         for day in range(days_ahead + 1):
@@ -428,8 +477,9 @@ class MockDataGenerator:
             filename = f"vietjet_mock_data_{timestamp}.json"
         
         # Tạo thư mục nếu chưa có
-        os.makedirs("../data/generated", exist_ok=True)
-        filepath = os.path.join("../data/generated", filename)
+        generated_dir = os.path.join(ROOT, "data", "generated")
+        os.makedirs(generated_dir, exist_ok=True)
+        filepath = os.path.join(generated_dir, filename)
         
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(dataset, f, ensure_ascii=False, indent=2)
@@ -445,17 +495,123 @@ class MockDataGenerator:
                 total_flights += len(route_flights)
         
         print(f"✈️ Tổng số chuyến bay: {total_flights}")
+        
+        # Bản columnar (mmap) cho MockDataLoader
+        if columnar_available():
+            columnar_path = write_columnar(dataset, columnar_path_for(filepath))
+            print(f"🗂️ Columnar dataset: {columnar_path}")
+        else:
+            print("⚠️ numpy chưa được cài - bỏ qua định dạng columnar")
         return filepath
 
+_worker_generator = None
+
+
+def _generate_partition(task: Tuple[str, str, str]) -> Tuple[str, str, List[Dict]]:
+    """Chạy trong process con: flights của một (ngày, tuyến)"""
+    global _worker_generator
+    base_date_iso, date_key, route_key = task
+    base_date = datetime.fromisoformat(base_date_iso)
+    if _worker_generator is None or _worker_generator.base_date != base_date:
+        _worker_generator = MockDataGenerator(base_date)
+    from_code, to_code = route_key.split('-')
+    date = datetime.strptime(date_key, "%Y-%m-%d")
+    return date_key, route_key, _worker_generator.generate_flights_for_date(from_code, to_code, date)
+
+
+def generate_shards(output_dir: str, days_ahead: int = 30, workers: int = None, force: bool = False) -> Dict[str, Any]:
+    """Generate shard theo ngày vào output_dir, chỉ các (ngày, tuyến) có fingerprint thay đổi"""
+    start = time.perf_counter()
+    generator = MockDataGenerator()
+    previous = read_manifest(output_dir)
+    previous_days = previous["days"] if previous and not force else {}
+
+    dates = [generator.base_date + timedelta(days=day) for day in range(days_ahead + 1)]
+    fingerprints: Dict[str, Dict[str, str]] = {}
+    tasks = []
+    for date in dates:
+        date_key = date.strftime("%Y-%m-%d")
+        fingerprints[date_key] = {route_key: generator.partition_fingerprint(route_key, date)
+                                  for route_key in generator.flight_schedules}
+        old = previous_days.get(date_key, {}).get("fingerprints", {})
+        tasks.extend((generator.base_date.isoformat(), date_key, route_key)
+                     for route_key, fingerprint in fingerprints[date_key].items() if old.get(route_key) != fingerprint)
+
+    # Fan-out các partition thay đổi ra process pool
+    generated: Dict[str, Dict[str, List[Dict]]] = {}
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_generate_partition, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+        else:
+            results = [_generate_partition(task) for task in tasks]
+        for date_key, route_key, flights in results:
+            generated.setdefault(date_key, {})[route_key] = flights
+
+    manifest = generator.dataset_header(days_ahead)
+    manifest["days"] = {}
+    for date_key, route_fingerprints in fingerprints.items():
+        if date_key not in generated:
+            entry = previous_days[date_key]
+            if not has_full_summary(entry):
+                # Manifest cũ chưa có departure_minutes: tóm tắt lại từ shard, không generate lại
+                entry = dict(entry, routes=summarize_routes(read_shard(output_dir, entry["file"])))
+            manifest["days"][date_key] = entry
+            continue
+        # Ngày có tuyến thay đổi: giữ flights của các tuyến không đổi từ shard cũ
+        routes = generated[date_key]
+        missing = [route_key for route_key in route_fingerprints if route_key not in routes]
+        if missing:
+            old_routes = read_shard(output_dir, previous_days[date_key]["file"])
+            routes.update({route_key: old_routes[route_key] for route_key in missing})
+        day_fingerprint = hashlib.blake2b("".join(route_fingerprints.values()).encode("utf-8"), digest_size=16).hexdigest()
+        entry = write_shard(output_dir, date_key, day_fingerprint,
+                            {route_key: routes[route_key] for route_key in route_fingerprints})
+        entry["fingerprints"] = route_fingerprints
+        manifest["days"][date_key] = entry
+
+    # Shard không còn được tham chiếu chỉ bị xóa sau thời gian giữ lại (worker còn chạy snapshot cũ)
+    removed = remove_unreferenced_shards(output_dir, manifest, previous)
+    write_manifest(output_dir, manifest)
+
+    return {
+        "output_dir": output_dir,
+        "days": len(manifest["days"]),
+        "partitions": sum(len(f) for f in fingerprints.values()),
+        "regenerated_partitions": len(tasks),
+        "rewritten_shards": len(generated),
+        "removed_shards": removed,
+        "elapsed_s": round(time.perf_counter() - start, 2)
+    }
+
+
 def main():
     """Chạy script tạo mock data"""
+    parser = argparse.ArgumentParser(description="Tạo mock data VietJet")
+    parser.add_argument("--days", type=int, default=30, help="Số ngày tới cần generate")
+    parser.add_argument("--workers", type=int, help="Số process (mặc định = số CPU)")
+    parser.add_argument("--force", action="store_true", help="Generate lại mọi shard")
+    parser.add_argument("--format", choices=["shards", "json"], default="shards",
+                        help="shards: shard theo ngày + manifest (mặc định); json: một file JSON lớn")
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "data", "generated", SHARDS_DIR_NAME))
+    args = parser.parse_args()
+
     print("🚀 Bắt đầu tạo mock data VietJet...")
     
+    if args.format == "shards":
+        summary = generate_shards(args.output_dir, args.days, args.workers, args.force)
+        print(f"✅ {summary['days']} ngày, generate lại {summary['regenerated_partitions']}/{summary['partitions']} "
+              f"partition, ghi {summary['rewritten_shards']} shard, xóa {summary['removed_shards']} "
+              f"trong {summary['elapsed_s']}s")
+        print(f"📁 Shards: {summary['output_dir']}")
+        return
+    
     generator = MockDataGenerator()
     
-    # Tạo dataset cho 30 ngày tới
+    # Tạo dataset cho N ngày tới
     print("📝 Đang tạo dataset...")
-    dataset = generator.generate_full_dataset(days_ahead=30)
+    dataset = generator.generate_full_dataset(days_ahead=args.days)
     
     # Lưu file
     print("💾 Đang lưu dataset...")
@@ -465,4 +621,4 @@ def main():
     print(f"📁 File được lưu tại: {filepath}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
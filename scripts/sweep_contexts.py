@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Script dọn session hết hạn và compact thư mục context thành segment file
+
+    python scripts/sweep_contexts.py --dir data/contexts --ttl-hours 24 --min-age 30
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from utils.state_backends import FileBackend
+from utils.context_sweeper import ContextSweeper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep + compact session contexts")
+    parser.add_argument("--dir", default="data/contexts", help="Thư mục context (FileBackend)")
+    parser.add_argument("--ttl-hours", type=float, default=24, help="Session cũ hơn TTL sẽ bị xóa")
+    parser.add_argument("--min-age", type=float, default=30, help="Chỉ compact file không ghi trong N phút")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ báo cáo, không ghi/xóa gì")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"❌ Không tìm thấy thư mục: {args.dir}")
+        return 1
+
+    sweeper = ContextSweeper(FileBackend(args.dir), ttl_hours=args.ttl_hours, min_age_minutes=args.min_age)
+    report = sweeper.run(dry_run=args.dry_run)
+
+    print(f"🧹 Swept {args.dir}{' (dry run)' if args.dry_run else ''}")
+    print(f"   Scanned: {report['scanned']} | Expired: {report['expired_deleted']} | "
+          f"Compacted: {report['compacted']} | Kept: {report['kept_loose']}")
+    print(f"   Bytes: {report['bytes_before']} → {report['bytes_after']} "
+          f"(reclaimed {report['bytes_reclaimed']}) in {report['duration_ms']}ms")
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
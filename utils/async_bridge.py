@@ -0,0 +1,184 @@
+"""
+Async Bridge - Cầu nối sync/async dùng chung cho agents và orchestrators
+
+- async → sync: `await async_bridge.run(name, func, *args)` chạy hàm blocking (I/O file, SQLite,
+  LLM client sync, tính toán) trong một thread pool có giới hạn, không block event loop.
+  Mỗi `name` (thường là tên agent) có giới hạn số lời gọi đồng thời riêng.
+- sync → async: `async_bridge.run_sync(coro)` chạy coroutine trên một event loop nền dùng chung
+  thay vì `asyncio.run()` (tạo loop mới mỗi lần, lỗi khi đã có loop đang chạy).
+- stats(): số lời gọi, lỗi, đang chạy, đang chờ slot, thời gian chờ/chạy theo từng name.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def parse_limits(spec: str) -> Dict[str, int]:
+    """"PriceAgent=4,ContextStorage=16" → {"PriceAgent": 4, "ContextStorage": 16}"""
+    limits = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class _CallStats:
+    __slots__ = ("calls", "errors", "in_flight", "max_in_flight", "waiting", "wait_ms", "run_ms", "max_run_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.waiting = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+        self.max_run_ms = 0.0
+
+    def to_dict(self, limit: int) -> Dict[str, Any]:
+        return {
+            "limit": limit,
+            "calls": self.calls,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "avg_wait_ms": round(self.wait_ms / self.calls, 2) if self.calls else 0.0,
+            "avg_run_ms": round(self.run_ms / self.calls, 2) if self.calls else 0.0,
+            "max_run_ms": round(self.max_run_ms, 2)
+        }
+
+
+class AsyncBridge:
+    """Thread pool có giới hạn + giới hạn đồng thời theo name + event loop nền cho code sync"""
+
+    def __init__(self, max_workers: int = None, default_limit: int = 8, limits: Dict[str, int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Semaphore gắn với event loop dùng nó => mỗi loop một bộ semaphore (tự dọn khi loop bị thu hồi)
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._stats: Dict[str, _CallStats] = {}
+
+    def limit_for(self, name: str) -> int:
+        return self.limits.get(name, self.default_limit)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="async-bridge")
+            return self._executor
+
+    def _semaphore(self, name: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = self._semaphores.setdefault(loop, {})
+        semaphore = semaphores.get(name)
+        if semaphore is None:
+            semaphore = semaphores.setdefault(name, asyncio.Semaphore(self.limit_for(name)))
+        return semaphore
+
+    def _stats_for(self, name: str) -> _CallStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(name, _CallStats())
+        return stats
+
+    async def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Chạy hàm blocking trong thread pool, tối đa limit_for(name) lời gọi cùng lúc cho mỗi name"""
+        stats = self._stats_for(name)
+        loop = asyncio.get_running_loop()
+        # Giữ contextvars (request id, trace...) khi sang thread khác
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+
+        queued_at = time.perf_counter()
+        stats.waiting += 1
+        acquired = False
+        try:
+            async with self._semaphore(name):
+                acquired = True
+                stats.waiting -= 1
+                started = time.perf_counter()
+                stats.wait_ms += (started - queued_at) * 1000
+                stats.calls += 1
+                stats.in_flight += 1
+                stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+                try:
+                    return await loop.run_in_executor(self._get_executor(), call)
+                except Exception:
+                    stats.errors += 1
+                    raise
+                finally:
+                    stats.in_flight -= 1
+                    elapsed = (time.perf_counter() - started) * 1000
+                    stats.run_ms += elapsed
+                    stats.max_run_ms = max(stats.max_run_ms, elapsed)
+        finally:
+            # Bị hủy khi còn đang chờ slot
+            if not acquired:
+                stats.waiting -= 1
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name="async-bridge-loop", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def run_sync(self, coro: Awaitable, timeout: float = None) -> Any:
+        """Chạy coroutine từ code sync (vd LangChain tool _run) trên event loop nền dùng chung"""
+        loop = self._get_loop()
+        if threading.current_thread() is self._loop_thread:
+            raise RuntimeError("run_sync() không được gọi từ chính event loop của AsyncBridge")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        executor = self._executor
+        return {
+            "max_workers": self.max_workers,
+            "default_limit": self.default_limit,
+            "pool_threads": len(executor._threads) if executor else 0,
+            "pool_queue": executor._work_queue.qsize() if executor else 0,
+            "background_loop": self._loop is not None and self._loop.is_running(),
+            "by_name": {name: stats.to_dict(self.limit_for(name)) for name, stats in list(self._stats.items())}
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Dừng thread pool và loop nền (gọi lại run/run_sync sẽ tự khởi tạo lại)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            loop, self._loop = self._loop, None
+            thread, self._loop_thread = self._loop_thread, None
+            self._semaphores.clear()
+        if executor:
+            executor.shutdown(wait=wait)
+        if loop:
+            loop.call_soon_threadsafe(loop.stop)
+            if thread and wait:
+                thread.join(timeout=5)
+            if not loop.is_running():
+                loop.close()
+
+
+# Global instance
+async_bridge = AsyncBridge(
+    max_workers=int(os.getenv("ASYNC_BRIDGE_WORKERS", "0")) or None,
+    default_limit=int(os.getenv("ASYNC_BRIDGE_AGENT_LIMIT", "8")),
+    limits=parse_limits(os.getenv("ASYNC_BRIDGE_LIMITS", ""))
+)
@@ -1,49 +1,217 @@
+import atexit
+import copy
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 
+from utils.async_bridge import async_bridge
+from utils.tracing import tracer
+from utils.state_backends import StateBackend, create_backend
+from utils.shared_state import worker_count
+
 class ContextStorage:
-    """Simple file-based context storage"""
-    
-    def __init__(self, storage_dir: str = "data/contexts"):
+    """Two-tier context storage: LRU in-process + write-behind xuống backend (file/SQLite/Redis)
+
+    - load_context trả về bản sao của dict đang được cache (đã parse), không đọc lại file mỗi lần;
+      caller sửa context mà chưa save_context thì cache và lượt flush kế tiếp không bị ảnh hưởng
+    - save_context lưu snapshot và đánh dấu dirty, thread nền flush theo batch mỗi flush_interval giây
+    - Hết hạn (ttl_hours) do ContextSweeper chạy nền trong lifespan xử lý (evict_expired + backend),
+      không parse timestamp mỗi lần load
+    """
+
+    def __init__(self, storage_dir: str = "data/contexts", backend: StateBackend = None,
+                 max_entries: int = 1024, ttl_hours: float = 24, flush_interval: float = 1.0):
         self.storage_dir = storage_dir
-        os.makedirs(storage_dir, exist_ok=True)
-    
+        self.backend = backend or create_backend(os.getenv("CONTEXT_BACKEND", "file"), "contexts", storage_dir)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_hours * 3600
+        self.flush_interval = flush_interval
+
+        # user_id -> [context, touched_at]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.RLock()
+
+        self._worker: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stopped = False
+        self.stats_counters = {"hits": 0, "misses": 0, "writes": 0, "flushes": 0, "evictions": 0, "expired": 0}
+        atexit.register(self.flush)
+
     def save_context(self, user_id: str, context: Dict[str, Any]):
-        """Save user context to file"""
+        """Save user context (write-behind)"""
         context['last_updated'] = datetime.now().isoformat()
-        file_path = os.path.join(self.storage_dir, f"{user_id}.json")
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(context, f, ensure_ascii=False, indent=2)
-    
+        snapshot = copy.deepcopy(context)
+
+        with self._lock:
+            self._entries[user_id] = [snapshot, time.time()]
+            self._entries.move_to_end(user_id)
+            self._dirty.add(user_id)
+            self._evict_over_capacity()
+
+        if self.flush_interval <= 0:
+            self.flush()
+        else:
+            self._ensure_worker()
+
     def load_context(self, user_id: str) -> Dict[str, Any]:
-        """Load user context from file"""
-        file_path = os.path.join(self.storage_dir, f"{user_id}.json")
-        
-        if not os.path.exists(file_path):
-            return {}
-        
+        """Load user context - từ LRU nếu có, nếu không thì đọc backend một lần"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.stats_counters["hits"] += 1
+                tracer.annotate(cache_hit=True)
+                return copy.deepcopy(entry[0])
+            self.stats_counters["misses"] += 1
+        tracer.annotate(cache_hit=False)
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                context = json.load(f)
-            
-            # Check if context is expired (24 hours)
-            if 'last_updated' in context:
+            raw = self.backend.get(user_id)
+            context = json.loads(raw) if raw else {}
+        except Exception:
+            return {}
+
+        # Chỉ kiểm tra timestamp ở lần đọc nguội từ backend (file cũ chưa bị sweeper dọn)
+        touched_at = time.time()
+        if 'last_updated' in context:
+            try:
                 last_updated = datetime.fromisoformat(context['last_updated'])
-                if datetime.now() - last_updated > timedelta(hours=24):
+                if datetime.now() - last_updated > timedelta(seconds=self.ttl_seconds):
                     return {}
-            
-            return context
-        except:
+                touched_at = last_updated.timestamp()
+            except (TypeError, ValueError):
+                pass
+
+        if not context:
             return {}
-    
+
+        with self._lock:
+            # Thread khác có thể đã save trong lúc đọc backend
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                return copy.deepcopy(entry[0])
+            self._entries[user_id] = [copy.deepcopy(context), touched_at]
+            self._evict_over_capacity()
+        return context
+
+    async def aload_context(self, user_id: str) -> Dict[str, Any]:
+        """load_context cho code async - cache hit trả ngay, cache miss đọc backend trong thread pool"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self.stats_counters["hits"] += 1
+                tracer.annotate(cache_hit=True)
+                return copy.deepcopy(entry[0])
+        return await async_bridge.run("ContextStorage", self.load_context, user_id)
+
     def clear_context(self, user_id: str):
         """Clear user context"""
-        file_path = os.path.join(self.storage_dir, f"{user_id}.json")
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._dirty.discard(user_id)
+        self.backend.delete(user_id)
+
+    def flush(self):
+        """Ghi tất cả context dirty xuống backend trong một batch"""
+        with self._lock:
+            if not self._dirty:
+                return
+            # Serialize trong lock để không đọc dict đang bị sửa dở
+            batch = []
+            for user_id in self._dirty:
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                try:
+                    batch.append((user_id, json.dumps(entry[0], ensure_ascii=False, default=str)))
+                except (TypeError, ValueError) as e:
+                    # Bỏ context hỏng khỏi batch để không chặn flush của các user khác
+                    print(f"⚠️ Context {user_id} not serializable, skipped: {e}")
+            self._dirty.clear()
+
+        try:
+            self.backend.set_many(batch, ttl=self.ttl_seconds)
+            self.stats_counters["writes"] += len(batch)
+            self.stats_counters["flushes"] += 1
+        except Exception as e:
+            print(f"⚠️ Context flush failed ({self.backend.name}): {e}")
+            with self._lock:
+                self._dirty.update(user_id for user_id, _ in batch if user_id in self._entries)
+
+    def evict_expired(self) -> int:
+        """Bỏ các context hết hạn khỏi LRU (ContextSweeper gọi mỗi lượt), trả về số entry đã bỏ"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [user_id for user_id, (_, touched_at) in self._entries.items()
+                       if touched_at < cutoff and user_id not in self._dirty]
+            for user_id in expired:
+                del self._entries[user_id]
+            self.stats_counters["expired"] += len(expired)
+        return len(expired)
+
+    def sweep(self) -> Dict[str, int]:
+        """Bỏ các context hết hạn khỏi LRU và backend (gọi tay; chạy nền thì dùng ContextSweeper)"""
+        evicted = self.evict_expired()
+        removed = self.backend.delete_expired(self.ttl_seconds)
+        return {"evicted": evicted, "deleted": removed}
+
+    def _evict_over_capacity(self):
+        """Gọi trong lock - context dirty bị đẩy ra thì ghi ngay"""
+        while len(self._entries) > self.max_entries:
+            user_id, (context, _) = self._entries.popitem(last=False)
+            self.stats_counters["evictions"] += 1
+            if user_id in self._dirty:
+                self._dirty.discard(user_id)
+                self.backend.set(user_id, json.dumps(context, ensure_ascii=False, default=str), ttl=self.ttl_seconds)
+                self.stats_counters["writes"] += 1
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run_worker, name="context-storage-writer", daemon=True)
+                self._worker.start()
+
+    def _run_worker(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # Lỗi ngoài backend (vd. context không serialize được) không được làm chết thread writer
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Context flush failed: {e}")
+
+    def stop(self):
+        """Dừng thread nền và flush phần còn lại"""
+        self._stopped = True
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "cached": len(self._entries),
+                "max_entries": self.max_entries,
+                "dirty": len(self._dirty),
+                **self.stats_counters
+            }
 
 # Global instance
-context_storage = ContextStorage()
\ No newline at end of file
+# Nhiều worker: LRU trong process sẽ cũ so với worker khác => mặc định write-through, không cache
+_multi_worker = worker_count() > 1
+context_storage = ContextStorage(
+    max_entries=int(os.getenv("CONTEXT_CACHE_SIZE", "0" if _multi_worker else "1024")),
+    flush_interval=float(os.getenv("CONTEXT_FLUSH_INTERVAL", "0" if _multi_worker else "1.0"))
+)
@@ -0,0 +1,154 @@
+"""
+Context Sweeper - Dọn session hết hạn và compact data/contexts thành segment file theo shard
+
+- Xóa session có last_updated quá TTL (file lẻ lẫn record trong segment)
+- Gom các file lẻ đã nguội (không ghi trong min_age) vào segments/shard-XX.jsonl
+- Mỗi lượt chạy trả về report: số file quét/xóa/compact và số byte thu hồi
+
+Chạy nền trong FastAPI lifespan (run_forever) hoặc qua scripts/sweep_contexts.py.
+Đây là job hết hạn định kỳ duy nhất của context: mỗi lượt cũng bỏ entry hết hạn khỏi LRU
+của ContextStorage, với backend SQLite/Redis thì chỉ gọi backend.delete_expired (không compact).
+Bản async xử lý từng shard trong thread riêng và nhường event loop giữa các shard,
+nên một lượt sweep không bao giờ chặn request đang xử lý.
+"""
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+from utils.async_bridge import async_bridge
+from utils.state_backends import StateBackend, FileBackend, shard_for
+
+
+class ContextSweeper:
+    """TTL sweeper (mọi backend) + compaction cho FileBackend"""
+
+    def __init__(self, backend: StateBackend, ttl_hours: float = 24, min_age_minutes: float = 30,
+                 storage=None):
+        self.backend = backend
+        self.storage = storage
+        self.ttl_seconds = ttl_hours * 3600
+        self.min_age_seconds = min_age_minutes * 60
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self._running = False
+
+    def _group_by_shard(self) -> Dict[int, List[os.DirEntry]]:
+        """Scan thư mục một lần, chia file lẻ theo shard"""
+        groups: Dict[int, List[os.DirEntry]] = defaultdict(list)
+        for entry in self.backend.loose_files():
+            groups[shard_for(entry.name[:-5], self.backend.shards)].append(entry)
+        return groups
+
+    def _sweep_cache(self, report: Dict[str, Any]):
+        """Bỏ entry hết hạn khỏi LRU; backend không phải file thì xóa key hết hạn luôn"""
+        if self.storage is not None:
+            report["cache_evicted"] = self.storage.evict_expired()
+        if not isinstance(self.backend, FileBackend):
+            report["expired_deleted"] += self.backend.delete_expired(self.ttl_seconds)
+
+    def _pending_shards(self, groups: Dict[int, List[os.DirEntry]]) -> List[int]:
+        # Shard có file lẻ hoặc đã có segment (có thể còn record hết hạn / tombstone)
+        return [shard for shard in range(self.backend.shards)
+                if groups.get(shard) or os.path.exists(self.backend.segment_path(shard))]
+
+    def _new_report(self, dry_run: bool) -> Dict[str, Any]:
+        return {
+            "scanned": 0, "expired_deleted": 0, "cache_evicted": 0, "compacted": 0, "kept_loose": 0,
+            "shards_processed": 0, "bytes_before": 0, "bytes_after": 0,
+            "bytes_reclaimed": 0, "dry_run": dry_run
+        }
+
+    def _merge(self, report: Dict[str, Any], stats: Dict[str, int]):
+        report["scanned"] += stats["scanned"]
+        report["expired_deleted"] += stats["expired"]
+        report["compacted"] += stats["compacted"]
+        report["kept_loose"] += stats["kept_loose"]
+        report["bytes_before"] += stats["bytes_before"]
+        report["bytes_after"] += stats["bytes_after"]
+        report["shards_processed"] += 1
+
+    def _finish(self, report: Dict[str, Any], started: float) -> Dict[str, Any]:
+        report["bytes_reclaimed"] = report["bytes_before"] - report["bytes_after"]
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        report["finished_at"] = time.time()
+        self.last_report = report
+        self.runs += 1
+        return report
+
+    def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Một lượt sweep đồng bộ (CLI)"""
+        started = time.perf_counter()
+        report = self._new_report(dry_run)
+        if not dry_run:
+            self._sweep_cache(report)
+        if not isinstance(self.backend, FileBackend):
+            return self._finish(report, started)
+        groups = self._group_by_shard()
+
+        for shard in self._pending_shards(groups):
+            stats = self.backend.compact_shard(shard, groups.get(shard, []), self.ttl_seconds,
+                                               self.min_age_seconds, dry_run=dry_run)
+            self._merge(report, stats)
+
+        return self._finish(report, started)
+
+    async def run_async(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Một lượt sweep không chặn event loop: mỗi shard một bước trong thread pool"""
+        if self._running:
+            return self.last_report or {}
+        self._running = True
+        try:
+            started = time.perf_counter()
+            report = self._new_report(dry_run)
+            if not dry_run:
+                await async_bridge.run("ContextSweeper", self._sweep_cache, report)
+            if not isinstance(self.backend, FileBackend):
+                return self._finish(report, started)
+            groups = await async_bridge.run("ContextSweeper", self._group_by_shard)
+
+            for shard in self._pending_shards(groups):
+                stats = await async_bridge.run(
+                    "ContextSweeper", self.backend.compact_shard, shard, groups.get(shard, []),
+                    self.ttl_seconds, self.min_age_seconds, dry_run
+                )
+                self._merge(report, stats)
+                await asyncio.sleep(0)
+
+            return self._finish(report, started)
+        finally:
+            self._running = False
+
+    async def run_forever(self, interval: float):
+        """Sweep định kỳ - dùng làm background task trong lifespan"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                report = await self.run_async()
+                if report.get("expired_deleted") or report.get("compacted"):
+                    print(f"🧹 Context sweep: {report['expired_deleted']} expired, {report['compacted']} compacted, "
+                          f"{report['bytes_reclaimed']} bytes reclaimed ({report['duration_ms']}ms)")
+            except Exception as e:
+                print(f"⚠️ Context sweep failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "ttl_hours": self.ttl_seconds / 3600,
+            "min_age_minutes": self.min_age_seconds / 60,
+            "last_report": self.last_report
+        }
+
+
+def create_context_sweeper(storage=None) -> ContextSweeper:
+    """Sweeper cho context_storage hiện tại (compact chỉ áp dụng với FileBackend)"""
+    if storage is None:
+        from utils.context_storage import context_storage as storage
+    return ContextSweeper(
+        storage.backend,
+        ttl_hours=storage.ttl_seconds / 3600,
+        min_age_minutes=float(os.getenv("CONTEXT_SWEEP_MIN_AGE", "30")),
+        storage=storage
+    )
@@ -0,0 +1,169 @@
+"""
+Fake LLM - Thay ChatGoogleGenerativeAI khi benchmark/load test (không cần GOOGLE_API_KEY, không gọi mạng)
+
+- Trả JSON soạn sẵn theo loại prompt (trích xuất, intent, giá) và câu trả lời cố định cho bước synthesize
+- Độ trễ cấu hình được (delay + jitter), jitter sinh từ seed nên chạy lại cho cùng phân phối
+- Có invoke/ainvoke/stream/astream và usage_metadata như ChatGoogleGenerativeAI để tracing đếm được token
+
+    from utils.fake_llm import install_fake_llm
+    install_fake_llm(delay=0.3, jitter=0.1)   # gọi TRƯỚC khi tạo orchestrator
+"""
+
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, AsyncIterator
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from utils.gazetteer import gazetteer
+
+# Module import ChatGoogleGenerativeAI ở top-level => cần thay tên này trong từng module
+PATCH_TARGETS = ("agents.intelligent_reasoning_agent", "agents.price_agent", "agents.sovico_services_agent")
+
+SYNTHESIS_RESPONSE = (
+    "Tôi đã kiểm tra các chuyến bay VietJet Air phù hợp cho bạn. "
+    "Bạn muốn xem giá vé rẻ nhất hay đặt vé luôn ạ? ✈️"
+)
+
+_QUOTED_INPUT = re.compile(r'(?:Câu hiện tại|User input):\s*"([^"]*)"')
+_PRICE_INPUT = re.compile(r'Phân tích yêu cầu về giá vé máy bay:\s*"([^"]*)"')
+
+
+def _usage(prompt: str, content: str) -> Dict[str, int]:
+    """Ước lượng token (~4 ký tự/token) cho usage_metadata"""
+    input_tokens = max(1, len(prompt) // 4)
+    output_tokens = max(1, len(content) // 4)
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel:
+    """Giả lập ChatGoogleGenerativeAI: JSON soạn sẵn sau một độ trễ cố định + jitter"""
+
+    def __init__(self, delay: float = 0.2, jitter: float = 0.0, seed: int = 0, stream_chunks: int = 8, **kwargs):
+        # kwargs: model, temperature, google_api_key... của ChatGoogleGenerativeAI - bỏ qua
+        self.delay = delay
+        self.jitter = jitter
+        self.stream_chunks = max(1, stream_chunks)
+        self.model = kwargs.get("model", "fake-gemini")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _latency(self) -> float:
+        with self._lock:
+            self.calls += 1
+            return max(0.0, self.delay + self._random.uniform(-self.jitter, self.jitter))
+
+    def respond(self, prompt: str) -> str:
+        """Câu trả lời soạn sẵn theo loại prompt"""
+        if "Xác định intent" in prompt:
+            return json.dumps(self._intent(self._quoted(prompt)), ensure_ascii=False)
+        if "Câu hiện tại:" in prompt:
+            return json.dumps(self._entities(self._quoted(prompt)), ensure_ascii=False)
+        price_input = _PRICE_INPUT.search(prompt)
+        if price_input:
+            entities = self._entities(price_input.group(1))
+            entities["price_intent"] = "find_cheapest" if "rẻ" in price_input.group(1).lower() else "check_price"
+            return json.dumps(entities, ensure_ascii=False)
+        if "Suy luận về ý định kiểm tra giá" in prompt:
+            return '{"primary_intent": "find_cheapest", "flexibility": "medium", "budget_conscious": true, "comparison_needed": false, "confidence": 0.8}'
+        return SYNTHESIS_RESPONSE
+
+    @staticmethod
+    def _quoted(prompt: str) -> str:
+        match = _QUOTED_INPUT.search(prompt)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _entities(text: str) -> Dict[str, Any]:
+        places = [place.city for _, place in gazetteer.find_in_text(text)]
+        lower = text.lower()
+        date = next((word for word in ("hôm nay", "ngày mai", "cuối tuần") if word in lower), "")
+        return {
+            "locations": {"from": places[0] if len(places) > 1 else "", "to": places[-1] if places else ""},
+            "time": {"date": date, "time_preference": ""},
+            "passengers": 1,
+            "preferences": {"price_range": "cheapest" if "rẻ" in lower else ""},
+            "intent_signals": [],
+            "conversation_type": "search"
+        }
+
+    @staticmethod
+    def _intent(text: str) -> Dict[str, Any]:
+        lower = text.lower()
+        if any(word in lower for word in ("đặt", "mua", "book")):
+            intent, agent = "booking", "BookingAgent"
+        elif any(word in lower for word in ("giá", "bao nhiêu", "rẻ")):
+            intent, agent = "price_check", "PriceAgent"
+        else:
+            intent, agent = "search", "SearchAgent"
+        return {"primary_intent": intent, "target_agent": agent, "ready_for_action": True, "confidence": 0.9}
+
+    def _message(self, prompt: Any) -> AIMessage:
+        prompt = str(prompt)
+        content = self.respond(prompt)
+        return AIMessage(content=content, usage_metadata=_usage(prompt, content))
+
+    def _chunks(self, prompt: Any):
+        message = self._message(prompt)
+        content = message.content
+        size = max(1, -(-len(content) // self.stream_chunks))
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        for piece in pieces[:-1]:
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(content=pieces[-1], usage_metadata=message.usage_metadata)
+
+    def invoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        time.sleep(self._latency())
+        return self._message(prompt)
+
+    async def ainvoke(self, prompt: Any, *args, **kwargs) -> AIMessage:
+        await asyncio.sleep(self._latency())
+        return self._message(prompt)
+
+    def stream(self, prompt: Any, *args, **kwargs) -> Iterator[AIMessageChunk]:
+        # Độ trễ tổng như invoke, chia đều giữa các chunk
+        per_chunk = self._latency() / self.stream_chunks
+        for chunk in self._chunks(prompt):
+            time.sleep(per_chunk)
+            yield chunk
+
+    async def astream(self, prompt: Any, *args, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        per_chunk = self._latency() / self.stream_chunks
+        for chunk in self._chunks(prompt):
+            await asyncio.sleep(per_chunk)
+            yield chunk
+
+
+def install_fake_llm(delay: float = None, jitter: float = None, seed: int = 0, stream_chunks: int = 8) -> Dict[str, Any]:
+    """Thay ChatGoogleGenerativeAI bằng FakeChatModel trong các agent - gọi trước khi tạo orchestrator
+
+    Mặc định đọc FAKE_LLM_DELAY_MS / FAKE_LLM_JITTER_MS. Đặt GOOGLE_API_KEY giả nếu chưa có
+    để HybridOrchestrator chọn chế độ langchain.
+    """
+    import importlib
+
+    settings = {
+        "delay": delay if delay is not None else float(os.getenv("FAKE_LLM_DELAY_MS", "200")) / 1000,
+        "jitter": jitter if jitter is not None else float(os.getenv("FAKE_LLM_JITTER_MS", "0")) / 1000,
+        "seed": seed,
+        "stream_chunks": stream_chunks
+    }
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-llm-key")
+    os.environ["LLM_PROVIDER"] = "gemini"
+
+    factory = functools.partial(FakeChatModel, **settings)
+    for module_name in PATCH_TARGETS:
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            print(f"⚠️ Fake LLM: skip {module_name} ({e})")
+            continue
+        module.ChatGoogleGenerativeAI = factory
+    return settings
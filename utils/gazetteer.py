@@ -0,0 +1,261 @@
+"""
+Gazetteer - Bảng địa danh/sân bay dùng chung cho mọi agent
+
+- Một nguồn alias duy nhất cho mỗi sân bay (tên tiếng Việt, không dấu, viết tắt, mã IATA)
+- Bỏ dấu tiếng Việt trước khi tra ("Đà Nẵng" → "da nang"), bỏ khoảng trắng ("tphcm", "phuquoc")
+- Tra gõ sai qua n-gram index + Levenshtein có giới hạn trên các alias đã bỏ dấu; cụm nhiều từ
+  phải cùng số từ, cùng chữ cái đầu mỗi từ và sai tối đa 1 ký tự mỗi từ - không chắc thì trả None
+- Kết quả chuẩn: Place(iata, city, name, airport)
+"""
+
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class Place(NamedTuple):
+    iata: str
+    city: str       # Tên chuẩn tiếng Anh mà mock data / agents dùng ("Ho Chi Minh City")
+    name: str       # Tên tiếng Việt hiển thị
+    airport: str
+
+
+# IATA -> (city, tên tiếng Việt, sân bay, aliases)
+AIRPORTS = {
+    "HAN": ("Hanoi", "Hà Nội", "Sân bay Nội Bài",
+            ["hà nội", "hanoi", "hn", "thủ đô", "nội bài", "hà nội city"]),
+    "SGN": ("Ho Chi Minh City", "TP.HCM", "Sân bay Tân Sơn Nhất",
+            ["hồ chí minh", "ho chi minh city", "thành phố hồ chí minh", "tp hồ chí minh", "sài gòn", "saigon",
+             "hcm", "tphcm", "tp hcm", "tp.hcm", "sg", "tân sơn nhất", "miền nam"]),
+    "DAD": ("Da Nang", "Đà Nẵng", "Sân bay Đà Nẵng",
+            ["đà nẵng", "danang", "đn", "dn", "miền trung"]),
+    "PQC": ("Phu Quoc", "Phú Quốc", "Sân bay Phú Quốc",
+            ["phú quốc", "pq", "đảo ngọc"]),
+    "CXR": ("Nha Trang", "Nha Trang", "Sân bay Cam Ranh",
+            ["nha trang", "nt", "cam ranh", "khánh hòa"]),
+    "DLI": ("Da Lat", "Đà Lạt", "Sân bay Liên Khương",
+            ["đà lạt", "dl", "thành phố hoa", "liên khương", "lâm đồng"]),
+    "VCA": ("Can Tho", "Cần Thơ", "Sân bay Cần Thơ",
+            ["cần thơ", "ct", "miền tây"]),
+    "HPH": ("Hai Phong", "Hải Phòng", "Sân bay Cát Bi",
+            ["hải phòng", "hp", "cát bi"]),
+    "HUI": ("Hue", "Huế", "Sân bay Phú Bài",
+            ["huế", "cố đô", "kinh thành", "phú bài"]),
+    "VTG": ("Vung Tau", "Vũng Tàu", "Sân bay Vũng Tàu",
+            ["vũng tàu", "vt", "bà rịa"]),
+    "UIH": ("Quy Nhon", "Quy Nhơn", "Sân bay Phù Cát",
+            ["quy nhơn", "quy nhon", "qn", "bình định", "phù cát"]),
+    "VII": ("Vinh", "Vinh", "Sân bay Vinh",
+            ["vinh", "nghệ an"]),
+    "PXU": ("Pleiku", "Pleiku", "Sân bay Pleiku",
+            ["pleiku", "gia lai"]),
+    "BMV": ("Buon Ma Thuot", "Buôn Ma Thuột", "Sân bay Buôn Ma Thuột",
+            ["buôn ma thuột", "bmt", "đắk lắk", "daklak"]),
+    "VCS": ("Con Dao", "Côn Đảo", "Sân bay Côn Đảo",
+            ["côn đảo"]),
+    "VKG": ("Rach Gia", "Rạch Giá", "Sân bay Rạch Giá",
+            ["rạch giá", "kiên giang"]),
+    "CAH": ("Ca Mau", "Cà Mau", "Sân bay Cà Mau",
+            ["cà mau", "mũi cà mau"]),
+    "THD": ("Thanh Hoa", "Thanh Hóa", "Sân bay Thọ Xuân",
+            ["thanh hóa", "thọ xuân"]),
+    "VDH": ("Dong Hoi", "Đồng Hới", "Sân bay Đồng Hới",
+            ["đồng hới", "quảng bình"]),
+    "TBB": ("Tuy Hoa", "Tuy Hòa", "Sân bay Tuy Hòa",
+            ["tuy hòa", "phú yên"]),
+    "VCL": ("Chu Lai", "Chu Lai", "Sân bay Chu Lai",
+            ["chu lai", "quảng nam", "tam kỳ"]),
+    "DIN": ("Dien Bien Phu", "Điện Biên", "Sân bay Điện Biên Phủ",
+            ["điện biên", "điện biên phủ"]),
+    "VDO": ("Van Don", "Vân Đồn", "Sân bay Vân Đồn",
+            ["vân đồn", "quảng ninh", "hạ long"]),
+}
+
+
+def fold_diacritics(text: str) -> str:
+    """Bỏ dấu + lowercase + gom khoảng trắng: "Đà Nẵng" → "da nang", "TP.HCM" → "tp hcm" """
+    text = unicodedata.normalize("NFD", (text or "").lower().replace("đ", "d").replace("Đ", "d"))
+    text = "".join(char if char.isalnum() else " " for char in text if not unicodedata.combining(char))
+    return " ".join(text.split())
+
+
+def levenshtein(a: str, b: str, limit: int) -> int:
+    """Khoảng cách Levenshtein, dừng sớm khi chắc chắn > limit (trả về limit + 1)"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NGramIndex:
+    """Inverted index bigram → key, lọc ứng viên trước khi tính Levenshtein
+
+    q-gram lemma: hai chuỗi cách nhau k phép sửa có chung ít nhất
+    max(len) + 1 - 2k bigram (chuỗi được đệm "$" hai đầu)
+    """
+
+    def __init__(self):
+        # bigram -> [(key index, số lần xuất hiện trong key)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.keys: List[str] = []
+
+    @staticmethod
+    def grams(text: str) -> List[str]:
+        padded = f"${text}$"
+        return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+    def add(self, key: str):
+        index = len(self.keys)
+        self.keys.append(key)
+        for gram, count in Counter(self.grams(key)).items():
+            self.postings.setdefault(gram, []).append((index, count))
+
+    def search(self, text: str, tolerance: int) -> List[Tuple[int, str]]:
+        """[(distance, key)] trong bán kính tolerance, sắp theo distance tăng dần"""
+        shared: Dict[int, int] = {}
+        for gram, query_count in Counter(self.grams(text)).items():
+            for index, key_count in self.postings.get(gram, ()):
+                shared[index] = shared.get(index, 0) + min(query_count, key_count)
+
+        found = []
+        for index, count in shared.items():
+            key = self.keys[index]
+            if count < max(len(key), len(text)) + 1 - 2 * tolerance:
+                continue
+            distance = levenshtein(text, key, tolerance)
+            if distance <= tolerance:
+                found.append((distance, key))
+        return sorted(found)
+
+
+class Gazetteer:
+    """Tra địa danh → Place, không phân biệt dấu, chịu được lỗi gõ"""
+
+    def __init__(self, airports: Dict[str, tuple] = AIRPORTS, cache_size: int = 4096):
+        self.places: Dict[str, Place] = {}
+        self.aliases: Dict[str, List[str]] = {}
+        # alias đã bỏ dấu (và bản bỏ khoảng trắng) -> IATA
+        self._exact: Dict[str, str] = {}
+        self._fuzzy = NGramIndex()
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self.cache_size = cache_size
+        self.max_words = 1
+
+        for iata, (city, name, airport, aliases) in airports.items():
+            self.places[iata] = Place(iata, city, name, airport)
+            all_aliases = [iata.lower(), city.lower(), name.lower()] + list(aliases)
+            self.aliases[iata] = list(dict.fromkeys(all_aliases))
+            for alias in self.aliases[iata]:
+                folded = fold_diacritics(alias)
+                if not folded:
+                    continue
+                self._exact.setdefault(folded, iata)
+                self._exact.setdefault(folded.replace(" ", ""), iata)
+                self.max_words = max(self.max_words, len(folded.split()))
+                # Viết tắt ngắn (hn, dn, sg...) không tra fuzzy - dễ khớp nhầm
+                if len(folded) >= 4:
+                    self._fuzzy.add(folded)
+
+    @staticmethod
+    def tolerance_for(text: str) -> int:
+        return 0 if len(text) < 4 else 1 if len(text) < 8 else 2
+
+    @staticmethod
+    def _plausible_typo(folded: str, alias: str) -> bool:
+        """Cùng số từ, cùng chữ cái đầu từng từ, mỗi từ sai tối đa 1 ký tự
+
+        Chặn các địa danh thật không có trong bảng khớp nhầm sang sân bay khác
+        ("thanh hoa" ≠ "khanh hoa", "ninh binh" ≠ "binh dinh").
+        """
+        words, alias_words = folded.split(), alias.split()
+        if len(words) != len(alias_words):
+            return False
+        return all(word[0] == alias_word[0] and levenshtein(word, alias_word, 1) <= 1
+                   for word, alias_word in zip(words, alias_words))
+
+    def _lookup(self, folded: str, fuzzy: bool = True) -> Optional[str]:
+        iata = self._exact.get(folded) or self._exact.get(folded.replace(" ", ""))
+        if iata or not fuzzy:
+            return iata
+        tolerance = self.tolerance_for(folded)
+        if tolerance == 0:
+            return None
+        matches = [(distance, alias) for distance, alias in self._fuzzy.search(folded, tolerance)
+                   if self._plausible_typo(folded, alias)]
+        if not matches:
+            return None
+        # Nhiều sân bay cùng khoảng cách tốt nhất => không đoán
+        best = {self._exact[alias] for distance, alias in matches if distance == matches[0][0]}
+        return best.pop() if len(best) == 1 else None
+
+    def _cached_lookup(self, folded: str, fuzzy: bool) -> Optional[str]:
+        cache_key = folded if fuzzy else f"={folded}"
+        if cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            return self._cache[cache_key]
+        iata = self._lookup(folded, fuzzy)
+        self._cache[cache_key] = iata
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return iata
+
+    def resolve(self, text: str, fuzzy: bool = True) -> Optional[Place]:
+        """Tên/alias/IATA bất kỳ → Place (None nếu không nhận ra)"""
+        folded = fold_diacritics(text)
+        if not folded:
+            return None
+        iata = self._cached_lookup(folded, fuzzy)
+        return self.places[iata] if iata else None
+
+    def to_iata(self, text: str) -> Optional[str]:
+        place = self.resolve(text)
+        return place.iata if place else None
+
+    def to_city(self, text: str, default: Optional[str] = None) -> Optional[str]:
+        place = self.resolve(text)
+        return place.city if place else default
+
+    def find_in_text(self, text: str, fuzzy: bool = True) -> List[Tuple[int, Place]]:
+        """Các địa danh trong một câu: [(vị trí từ, Place)] - ưu tiên cụm dài nhất từ trái sang"""
+        words = fold_diacritics(text).split()
+        found = []
+        position = 0
+        while position < len(words):
+            for size in range(min(self.max_words, len(words) - position), 0, -1):
+                phrase = " ".join(words[position:position + size])
+                iata = self._cached_lookup(phrase, fuzzy and len(phrase) >= 5)
+                if iata:
+                    found.append((position, self.places[iata]))
+                    position += size
+                    break
+            else:
+                position += 1
+        return found
+
+    def alias_table(self, field: str = "iata") -> Dict[str, str]:
+        """{alias: iata/city} gồm cả bản có dấu lẫn bỏ dấu - dùng để build KeywordAutomaton"""
+        table = {}
+        for iata, aliases in self.aliases.items():
+            value = getattr(self.places[iata], field)
+            for alias in aliases:
+                table.setdefault(alias, value)
+                table.setdefault(fold_diacritics(alias), value)
+        return table
+
+    def city_codes(self) -> Dict[str, str]:
+        """{city: IATA}"""
+        return {place.city: iata for iata, place in self.places.items()}
+
+    def airport_names(self) -> Dict[str, str]:
+        """{IATA: tên sân bay}"""
+        return {iata: place.airport for iata, place in self.places.items()}
+
+# Global instance
+gazetteer = Gazetteer()
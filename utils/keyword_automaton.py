@@ -0,0 +1,147 @@
+"""
+Keyword Automaton - Aho-Corasick cho các từ điển NLU tiếng Việt
+
+Gộp nhiều bảng keyword (địa điểm, số khách, hạng ghế, thời gian...) vào một automaton
+build một lần. Một lượt quét message trả về mọi match kèm vị trí và category,
+thay cho việc chạy `keyword in text` với từng entry của từng bảng.
+
+- Alphabet là từ (token \w+) chứ không phải ký tự => số bước = số từ của message,
+  và chỉ nhận match trọn từ: "em" không khớp trong "xem"
+- Mỗi category được giải quyết theo leftmost-longest => "ngày mai" thắng "mai",
+  "cuối tuần sau" thắng "tuần sau"
+"""
+
+import re
+import unicodedata
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC + lowercase - keyword và message phải cùng dạng chuẩn hóa"""
+    return unicodedata.normalize("NFC", text or "").lower()
+
+
+class KeywordMatch(NamedTuple):
+    start: int
+    end: int
+    keyword: str
+    category: str
+    value: Any
+
+
+class KeywordAutomaton:
+    """Multi-pattern matcher (Aho-Corasick) - thời gian quét tuyến tính theo độ dài message"""
+
+    def __init__(self):
+        # (keyword, category, value, số token) theo thứ tự thêm vào
+        self._entries: List[Tuple[str, str, Any, int]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._built = False
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, Dict[str, Any]]) -> "KeywordAutomaton":
+        """Build từ {category: {keyword: value}}"""
+        automaton = cls()
+        for category, table in tables.items():
+            automaton.add_table(category, table)
+        return automaton.build()
+
+    def add(self, keyword: str, category: str, value: Any = None):
+        keyword = normalize_text(keyword).strip()
+        tokens = _TOKEN_PATTERN.findall(keyword)
+        if not tokens:
+            return
+        self._entries.append((keyword, category, value, len(tokens)))
+
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][token] = next_node
+            node = next_node
+        self._out[node].append(len(self._entries) - 1)
+        self._built = False
+
+    def add_table(self, category: str, table: Dict[str, Any]):
+        for keyword, value in table.items():
+            self.add(keyword, category, value)
+
+    def build(self) -> "KeywordAutomaton":
+        """Tính failure link theo BFS, gộp output của suffix vào từng node"""
+        queue = []
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> List[KeywordMatch]:
+        """Mọi match (có thể chồng nhau) trên text đã normalize_text"""
+        if not self._built:
+            self.build()
+
+        goto, fail, out, entries = self._goto, self._fail, self._out, self._entries
+        matches = []
+        starts = []
+        node = 0
+        for position, token_match in enumerate(_TOKEN_PATTERN.finditer(text)):
+            token = token_match.group()
+            starts.append(token_match.start())
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for index in out[node]:
+                keyword, category, value, length = entries[index]
+                matches.append(KeywordMatch(starts[position + 1 - length], token_match.end(), keyword, category, value))
+        return matches
+
+    def scan(self, text: str) -> Dict[str, List[KeywordMatch]]:
+        """Quét một lượt, trả về {category: [match]} không chồng nhau theo leftmost-longest"""
+        by_category: Dict[str, List[KeywordMatch]] = {}
+        for match in self.iter_matches(text):
+            by_category.setdefault(match.category, []).append(match)
+
+        for category, matches in by_category.items():
+            matches.sort(key=lambda m: (m.start, -(m.end - m.start)))
+            selected, last_end = [], -1
+            for match in matches:
+                if match.start >= last_end:
+                    selected.append(match)
+                    last_end = match.end
+            by_category[category] = selected
+        return by_category
+
+    @staticmethod
+    def first(scanned: Dict[str, List[KeywordMatch]], category: str) -> Optional[KeywordMatch]:
+        matches = scanned.get(category)
+        return matches[0] if matches else None
+
+    @staticmethod
+    def within(scanned: Dict[str, List[KeywordMatch]], category: str, start: int, end: int) -> List[KeywordMatch]:
+        """Các match của category nằm trọn trong [start, end)"""
+        return [m for m in scanned.get(category, []) if m.start >= start and m.end <= end]
+
+    def __len__(self) -> int:
+        return len(self._entries)
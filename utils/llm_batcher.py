@@ -0,0 +1,99 @@
+"""
+LLM Batcher - Gom các prompt gửi đồng thời thành một lời gọi llm.abatch (dùng cho /chat/batch)
+
+- Prompt đến trong cùng cửa sổ window_ms (hoặc đủ max_batch) được gửi chung một batch
+- Prompt trùng nhau trong batch chỉ gọi LLM một lần (eval set thường lặp câu hỏi giữa các user)
+- Chỉ bật trong context của batch runner (llm_batching), request /chat thường không bị chờ cửa sổ
+
+LangChain Runnable nào cũng có abatch; provider hỗ trợ batch thật sẽ gom thành ít request hơn,
+provider khác (Gemini) vẫn được giới hạn concurrency + bỏ trùng lặp.
+"""
+
+import asyncio
+import os
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# True trong các task của batch runner => IntelligentReasoningAgent gửi prompt extract qua batcher
+llm_batching: ContextVar[bool] = ContextVar("llm_batching", default=False)
+
+
+class LLMBatcher:
+    """Gom prompt theo cửa sổ thời gian rồi gọi llm.abatch một lần"""
+
+    def __init__(self, llm, max_batch: int = 16, window_ms: float = 10, max_concurrency: int = 8):
+        self.llm = llm
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self.max_concurrency = max_concurrency
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()  # giữ reference tới task batch đang chạy
+        self.stats_counters = {"batches": 0, "prompts": 0, "deduped": 0, "errors": 0}
+
+    async def ainvoke(self, prompt: str) -> Any:
+        """Như llm.ainvoke nhưng đi chung batch với các prompt đồng thời khác"""
+        loop = asyncio.get_running_loop()
+        self.stats_counters["prompts"] += 1
+        future = self._pending.get(prompt)
+        if future is not None and future.get_loop() is loop:
+            self.stats_counters["deduped"] += 1
+        else:
+            future = self._pending[prompt] = loop.create_future()
+            # Caller có thể đã timeout hết => đánh dấu exception đã được đọc để asyncio không cảnh báo
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        # shield: một caller timeout không được hủy kết quả của các caller dùng chung prompt
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = list(self._pending.items()), {}
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        prompts = [prompt for prompt, _ in batch]
+        self.stats_counters["batches"] += 1
+        try:
+            if hasattr(self.llm, "abatch"):
+                results = await self.llm.abatch(prompts, config={"max_concurrency": self.max_concurrency},
+                                                return_exceptions=True)
+            else:
+                results = await asyncio.gather(*(self.llm.ainvoke(prompt) for prompt in prompts),
+                                               return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(prompts)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                self.stats_counters["errors"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"max_batch": self.max_batch, "window_ms": self.window * 1000, **self.stats_counters}
+
+
+def create_llm_batcher(llm) -> Optional[LLMBatcher]:
+    """Batcher cho bước extract (LLM_BATCH_SIZE <= 1 => tắt)"""
+    max_batch = int(os.getenv("LLM_BATCH_SIZE", "16"))
+    if llm is None or max_batch <= 1:
+        return None
+    return LLMBatcher(
+        llm,
+        max_batch=max_batch,
+        window_ms=float(os.getenv("LLM_BATCH_WINDOW_MS", "10")),
+        max_concurrency=int(os.getenv("LLM_BATCH_CONCURRENCY", "8"))
+    )
@@ -0,0 +1,158 @@
+"""
+LLM Response Cache - Cache LRU + TTL cho các lời gọi LLM trích xuất/phân tích intent
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_utterance(text: str) -> str:
+    """Chuẩn hóa câu nói giống VietnameseNLU._normalize_vietnamese"""
+    text = _PUNCTUATION_RE.sub(' ', (text or "").lower())
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def hash_slots(slots: Dict[str, Any]) -> str:
+    """Hash ổn định cho các context slot (không phụ thuộc thứ tự key)"""
+    canonical = json.dumps(slots or {}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class LLMResponseCache:
+    """Cache in-memory có giới hạn kích thước, hết hạn theo TTL, tùy chọn lưu xuống SQLite"""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 6 * 3600, persist_path: str = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._db = None
+        if persist_path:
+            self._open_store(persist_path)
+
+    def _open_store(self, path: str):
+        """Mở on-disk store để cache sống sót qua restart"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache store disabled ({path}): {e}")
+            self._db = None
+
+    def make_key(self, namespace: str, text: str, slots: Dict[str, Any] = None) -> str:
+        """Key = namespace + câu đã chuẩn hóa + hash context slots + ngày hiện tại
+
+        Ngày hiện tại nằm trong key vì LLM có thể quy đổi "ngày mai" thành ngày cụ thể.
+        """
+        today = datetime.now().strftime("%Y-%m-%d")
+        return f"{namespace}|{today}|{hash_slots(slots)}|{normalize_utterance(text)}"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            value = self._load_from_store(key, now)
+            if value is not None:
+                self._remember(key, value, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, value, now)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️ LLM cache write failed: {e}")
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load_from_store(self, key: str, now: float) -> Optional[str]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row and now - row[1] <= self.ttl_seconds:
+            return row[0]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "persistent": self._db is not None
+        }
+
+
+# Global instance
+llm_cache = LLMResponseCache(
+    max_size=int(os.getenv("LLM_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(6 * 3600))),
+    persist_path=os.getenv("LLM_CACHE_PATH") or None
+)
@@ -0,0 +1,37 @@
+"""
+Logger - Thay cho print(f"DEBUG: ...") rải rác trong agents/orchestrators
+
+Log level đọc từ LOG_LEVEL (mặc định INFO => log debug bị tắt, không tốn thời gian format).
+Dùng tham số kiểu %s để message chỉ được format khi level được bật:
+
+    log = get_logger(__name__)
+    log.debug("Found %s flights", len(flights))
+"""
+
+import logging
+import os
+import sys
+
+_ROOT_LOGGER = "booking"
+_configured = False
+
+
+def configure(level: str = None):
+    """Gắn handler stdout cho logger gốc "booking" (gọi lại để đổi level)"""
+    global _configured
+    root = logging.getLogger(_ROOT_LOGGER)
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if not _configured:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        root.addHandler(handler)
+        root.propagate = False
+        _configured = True
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger con của "booking" - vd get_logger("agents.search_agent") → booking.agents.search_agent"""
+    if not _configured:
+        configure()
+    return logging.getLogger(f"{_ROOT_LOGGER}.{name}")
@@ -1,14 +1,88 @@
 import re
-from typing import Dict, Tuple, Any
+from typing import Dict, Tuple, Any, Optional
 from datetime import datetime, timedelta
 from difflib import SequenceMatcher
+from utils.keyword_automaton import KeywordAutomaton, normalize_text
+from utils.gazetteer import gazetteer
+from utils.time_parser import weekend_date
 try:
     from underthesea import word_tokenize
-    from fuzzywuzzy import fuzz, process
 except ImportError:
     word_tokenize = None
-    fuzz = None
-    process = None
+
+_PUNCTUATION_PATTERN = re.compile(r'[^\w\s]')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Semantic keywords theo intent, trọng số theo mức strong/medium/weak
+SEMANTIC_KEYWORDS = {
+    'flight_search': {
+        'strong': ['tìm vé', 'chuyến bay', 'máy bay', 'tìm chuyến'],
+        'medium': ['tìm', 'vé', 'bay', 'chuyến', 'còn vé', 'có vé'],
+        'weak': ['từ', 'đến', 'đi', 'khởi hành']
+    },
+    'price_check': {
+        'strong': ['giá vé', 'bao nhiêu tiền', 'vé rẻ nhất', 'chi phí'],
+        'medium': ['giá', 'tiền', 'bao nhiêu', 'rẻ', 'đắt', 'cost'],
+        'weak': ['nhất', 'cả', 'thế nào']
+    },
+    'booking': {
+        'strong': ['đặt vé', 'book vé', 'mua vé', 'đặt chỗ'],
+        'medium': ['đặt', 'book', 'mua', 'order', 'chốt'],
+        'weak': ['ngay', 'luôn', 'cho tôi']
+    },
+    'combo_service': {
+        'strong': ['combo', 'gói dịch vụ', 'khách sạn'],
+        'medium': ['gói', 'tour', 'dịch vụ thêm'],
+        'weak': ['thêm', 'kèm', 'package']
+    },
+    'general': {
+        'strong': ['xin chào', 'hello', 'hi', 'cảm ơn', 'thanks'],
+        'medium': ['chào', 'hỗ trợ', 'giúp', 'hướng dẫn', 'làm sao', 'như thế nào'],
+        'weak': ['cần', 'muốn', 'có thể', 'được không']
+    }
+}
+
+KEYWORD_WEIGHTS = {'strong': 3.0, 'medium': 1.0, 'weak': 0.3}
+
+
+class IntentScorer:
+    """Intent scorer biên dịch sẵn - build một lần, chấm điểm mọi intent trong một lượt quét
+
+    - Bảng trọng số keyword nằm trong một KeywordAutomaton (category = intent, value = trọng số)
+    - intent_patterns gộp thành một regex alternation với named group <intent>__<i>
+    """
+
+    def __init__(self, semantic_keywords: Dict[str, Dict[str, list]], intent_patterns: Dict[str, list]):
+        self.intents = list(semantic_keywords)
+        self.automaton = KeywordAutomaton()
+        for intent, levels in semantic_keywords.items():
+            for level, keywords in levels.items():
+                for keyword in keywords:
+                    self.automaton.add(keyword, intent, KEYWORD_WEIGHTS[level])
+        self.automaton.build()
+
+        self.pattern_bank = re.compile("|".join(
+            f"(?P<{intent}__{index}>{pattern})"
+            for intent, patterns in intent_patterns.items()
+            for index, pattern in enumerate(patterns)
+        ), re.IGNORECASE)
+
+    def score(self, message: str) -> Dict[str, float]:
+        """Điểm của từng intent - mỗi keyword chỉ được cộng một lần như `keyword in message`"""
+        scores = dict.fromkeys(self.intents, 0.0)
+        seen = set()
+        for match in self.automaton.iter_matches(message):
+            entry = (match.keyword, match.category, match.value)
+            if entry not in seen:
+                seen.add(entry)
+                scores[match.category] += match.value
+        return scores
+
+    def match_pattern(self, message: str) -> Optional[str]:
+        """Intent của regex pattern khớp đầu tiên (trái nhất) trong message"""
+        match = self.pattern_bank.search(message)
+        return match.lastgroup.rsplit("__", 1)[0] if match else None
+
 
 class VietnameseNLU:
     """Vietnamese NLU engine for intent detection and slot extraction"""
@@ -47,21 +121,8 @@ class VietnameseNLU:
             ]
         }
         
-        # Mở rộng location mapping với nhiều cách gọi
-        self.location_mapping = {
-            # Hà Nội
-            "hà nội": "HAN", "hanoi": "HAN", "hn": "HAN", "ha noi": "HAN",
-            "thủ đô": "HAN", "nội bài": "HAN", "hà nội city": "HAN", "han": "HAN",
-            
-            # Đà Nẵng  
-            "đà nẵng": "DAD", "da nang": "DAD", "đn": "DAD", "danang": "DAD",
-            "da nẵng": "DAD", "đà nang": "DAD", "miền trung": "DAD", "dn": "DAD", "dad": "DAD",
-            
-            # TP.HCM
-            "hồ chí minh": "SGN", "sài gòn": "SGN", "hcm": "SGN", "sgn": "SGN",
-            "tp hcm": "SGN", "tp.hcm": "SGN", "saigon": "SGN", "tân sơn nhất": "SGN",
-            "thành phố hồ chí minh": "SGN", "miền nam": "SGN"
-        }
+        # Location mapping - alias (có dấu, không dấu, viết tắt, IATA) từ gazetteer dùng chung
+        self.location_mapping = gazetteer.alias_table("iata")
         
         # Mở rộng time patterns
         self.time_patterns = {
@@ -69,9 +130,38 @@ class VietnameseNLU:
             "ngày mai": 1, "tomorrow": 1, "mai": 1,
             "ngày kia": 2, "một": 2,
             "tuần sau": 7, "next week": 7,
-            "cuối tuần": 5, "weekend": 5, "thứ 7": 5, "chủ nhật": 6,
+            # Cuối tuần => thứ 7 thật (cùng quy tắc với FlexibleTimeParser), không phải +5 ngày
+            "cuối tuần": "weekend", "weekend": "weekend",
+            "cuối tuần này": "this_weekend", "cuối tuần sau": "next_weekend",
+            "thứ 7": 5, "chủ nhật": 6,
             "thứ hai": 1, "thứ ba": 2, "thứ tư": 3, "thứ năm": 4, "thứ sáu": 5
         }
+        
+        # Khung giờ trong ngày
+        self.time_ranges = {
+            "sáng": "06:00-11:59", "morning": "06:00-11:59",
+            "trưa": "12:00-13:59", "noon": "12:00-13:59", 
+            "chiều": "14:00-17:59", "afternoon": "14:00-17:59",
+            "tối": "18:00-21:59", "evening": "18:00-21:59",
+            "đêm": "22:00-05:59", "night": "22:00-05:59"
+        }
+        
+        # Hạng ghế
+        self.class_keywords = {
+            "business": "Business", "thương gia": "Business", "hạng thương gia": "Business", "business class": "Business",
+            "economy": "Economy", "phổ thông": "Economy", "hạng phổ thông": "Economy", "economy class": "Economy", "eco": "Economy"
+        }
+        
+        # Build một lần từ mọi bảng - extract_slots chỉ quét message một lượt
+        self.automaton = KeywordAutomaton.from_tables({
+            "location": self.location_mapping,
+            "date": self.time_patterns,
+            "time_range": self.time_ranges,
+            "class": self.class_keywords
+        })
+        
+        # Intent scorer: keyword weights + regex bank biên dịch một lần
+        self.intent_scorer = IntentScorer(SEMANTIC_KEYWORDS, self.intent_patterns)
 
     def extract_intent(self, message: str) -> str:
         """Extract intent linh hoạt với semantic understanding"""
@@ -97,61 +187,13 @@ class VietnameseNLU:
         
         return "general"
     
+    def intent_scores(self, message: str) -> Dict[str, float]:
+        """Điểm từng intent của một câu chưa chuẩn hóa (cùng bảng điểm với extract_intent)"""
+        return self._calculate_semantic_scores(self._normalize_vietnamese(message.lower()))
+    
     def _calculate_semantic_scores(self, message: str) -> Dict[str, float]:
-        """Tính điểm semantic cho từng intent với logic cải tiến"""
-        scores = {}
-        
-        # Định nghĩa semantic keywords với trọng số
-        semantic_keywords = {
-            'flight_search': {
-                'strong': ['tìm vé', 'chuyến bay', 'máy bay', 'tìm chuyến'],
-                'medium': ['tìm', 'vé', 'bay', 'chuyến', 'còn vé', 'có vé'],
-                'weak': ['từ', 'đến', 'đi', 'khởi hành']
-            },
-            'price_check': {
-                'strong': ['giá vé', 'bao nhiêu tiền', 'vé rẻ nhất', 'chi phí'],
-                'medium': ['giá', 'tiền', 'bao nhiêu', 'rẻ', 'đắt', 'cost'],
-                'weak': ['nhất', 'cả', 'thế nào']
-            },
-            'booking': {
-                'strong': ['đặt vé', 'book vé', 'mua vé', 'đặt chỗ'],
-                'medium': ['đặt', 'book', 'mua', 'order', 'chốt'],
-                'weak': ['ngay', 'luôn', 'cho tôi']
-            },
-            'combo_service': {
-                'strong': ['combo', 'gói dịch vụ', 'khách sạn'],
-                'medium': ['gói', 'tour', 'dịch vụ thêm'],
-                'weak': ['thêm', 'kèm', 'package']
-            },
-            'general': {
-                'strong': ['xin chào', 'hello', 'hi', 'cảm ơn', 'thanks'],
-                'medium': ['chào', 'hỗ trợ', 'giúp', 'hướng dẫn', 'làm sao', 'như thế nào'],
-                'weak': ['cần', 'muốn', 'có thể', 'được không']
-            }
-        }
-        
-        # Tính điểm cho từng intent
-        for intent, keywords in semantic_keywords.items():
-            score = 0.0
-            
-            # Strong keywords (3 điểm)
-            for keyword in keywords['strong']:
-                if keyword in message:
-                    score += 3.0
-            
-            # Medium keywords (1 điểm)
-            for keyword in keywords['medium']:
-                if keyword in message:
-                    score += 1.0
-            
-            # Weak keywords (0.3 điểm)
-            for keyword in keywords['weak']:
-                if keyword in message:
-                    score += 0.3
-            
-            scores[intent] = score
-        
-        return scores
+        """Tính điểm semantic cho từng intent (bảng trọng số build sẵn, một lượt quét)"""
+        return self.intent_scorer.score(message)
     
     def _handle_ambiguous_intent(self, message: str) -> str:
         """Xử lý intent không rõ ràng với logic thông minh hơn"""
@@ -167,6 +209,11 @@ class VietnameseNLU:
         if any(indicator in message_lower for indicator in general_indicators):
             return 'general'
         
+        # Regex bank (intent_patterns) - bắt các cách nói không có keyword như "booking", "reserve"
+        pattern_intent = self.intent_scorer.match_pattern(message_lower)
+        if pattern_intent:
+            return pattern_intent
+        
         # Kiểm tra flight-related nhưng không cụ thể
         flight_words = ['vé', 'bay', 'chuyến', 'máy bay']
         has_flight_context = any(word in message_lower for word in flight_words)
@@ -196,31 +243,26 @@ class VietnameseNLU:
     def _normalize_vietnamese(self, text: str) -> str:
         """Chuẩn hóa text tiếng Việt"""
         # Loại bỏ dấu câu thừa
-        text = re.sub(r'[^\w\s]', ' ', text)
+        text = _PUNCTUATION_PATTERN.sub(' ', text)
         # Loại bỏ khoảng trắng thừa
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _WHITESPACE_PATTERN.sub(' ', text).strip()
         return text
 
     def extract_slots(self, message: str) -> Dict[str, Any]:
         """Extract slots from message với xử lý tiếng Việt nâng cao"""
         slots = {}
-        message_lower = self._normalize_vietnamese(message.lower())
+        message_lower = self._normalize_vietnamese(normalize_text(message))
+        scanned = self.automaton.scan(message_lower)
+        
+        # Extract locations - match theo thứ tự xuất hiện (gồm cả mã ngắn như han/sgn)
+        location_matches = scanned.get("location", [])
+        locations = [match.value for match in location_matches]
         
-        # Extract locations với fuzzy matching và mã ngắn
-        locations = []
-        location_matches = []
-        
-        for location, code in self.location_mapping.items():
-            # Kiểm tra cả tên đầy đủ và mã ngắn
-            if location in message_lower or code.lower() in message_lower:
-                locations.append(code)
-                location_matches.append((location, code))
-            # Fuzzy matching cho địa danh
-            elif process and len(location) > 3:
-                match = process.extractOne(location, [message_lower], scorer=fuzz.partial_ratio)
-                if match and match[1] > 80:  # 80% similarity
-                    locations.append(code)
-                    location_matches.append((location, code))
+        # Địa danh gõ sai - tra gazetteer (n-gram index) chỉ khi match chính xác chưa đủ 2 địa điểm
+        if len(locations) < 2:
+            fuzzy_locations = list(dict.fromkeys(place.iata for _, place in gazetteer.find_in_text(message_lower)))
+            if len(fuzzy_locations) > len(locations):
+                locations = fuzzy_locations
         
         # FIX: Xử lý các pattern từ...đến, từ...tới, bay từ...đến
         patterns_to_check = [
@@ -238,22 +280,14 @@ class VietnameseNLU:
                 to_pos = message_lower.find(to_keyword)
                 
                 if from_pos != -1 and to_pos != -1 and from_pos < to_pos:
-                    # Extract phần giữa from_keyword và to_keyword
-                    from_part = message_lower[from_pos + len(from_keyword):to_pos].strip()
-                    # Extract phần sau to_keyword
-                    to_part = message_lower[to_pos + len(to_keyword):].strip()
+                    # Location giữa from_keyword và to_keyword, và location sau to_keyword
+                    from_part = self.automaton.within(scanned, "location", from_pos + len(from_keyword), to_pos)
+                    to_part = self.automaton.within(scanned, "location", to_pos + len(to_keyword), len(message_lower))
                     
-                    # Tìm location trong from_part
-                    for location, code in self.location_mapping.items():
-                        if location in from_part or code.lower() in from_part:
-                            slots["from_city"] = code
-                            break
-                    
-                    # Tìm location trong to_part
-                    for location, code in self.location_mapping.items():
-                        if location in to_part or code.lower() in to_part:
-                            slots["to_city"] = code
-                            break
+                    if from_part:
+                        slots["from_city"] = from_part[0].value
+                    if to_part:
+                        slots["to_city"] = to_part[0].value
                     
                     # Nếu đã tìm thấy cả 2, thoát khỏi loop
                     if slots.get("from_city") and slots.get("to_city"):
@@ -281,22 +315,14 @@ class VietnameseNLU:
                     break
             
             if from_pos != -1 and to_pos != -1 and from_pos < to_pos:
-                # Tìm location gần "từ" và "đến" nhất
-                from_location = None
-                to_location = None
-                
-                for loc_text, code in location_matches:
-                    loc_pos = message_lower.find(loc_text)
-                    if loc_pos != -1:
-                        if loc_pos > from_pos and (from_location is None or loc_pos < message_lower.find(from_location[0])):
-                            from_location = (loc_text, code)
-                        if loc_pos > to_pos and (to_location is None or loc_pos < message_lower.find(to_location[0])):
-                            to_location = (loc_text, code)
+                # Location gần "từ" và "đến" nhất (match đã sắp theo vị trí)
+                from_location = next((match for match in location_matches if match.start > from_pos), None)
+                to_location = next((match for match in location_matches if match.start > to_pos), None)
                 
                 if from_location:
-                    slots["from_city"] = from_location[1]
+                    slots["from_city"] = from_location.value
                 if to_location:
-                    slots["to_city"] = to_location[1]
+                    slots["to_city"] = to_location.value
             else:
                 # Fallback: thứ tự xuất hiện
                 slots["from_city"] = locations[0]
@@ -305,17 +331,17 @@ class VietnameseNLU:
             slots["to_city"] = locations[0]
         
         # Extract dates với nhiều format
-        self._extract_dates(message_lower, slots)
+        self._extract_dates(message_lower, slots, scanned)
         
         # FIX: Extract flight reference từ "vé đó", "chuyến này"
         if any(ref in message_lower for ref in ["vé đó", "chuyến này", "chuyến đó", "vé này"]):
             slots["flight_reference"] = True
         
         # Extract time ranges
-        self._extract_time(message_lower, slots)
+        self._extract_time(message_lower, slots, scanned)
         
         # Extract class với nhiều cách gọi
-        self._extract_class(message_lower, slots)
+        self._extract_class(message_lower, slots, scanned)
         
         # Extract service ID nếu có
         service_match = re.search(r"(VN|VJ|BL|QH)(\d+)", message_lower.upper())
@@ -329,22 +355,27 @@ class VietnameseNLU:
             
         return slots
     
-    def _extract_dates(self, message: str, slots: Dict[str, Any]):
+    def _extract_dates(self, message: str, slots: Dict[str, Any], scanned: Dict[str, Any] = None):
         """Extract dates từ message"""
-        # Time patterns
-        for time_phrase, days_offset in self.time_patterns.items():
-            if time_phrase in message:
-                if isinstance(days_offset, int):
-                    target_date = datetime.now() + timedelta(days=days_offset)
-                else:
-                    # Xử lý thứ trong tuần
-                    today = datetime.now()
-                    days_ahead = days_offset - today.weekday()
-                    if days_ahead <= 0:
-                        days_ahead += 7
-                    target_date = today + timedelta(days=days_ahead)
-                slots["date"] = target_date.strftime("%Y-%m-%d")
-                break
+        if scanned is None:
+            scanned = self.automaton.scan(message)
+        
+        # Time patterns - leftmost-longest => "ngày mai" không bị tách thành "mai"
+        date_match = self.automaton.first(scanned, "date")
+        if date_match:
+            days_offset = date_match.value
+            if isinstance(days_offset, str):
+                target_date = weekend_date(days_offset, datetime.now())
+            elif isinstance(days_offset, int):
+                target_date = datetime.now() + timedelta(days=days_offset)
+            else:
+                # Xử lý thứ trong tuần
+                today = datetime.now()
+                days_ahead = days_offset - today.weekday()
+                if days_ahead <= 0:
+                    days_ahead += 7
+                target_date = today + timedelta(days=days_ahead)
+            slots["date"] = target_date.strftime("%Y-%m-%d")
         
         # Specific date patterns (dd/mm, dd-mm, dd/mm/yyyy)
         date_patterns = [
@@ -368,8 +399,11 @@ class VietnameseNLU:
                 except ValueError:
                     continue
     
-    def _extract_time(self, message: str, slots: Dict[str, Any]):
+    def _extract_time(self, message: str, slots: Dict[str, Any], scanned: Dict[str, Any] = None):
         """Extract time từ message"""
+        if scanned is None:
+            scanned = self.automaton.scan(message)
+        
         # Time patterns
         time_patterns = [
             r"(\d{1,2}):(\d{2})",           # HH:MM
@@ -390,27 +424,19 @@ class VietnameseNLU:
                     break
         
         # Time range keywords
-        time_ranges = {
-            "sáng": "06:00-11:59", "morning": "06:00-11:59",
-            "trưa": "12:00-13:59", "noon": "12:00-13:59", 
-            "chiều": "14:00-17:59", "afternoon": "14:00-17:59",
-            "tối": "18:00-21:59", "evening": "18:00-21:59",
-            "đêm": "22:00-05:59", "night": "22:00-05:59"
-        }
-        
-        for keyword, time_range in time_ranges.items():
-            if keyword in message:
-                slots["time_range"] = time_range
-                break
+        time_range = self.automaton.first(scanned, "time_range")
+        if time_range:
+            slots["time_range"] = time_range.value
     
-    def _extract_class(self, message: str, slots: Dict[str, Any]):
+    def _extract_class(self, message: str, slots: Dict[str, Any], scanned: Dict[str, Any] = None):
         """Extract class từ message"""
-        business_keywords = ["business", "thương gia", "hạng thương gia", "business class"]
-        economy_keywords = ["economy", "phổ thông", "hạng phổ thông", "economy class", "eco"]
+        if scanned is None:
+            scanned = self.automaton.scan(message)
         
-        if any(keyword in message for keyword in business_keywords):
+        class_types = [match.value for match in scanned.get("class", [])]
+        if "Business" in class_types:
             slots["class_type"] = "Business"
-        elif any(keyword in message for keyword in economy_keywords):
+        elif "Economy" in class_types:
             slots["class_type"] = "Economy"
 
     def process(self, message: str, context: Dict[str, Any] = None) -> Tuple[str, Dict[str, Any]]:
@@ -2,30 +2,16 @@ import re
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 
+from utils.keyword_automaton import KeywordAutomaton, normalize_text
+from utils.time_parser import FlexibleTimeParser
+from utils.gazetteer import gazetteer
+
 class SemanticParser:
     """Parser ngữ nghĩa tổng quát cho các biểu thức mơ hồ"""
     
     def __init__(self):
-        # Địa điểm
-        self.location_mappings = {
-            'sài gòn': 'Ho Chi Minh City', 'sg': 'Ho Chi Minh City', 'hcm': 'Ho Chi Minh City', 'tphcm': 'Ho Chi Minh City', 'tp hcm': 'Ho Chi Minh City', 'saigon': 'Ho Chi Minh City',
-            'hà nội': 'Hanoi', 'hn': 'Hanoi', 'thủ đô': 'Hanoi', 'hanoi': 'Hanoi', 'ha noi': 'Hanoi',
-            'đà nẵng': 'Da Nang', 'dn': 'Da Nang', 'da nang': 'Da Nang', 'danang': 'Da Nang',
-            'nha trang': 'Nha Trang', 'nt': 'Nha Trang', 'nhatrang': 'Nha Trang',
-            'phú quốc': 'Phu Quoc', 'pq': 'Phu Quoc', 'phu quoc': 'Phu Quoc', 'phuquoc': 'Phu Quoc', 'đảo ngọc': 'Phu Quoc',
-            'đà lạt': 'Da Lat', 'dl': 'Da Lat', 'da lat': 'Da Lat', 'dalat': 'Da Lat', 'thành phố hoa': 'Da Lat',
-            'cần thơ': 'Can Tho', 'ct': 'Can Tho', 'can tho': 'Can Tho', 'cantho': 'Can Tho', 'miền tây': 'Can Tho',
-            'huế': 'Hue', 'hue': 'Hue', 'cố đô': 'Hue', 'kinh thành': 'Hue',
-            'vũng tàu': 'Vung Tau', 'vt': 'Vung Tau', 'vung tau': 'Vung Tau', 'vungtau': 'Vung Tau', 'bà rịa': 'Vung Tau',
-            'quy nhon': 'Quy Nhon', 'qn': 'Quy Nhon', 'quynhon': 'Quy Nhon', 'bình định': 'Quy Nhon',
-            'hải phòng': 'Hai Phong', 'hp': 'Hai Phong', 'haiphong': 'Hai Phong', 'cảng': 'Hai Phong',
-            'vinh': 'Vinh', 'nghệ an': 'Vinh', 'nghe an': 'Vinh',
-            'pleiku': 'Pleiku', 'gia lai': 'Pleiku', 'gialai': 'Pleiku',
-            'buôn ma thuột': 'Buon Ma Thuot', 'bmt': 'Buon Ma Thuot', 'đắk lắk': 'Buon Ma Thuot', 'daklak': 'Buon Ma Thuot',
-            'côn đảo': 'Con Dao', 'con dao': 'Con Dao', 'condao': 'Con Dao',
-            'rạch giá': 'Rach Gia', 'rach gia': 'Rach Gia', 'rachgia': 'Rach Gia', 'kiên giang': 'Rach Gia',
-            'cà mau': 'Ca Mau', 'ca mau': 'Ca Mau', 'camau': 'Ca Mau', 'mũi cà mau': 'Ca Mau'
-        }
+        # Địa điểm - alias (có dấu lẫn không dấu) lấy từ gazetteer dùng chung
+        self.location_mappings = gazetteer.alias_table("city")
         
         # Số lượng người
         self.passenger_keywords = {
@@ -117,78 +103,97 @@ class SemanticParser:
             'chỗ ngồi cửa sổ': 'window_seat', 'window': 'window_seat', 'cửa sổ': 'window_seat',
             'chỗ ngồi lối đi': 'aisle_seat', 'aisle': 'aisle_seat', 'lối đi': 'aisle_seat'
         }
+        
+        # Gộp mọi bảng vào một automaton => một lượt quét cho cả message
+        self.time_parser = FlexibleTimeParser()
+        self.automaton = KeywordAutomaton.from_tables({
+            'location': self.location_mappings,
+            'passengers': self.passenger_keywords,
+            'trip_type': self.trip_types,
+            'seat_class': self.seat_classes,
+            'flight_time': self.flight_times,
+            'price_range': self.price_ranges,
+            'airline': self.airlines,
+            'trip_purpose': self.trip_purposes,
+            'priority': self.priorities,
+            'special_request': self.special_requests,
+            'time': self.time_parser.time_keywords
+        })
     
     def parse_semantic_info(self, text: str) -> Dict[str, Any]:
         """Parse toàn bộ thông tin ngữ nghĩa từ text"""
         result = {}
-        text_lower = text.lower()
+        text_lower = normalize_text(text)
+        scanned = self.automaton.scan(text_lower)
         
         # Parse địa điểm
-        locations = self._parse_locations(text_lower)
+        locations = self._parse_locations(text_lower, scanned)
         if locations:
             result['locations'] = locations
         
         # Parse số lượng hành khách
-        passengers = self._parse_passengers(text_lower)
+        passengers = self._parse_passengers(text_lower, scanned)
         if passengers:
             result['passengers'] = passengers
         
         # Parse loại chuyến bay
-        trip_type = self._parse_trip_type(text_lower)
+        trip_type = self._parse_trip_type(text_lower, scanned)
         if trip_type:
             result['trip_type'] = trip_type
         
         # Parse hạng ghế
-        seat_class = self._parse_seat_class(text_lower)
+        seat_class = self._parse_seat_class(text_lower, scanned)
         if seat_class:
             result['seat_class'] = seat_class
         
         # Parse thời gian bay
-        flight_time = self._parse_flight_time(text_lower)
+        flight_time = self._parse_flight_time(text_lower, scanned)
         if flight_time:
             result['flight_time'] = flight_time
         
         # Parse giá cả
-        price_range = self._parse_price_range(text_lower)
+        price_range = self._parse_price_range(text_lower, scanned)
         if price_range:
             result['price_range'] = price_range
         
         # Parse thời gian (sử dụng time parser có sẵn)
-        time_info = self._parse_time_expressions(text_lower)
+        time_info = self._parse_time_expressions(text_lower, scanned)
         if time_info:
             result['time_info'] = time_info
         
         # Parse hãng hàng không
-        airline = self._parse_airline(text_lower)
+        airline = self._parse_airline(text_lower, scanned)
         if airline:
             result['airline'] = airline
         
         # Parse mục đích chuyến đi
-        purpose = self._parse_trip_purpose(text_lower)
+        purpose = self._parse_trip_purpose(text_lower, scanned)
         if purpose:
             result['trip_purpose'] = purpose
         
         # Parse độ ưu tiên
-        priority = self._parse_priority(text_lower)
+        priority = self._parse_priority(text_lower, scanned)
         if priority:
             result['priority'] = priority
         
         # Parse yêu cầu đặc biệt
-        special_requests = self._parse_special_requests(text_lower)
+        special_requests = self._parse_special_requests(text_lower, scanned)
         if special_requests:
             result['special_requests'] = special_requests
         
         return result
     
-    def _parse_locations(self, text: str) -> Optional[Dict[str, str]]:
+    def _parse_locations(self, text: str, scanned: Dict[str, Any]) -> Optional[Dict[str, str]]:
         """Parse địa điểm đi và đến"""
         locations = {}
         
-        # Tìm các từ khóa địa điểm
-        found_locations = []
-        for keyword, standard_name in self.location_mappings.items():
-            if keyword in text:
-                found_locations.append((keyword, standard_name))
+        # Các từ khóa địa điểm theo thứ tự xuất hiện
+        found_locations = [(match.keyword, match.value) for match in scanned.get('location', [])]
+        if len(found_locations) < 2:
+            # Địa danh gõ sai / thiếu dấu lạ - tra gazetteer theo thứ tự xuất hiện
+            fuzzy_locations = [(place.iata, place.city) for _, place in gazetteer.find_in_text(text)]
+            if len(fuzzy_locations) > len(found_locations):
+                found_locations = fuzzy_locations
         
         # Xác định điểm đi và điểm đến
         if len(found_locations) >= 2:
@@ -197,15 +202,13 @@ class SemanticParser:
             match = re.search(from_to_pattern, text)
             
             if match:
-                from_text = match.group(2).strip()
-                to_text = match.group(4).strip()
-                
-                # Tìm địa điểm trong from_text và to_text
-                for keyword, standard_name in self.location_mappings.items():
-                    if keyword in from_text:
-                        locations['from'] = standard_name
-                    if keyword in to_text:
-                        locations['to'] = standard_name
+                # Tìm địa điểm trong phần "từ ..." và phần "đến ..."
+                from_matches = self.automaton.within(scanned, 'location', match.start(2), match.end(2))
+                to_matches = self.automaton.within(scanned, 'location', match.start(4), match.end(4))
+                if from_matches:
+                    locations['from'] = from_matches[0].value
+                if to_matches:
+                    locations['to'] = to_matches[0].value
             else:
                 # Nếu không có pattern rõ ràng, lấy 2 địa điểm đầu tiên
                 locations['from'] = found_locations[0][1]
@@ -220,12 +223,12 @@ class SemanticParser:
         
         return locations if locations else None
     
-    def _parse_passengers(self, text: str) -> Optional[int]:
+    def _parse_passengers(self, text: str, scanned: Dict[str, Any]) -> Optional[int]:
         """Parse số lượng hành khách"""
         # Kiểm tra từ khóa cố định
-        for keyword, count in self.passenger_keywords.items():
-            if keyword in text:
-                return count
+        match = self.automaton.first(scanned, 'passengers')
+        if match:
+            return match.value
         
         # Tìm pattern số + người
         number_pattern = r'(\d+)\s*người'
@@ -235,32 +238,26 @@ class SemanticParser:
         
         return None
     
-    def _parse_trip_type(self, text: str) -> Optional[str]:
+    def _parse_trip_type(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse loại chuyến bay"""
-        for keyword, trip_type in self.trip_types.items():
-            if keyword in text:
-                return trip_type
-        return None
+        match = self.automaton.first(scanned, 'trip_type')
+        return match.value if match else None
     
-    def _parse_seat_class(self, text: str) -> Optional[str]:
+    def _parse_seat_class(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse hạng ghế"""
-        for keyword, seat_class in self.seat_classes.items():
-            if keyword in text:
-                return seat_class
-        return None
+        match = self.automaton.first(scanned, 'seat_class')
+        return match.value if match else None
     
-    def _parse_flight_time(self, text: str) -> Optional[str]:
+    def _parse_flight_time(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse thời gian bay trong ngày"""
-        for keyword, time in self.flight_times.items():
-            if keyword in text:
-                return time
-        return None
+        match = self.automaton.first(scanned, 'flight_time')
+        return match.value if match else None
     
-    def _parse_price_range(self, text: str) -> Optional[Dict[str, Any]]:
+    def _parse_price_range(self, text: str, scanned: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Parse khoảng giá"""
-        for keyword, price_info in self.price_ranges.items():
-            if keyword in text:
-                return price_info
+        match = self.automaton.first(scanned, 'price_range')
+        if match:
+            return match.value
         
         # Tìm pattern giá cụ thể
         price_patterns = [
@@ -290,50 +287,40 @@ class SemanticParser:
         
         return None
     
-    def _parse_airline(self, text: str) -> Optional[str]:
+    def _parse_airline(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse hãng hàng không - Ưu tiên VietJet"""
-        # Ưu tiên VietJet keywords trước
-        vietjet_keywords = ['vietjet', 'vj', 'máy bay vàng', 'sovico', 'hãng vàng', 'giá rẻ', 'low cost']
-        for keyword in vietjet_keywords:
-            if keyword in text:
-                return 'VJ'
+        airline_codes = [match.value for match in scanned.get('airline', [])]
         
-        # Sau đó mới check các hãng khác
-        for keyword, airline_code in self.airlines.items():
-            if keyword in text and airline_code != 'VJ':
-                return airline_code
+        # Ưu tiên VietJet trước, sau đó mới tới các hãng khác
+        if 'VJ' in airline_codes:
+            return 'VJ'
+        if airline_codes:
+            return airline_codes[0]
         
         # Default về VietJet nếu không specify
         return 'VJ'
     
-    def _parse_trip_purpose(self, text: str) -> Optional[str]:
+    def _parse_trip_purpose(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse mục đích chuyến đi"""
-        for keyword, purpose in self.trip_purposes.items():
-            if keyword in text:
-                return purpose
-        return None
+        match = self.automaton.first(scanned, 'trip_purpose')
+        return match.value if match else None
     
-    def _parse_priority(self, text: str) -> Optional[str]:
+    def _parse_priority(self, text: str, scanned: Dict[str, Any]) -> Optional[str]:
         """Parse độ ưu tiên"""
-        for keyword, priority in self.priorities.items():
-            if keyword in text:
-                return priority
-        return None
+        match = self.automaton.first(scanned, 'priority')
+        return match.value if match else None
     
-    def _parse_special_requests(self, text: str) -> Optional[List[str]]:
+    def _parse_special_requests(self, text: str, scanned: Dict[str, Any]) -> Optional[List[str]]:
         """Parse yêu cầu đặc biệt"""
         requests = []
-        for keyword, request_type in self.special_requests.items():
-            if keyword in text:
-                requests.append(request_type)
+        for match in scanned.get('special_request', []):
+            if match.value not in requests:
+                requests.append(match.value)
         return requests if requests else None
     
-    def _parse_time_expressions(self, text: str) -> Optional[Dict[str, Any]]:
-        """Parse biểu thức thời gian (tích hợp với time parser)"""
-        from .time_parser import FlexibleTimeParser
-        
-        time_parser = FlexibleTimeParser()
-        return time_parser.parse_time_expression(text)
+    def _parse_time_expressions(self, text: str, scanned: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Parse biểu thức thời gian (tích hợp với time parser, dùng chung kết quả quét)"""
+        return self.time_parser.parse_time_expression(text, scanned)
     
     def extract_intent_details(self, text: str) -> Dict[str, Any]:
         """Trích xuất chi tiết ý định từ câu nói chung chung"""
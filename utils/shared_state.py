@@ -0,0 +1,112 @@
+"""
+Shared State - State hội thoại dùng chung giữa các worker/process (uvicorn --workers, streamlit + api)
+
+Mỗi singleton giữ state (SmartIntentAgent, BookingIntentAgent, VerificationAgent, PaymentAgent,
+BookingOrchestrator) dùng một SharedState theo namespace thay cho dict trong process.
+Value được serialize JSON và lưu qua StateBackend của utils.state_backends (STATE_BACKEND):
+
+- "memory"                 : in-process (mặc định, chỉ đúng với 1 worker)
+- "sqlite:///data/state.db": nhiều worker trên một host (SQLite WAL)
+- "redis://host:6379/0"    : cluster nhiều host
+
+get() luôn trả bản copy => sửa xong phải set() lại, hoặc dùng `with state.mutate(key) as value:`.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from utils.state_backends import StateBackend, create_backend, shard_for
+
+LOCK_STRIPES = 16
+
+
+def worker_count() -> int:
+    """Số worker uvicorn (API_WORKERS) - >1 thì mọi state phải nằm ở backend dùng chung"""
+    try:
+        return max(1, int(os.getenv("API_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+
+class SharedState:
+    """Key/value JSON theo namespace trên StateBackend, API gần giống dict"""
+
+    def __init__(self, namespace: str, ttl: Optional[float] = None, backend: StateBackend = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._backend = backend
+        self._init_lock = threading.Lock()
+        # Khóa read-modify-write trong process (giữa các worker: last write wins theo key)
+        self._locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+
+    @property
+    def backend(self) -> StateBackend:
+        if self._backend is None:
+            with self._init_lock:
+                if self._backend is None:
+                    spec = os.getenv("STATE_BACKEND", "memory")
+                    self._backend = create_backend(spec, self.namespace, os.path.join("data", "state", self.namespace))
+        return self._backend
+
+    def _lock_for(self, key: str) -> threading.RLock:
+        return self._locks[shard_for(key, LOCK_STRIPES)]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = self.backend.get(key)
+        return json.loads(raw) if raw is not None else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self.backend.set(key, json.dumps(value, ensure_ascii=False, default=str), ttl=ttl or self.ttl)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock_for(key):
+            value = self.get(key, default)
+            self.delete(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.backend.get(key) is not None
+
+    def keys(self) -> List[str]:
+        return self.backend.keys()
+
+    @contextmanager
+    def mutate(self, key: str, default_factory: Callable[[], Any] = dict) -> Iterator[Any]:
+        """Đọc - sửa - ghi lại một key (tạo mới bằng default_factory nếu chưa có)"""
+        with self._lock_for(key):
+            value = self.get(key)
+            if value is None:
+                value = default_factory()
+            yield value
+            self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend.name, "ttl": self.ttl}
+
+
+_registry: Dict[str, SharedState] = {}
+_registry_lock = threading.Lock()
+
+
+def shared_state(namespace: str, ttl: Optional[float] = None) -> SharedState:
+    """SharedState dùng chung cho một namespace trong process"""
+    with _registry_lock:
+        state = _registry.get(namespace)
+        if state is None:
+            state = _registry[namespace] = SharedState(namespace, ttl=ttl)
+        return state
+
+
+def shared_state_stats() -> Dict[str, Any]:
+    """Cho /status: backend đang dùng và các namespace đã đăng ký"""
+    return {
+        "backend": os.getenv("STATE_BACKEND", "memory"),
+        "workers": worker_count(),
+        "namespaces": {namespace: state.stats() for namespace, state in list(_registry.items())}
+    }
@@ -0,0 +1,459 @@
+"""
+State Backends - Backend lưu trữ key/value (JSON string) có TTL, dùng cho session context
+
+- FileBackend   : mỗi key một file <key>.json trong thư mục (tương thích data/contexts cũ)
+- SQLiteBackend : một bảng (namespace, key) trong SQLite WAL
+- RedisBackend  : client nói Redis protocol (redis-py), hoặc FakeRedis in-process để test
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class StateBackend:
+    """Interface chung - value luôn là JSON string đã serialize"""
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def set_many(self, items: Iterable[Tuple[str, str]], ttl: Optional[float] = None):
+        for key, value in items:
+            self.set(key, value, ttl)
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def keys(self) -> List[str]:
+        raise NotImplementedError
+
+    def delete_expired(self, ttl: float) -> int:
+        """Xóa các key không được ghi trong `ttl` giây, trả về số key đã xóa"""
+        return 0
+
+    def close(self):
+        pass
+
+
+SEGMENT_DIR = "segments"
+SEGMENT_SHARDS = 16
+
+
+def shard_for(key: str, shards: int = SEGMENT_SHARDS) -> int:
+    """Shard ổn định cho một key (không phụ thuộc PYTHONHASHSEED)"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest(), "big") % shards
+
+
+def record_timestamp(value: str, fallback: float) -> float:
+    """Thời điểm cập nhật của một context: field last_updated, nếu không có thì fallback (mtime)"""
+    try:
+        last_updated = json.loads(value).get("last_updated")
+        return datetime.fromisoformat(last_updated).timestamp() if last_updated else fallback
+    except (ValueError, TypeError, AttributeError):
+        return fallback
+
+
+class FileBackend(StateBackend):
+    """Mỗi key là một file JSON - giữ nguyên layout data/contexts/{user_id}.json
+
+    Session đã nguội được sweeper gom vào segment file theo shard
+    (segments/shard-XX.jsonl, mỗi dòng {"k", "u", "v"}, dòng sau thắng dòng trước).
+    File lẻ luôn mới hơn segment nên được ưu tiên khi đọc.
+    """
+
+    name = "file"
+
+    def __init__(self, directory: str, shards: int = SEGMENT_SHARDS):
+        self.directory = directory
+        self.shards = shards
+        self.segment_dir = os.path.join(directory, SEGMENT_DIR)
+        os.makedirs(directory, exist_ok=True)
+
+        # shard -> (mtime của segment file, key -> value) - đọc lười, reload khi file đổi
+        self._segments: Dict[int, Tuple[float, Dict[str, str]]] = {}
+        self._segment_lock = threading.RLock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def segment_path(self, shard: int) -> str:
+        return os.path.join(self.segment_dir, f"shard-{shard:02d}.jsonl")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return self._segment_values(shard_for(key, self.shards)).get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        # Ghi file tạm rồi rename => không bao giờ đọc phải file ghi dở
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+        shard = shard_for(key, self.shards)
+        if key in self._segment_values(shard):
+            # Tombstone - compaction sẽ bỏ hẳn
+            with self._segment_lock:
+                with open(self.segment_path(shard), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({"k": key, "u": time.time(), "v": None}, ensure_ascii=False) + "\n")
+                self._segments.pop(shard, None)
+
+    def loose_files(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".json")]
+
+    def keys(self) -> List[str]:
+        keys = {entry.name[:-5] for entry in self.loose_files()}
+        for shard in range(self.shards):
+            keys.update(self._segment_values(shard))
+        return list(keys)
+
+    def delete_expired(self, ttl: float) -> int:
+        # Dựa vào mtime => không cần mở/parse file (segment do compact_shard xử lý)
+        cutoff = time.time() - ttl
+        removed = 0
+        for entry in self.loose_files():
+            if entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    # ------------------------------------------------------------------
+    # Segments
+    # ------------------------------------------------------------------
+
+    def read_segment(self, shard: int) -> Dict[str, Dict[str, Any]]:
+        """key -> record mới nhất (kể cả tombstone) của một shard"""
+        records: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.segment_path(shard), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        records[record["k"]] = record
+                    except (ValueError, KeyError, TypeError):
+                        continue  # dòng hỏng (ghi dở) => bỏ qua
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _segment_values(self, shard: int) -> Dict[str, str]:
+        path = self.segment_path(shard)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return {}
+
+        cached = self._segments.get(shard)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        values = {key: record["v"] for key, record in self.read_segment(shard).items() if record.get("v") is not None}
+        with self._segment_lock:
+            self._segments[shard] = (mtime, values)
+        return values
+
+    def compact_shard(self, shard: int, loose: List[os.DirEntry], ttl: float, min_age: float,
+                      dry_run: bool = False) -> Dict[str, int]:
+        """Gom file lẻ đã nguội vào segment của shard, bỏ session hết hạn và tombstone
+
+        loose: các file lẻ thuộc shard này (sweeper scan thư mục một lần rồi chia theo shard)
+        min_age: file lẻ được ghi gần hơn min_age giây vẫn giữ nguyên (session đang hoạt động)
+        """
+        # Giữ lock cả lượt để tombstone do delete() append không bị ghi đè mất
+        with self._segment_lock:
+            return self._compact_shard(shard, loose, ttl, min_age, dry_run)
+
+    def _compact_shard(self, shard: int, loose: List[os.DirEntry], ttl: float, min_age: float,
+                       dry_run: bool) -> Dict[str, int]:
+        now = time.time()
+        cutoff = now - ttl
+        stats = {"scanned": 0, "expired": 0, "compacted": 0, "kept_loose": 0, "bytes_before": 0, "bytes_after": 0}
+
+        segment_path = self.segment_path(shard)
+        segment_size = os.path.getsize(segment_path) if os.path.exists(segment_path) else 0
+        stats["bytes_before"] += segment_size
+        records = self.read_segment(shard)
+
+        expired_files, folded_files = [], []
+        for entry in loose:
+            stats["scanned"] += 1
+            try:
+                file_stat = entry.stat()
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    value = f.read()
+            except FileNotFoundError:
+                continue
+            stats["bytes_before"] += file_stat.st_size
+            key = entry.name[:-5]
+            updated_at = record_timestamp(value, file_stat.st_mtime)
+
+            if updated_at < cutoff:
+                expired_files.append((entry.path, file_stat.st_mtime))
+                records.pop(key, None)
+                stats["expired"] += 1
+            elif now - file_stat.st_mtime >= min_age:
+                try:
+                    compact_value = json.dumps(json.loads(value), ensure_ascii=False, separators=(",", ":"))
+                except ValueError:
+                    stats["kept_loose"] += 1
+                    stats["bytes_after"] += file_stat.st_size
+                    continue
+                records[key] = {"k": key, "u": updated_at, "v": compact_value}
+                folded_files.append((entry.path, file_stat.st_mtime))
+                stats["compacted"] += 1
+            else:
+                stats["kept_loose"] += 1
+                stats["bytes_after"] += file_stat.st_size
+
+        # Bỏ tombstone và record hết hạn trong segment cũ
+        live = []
+        for record in records.values():
+            if record.get("v") is None:
+                continue
+            if record.get("u", 0) < cutoff:
+                stats["expired"] += 1
+                continue
+            live.append(record)
+
+        lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in live]
+        new_size = sum(len(line.encode("utf-8")) for line in lines)
+        stats["bytes_after"] += new_size
+        if dry_run:
+            return stats
+
+        if lines:
+            os.makedirs(self.segment_dir, exist_ok=True)
+            tmp_path = f"{segment_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(tmp_path, segment_path)
+        elif os.path.exists(segment_path):
+            os.remove(segment_path)
+        self._segments.pop(shard, None)
+
+        # Chỉ xóa file lẻ nếu không bị ghi lại trong lúc compact (mtime không đổi)
+        for path, mtime in expired_files + folded_files:
+            try:
+                if os.stat(path).st_mtime == mtime:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        return stats
+
+
+class SQLiteBackend(StateBackend):
+    """Key/value trong SQLite WAL, nhiều namespace dùng chung một file"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, namespace: str = "default"):
+        self.path = path
+        self.namespace = namespace
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_state_updated ON state(namespace, updated_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM state WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+        if not row or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.set_many([(key, value)], ttl)
+
+    def set_many(self, items: Iterable[Tuple[str, str]], ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        rows = [(self.namespace, key, value, now, expires_at) for key, value in items]
+        with self._lock:
+            # Một transaction cho cả batch
+            self._conn.executemany("INSERT OR REPLACE INTO state VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._conn.commit()
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM state WHERE namespace = ?", (self.namespace,)).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_expired(self, ttl: float) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND (updated_at < ? OR expires_at < ?)",
+                (self.namespace, now - ttl, now)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class FakeRedis:
+    """Client in-process có subset API của redis-py (get/set ex/delete/scan_iter/pipeline)"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._alive(key)
+
+    def set(self, key: str, value, ex: Optional[float] = None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def scan_iter(self, match: str = "*"):
+        prefix = match[:-1] if match.endswith("*") else match
+        with self._lock:
+            keys = [key for key in list(self._data) if key.startswith(prefix) and self._alive(key) is not None]
+        return iter(keys)
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self._client = client
+        self._commands = []
+
+    def set(self, key: str, value, ex: Optional[float] = None):
+        self._commands.append((key, value, ex))
+        return self
+
+    def execute(self):
+        return [self._client.set(key, value, ex=ex) for key, value, ex in self._commands]
+
+
+class RedisBackend(StateBackend):
+    """Backend qua Redis protocol - TTL do Redis tự xử lý (SET ... EX)"""
+
+    name = "redis"
+
+    def __init__(self, client=None, url: str = None, namespace: str = "default"):
+        if client is None:
+            if redis is None:
+                raise ImportError("redis package is required for the Redis backend (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = f"{namespace}:"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        self.client.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+
+    def set_many(self, items: Iterable[Tuple[str, str]], ttl: Optional[float] = None):
+        pipe = self.client.pipeline()
+        for key, value in items:
+            pipe.set(self.prefix + key, value, ex=int(ttl) if ttl else None)
+        pipe.execute()
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def keys(self) -> List[str]:
+        keys = []
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            keys.append(key[len(self.prefix):])
+        return keys
+
+
+_fake_redis: Optional[FakeRedis] = None
+
+
+def create_backend(spec: str, namespace: str, base_dir: str = None) -> StateBackend:
+    """Tạo backend từ chuỗi cấu hình
+
+    - "file"                   : FileBackend(base_dir)
+    - "sqlite:///path/to.db"   : SQLiteBackend
+    - "redis://host:6379/0"    : RedisBackend (cần package redis)
+    - "memory"                 : RedisBackend trên FakeRedis dùng chung trong process
+    """
+    spec = (spec or "file").strip()
+    if spec == "file":
+        return FileBackend(base_dir or os.path.join("data", namespace))
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):], namespace=namespace)
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url=spec, namespace=namespace)
+    if spec == "memory":
+        global _fake_redis
+        if _fake_redis is None:
+            _fake_redis = FakeRedis()
+        return RedisBackend(client=_fake_redis, namespace=namespace)
+    raise ValueError(f"Unknown state backend: {spec}")
@@ -2,6 +2,17 @@ import re
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
+from utils.keyword_automaton import KeywordAutomaton, normalize_text
+
+
+def weekend_date(offset: str, today: datetime) -> datetime:
+    """Thứ 7 của 'weekend' / 'this_weekend' (thứ 7 gần nhất, kể cả hôm nay) hoặc 'next_weekend' (+1 tuần)"""
+    days_until_saturday = (5 - today.weekday()) % 7
+    if offset == 'next_weekend':
+        days_until_saturday += 7
+    return today + timedelta(days=days_until_saturday)
+
+
 class FlexibleTimeParser:
     """Parser thời gian linh hoạt cho nhiều format"""
     
@@ -46,15 +57,23 @@ class FlexibleTimeParser:
             'tháng': 'months',
             'năm': 'years'
         }
+        
+        # Build một lần - leftmost-longest => "cuối tuần sau" không bị "tuần sau" cướp
+        self.automaton = KeywordAutomaton.from_tables({'time': self.time_keywords})
     
-    def parse_time_expression(self, text: str) -> Optional[Dict[str, Any]]:
-        """Parse biểu thức thời gian từ text"""
-        text_lower = text.lower().strip()
+    def parse_time_expression(self, text: str, scanned: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Parse biểu thức thời gian từ text
+        
+        scanned: kết quả KeywordAutomaton.scan đã có category 'time' (SemanticParser quét chung một lượt)
+        """
+        text_lower = normalize_text(text).strip()
+        if scanned is None:
+            scanned = self.automaton.scan(text_lower)
         
         # 1. Kiểm tra các từ khóa cố định
-        for keyword, offset in self.time_keywords.items():
-            if keyword in text_lower:
-                return self._calculate_date_from_keyword(keyword, offset)
+        match = KeywordAutomaton.first(scanned, 'time')
+        if match:
+            return self._calculate_date_from_keyword(match.keyword, match.value)
         
         # 2. Kiểm tra pattern số + đơn vị (VD: "3 ngày nữa", "2 tuần sau")
         number_match = self._parse_number_expression(text_lower)
@@ -92,29 +111,9 @@ class FlexibleTimeParser:
                 'original': keyword
             }
         
-        elif offset == 'weekend':
-            # Tìm cuối tuần gần nhất
-            days_until_saturday = (5 - today.weekday()) % 7
-            if days_until_saturday == 0 and today.weekday() == 5:  # Hôm nay là thứ 7
-                days_until_saturday = 0
-            elif days_until_saturday == 0:  # Hôm nay là chủ nhật
-                days_until_saturday = 6
-            
-            weekend_date = today + timedelta(days=days_until_saturday)
-            return {
-                'date': weekend_date.strftime('%Y-%m-%d'),
-                'type': 'weekend',
-                'original': keyword
-            }
-        
-        elif offset in ['this_weekend', 'next_weekend']:
-            days_until_saturday = (5 - today.weekday()) % 7
-            if offset == 'next_weekend':
-                days_until_saturday += 7
-            
-            weekend_date = today + timedelta(days=days_until_saturday)
+        elif offset in ['weekend', 'this_weekend', 'next_weekend']:
             return {
-                'date': weekend_date.strftime('%Y-%m-%d'),
+                'date': weekend_date(offset, today).strftime('%Y-%m-%d'),
                 'type': 'weekend',
                 'original': keyword
             }
@@ -0,0 +1,285 @@
+"""
+Tracing - Đo thời gian từng bước của một lượt chat (NLU, LLM, agent, context, render)
+
+- Mỗi lượt chat là một trace, mỗi bước là một span lồng nhau (theo contextvars nên đi theo
+  cả asyncio task lẫn thread của async_bridge)
+- Span mang duration, token count, cache hit... qua span.set(...) hoặc tracer.annotate(...)
+- Trace đã xong được giữ trong ring buffer (xem /debug/traces), tùy chọn export OpenTelemetry
+- Sampling quyết định một lần ở đầu trace (TRACE_SAMPLE_RATE); trace không được sample
+  thì mọi span là no-op nên chi phí gần như bằng 0
+"""
+
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+class Span:
+    """Một bước trong trace - dùng như context manager"""
+
+    __slots__ = ("tracer", "name", "attributes", "children", "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        if parent is not None:
+            parent.children.append(self)
+        self.start_ns = time.perf_counter_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Async generator bị đóng ở context khác - chỉ cần gỡ span khỏi context hiện tại
+            _current_span.set(None)
+        return False
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.perf_counter_ns()
+        return round((end_ns - self.start_ns) / 1e6, 3)
+
+    def to_dict(self, origin_ns: int) -> Dict[str, Any]:
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start_ns - origin_ns) / 1e6, 3),
+            "duration_ms": self.duration_ms,
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.error:
+            data["error"] = self.error
+        if self.children:
+            data["children"] = [child.to_dict(origin_ns) for child in list(self.children)]
+        return data
+
+
+class RootSpan(Span):
+    """Span gốc của trace - khi đóng thì đẩy cả cây vào ring buffer"""
+
+    __slots__ = ("trace_id", "started_at")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        super().__init__(tracer, name, attributes)
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Span khi trace không được sample - không ghi gì"""
+
+    __slots__ = ()
+    duration_ms = 0.0
+
+    def set(self, **attributes) -> "_NoopSpan":
+        return self
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Tracer in-process với ring buffer các trace gần nhất"""
+
+    def __init__(self, sample_rate: float = 0.1, buffer_size: int = 200, otel_export: bool = False):
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self._traces: "deque[Dict[str, Any]]" = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self.started = 0
+        self.sampled = 0
+        self.exported = 0
+        self._exporters: List[Callable[[Dict[str, Any]], None]] = []
+
+        self._otel = None
+        if otel_export and otel_trace is not None:
+            self._otel = otel_trace.get_tracer("booking-agent")
+        elif otel_export:
+            print("⚠️ TRACE_OTEL_EXPORT bật nhưng chưa cài opentelemetry-api - bỏ qua export")
+
+    def trace(self, name: str, force: bool = None, **attributes):
+        """Bắt đầu trace mới (span gốc). Đang trong trace khác thì chỉ tạo span con"""
+        if _current_span.get() is not None:
+            return self.span(name, **attributes)
+        self.started += 1
+        sampled = force if force is not None else random.random() < self.sample_rate
+        if not sampled:
+            return _NOOP_SPAN
+        self.sampled += 1
+        return RootSpan(self, name, attributes)
+
+    def span(self, name: str, **attributes):
+        """Span con của span hiện tại (no-op nếu không có trace đang được sample)"""
+        if _current_span.get() is None:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def annotate(self, **attributes):
+        """Gắn thêm attribute (tokens, cache_hit...) vào span hiện tại"""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    @property
+    def active(self) -> bool:
+        return _current_span.get() is not None
+
+    def traced(self, name: str = None):
+        """Decorator: bọc hàm sync/async trong một span"""
+        def decorator(func: Callable):
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _finish(self, root: RootSpan):
+        record = {
+            "trace_id": root.trace_id,
+            "started_at": root.started_at,
+            **root.to_dict(root.start_ns)
+        }
+        with self._lock:
+            self._traces.append(record)
+        if self._otel is not None:
+            self._export_otel(root)
+        for exporter in list(self._exporters):
+            try:
+                exporter(record)
+            except Exception as e:
+                print(f"⚠️ Trace exporter failed: {e}")
+
+    def add_exporter(self, exporter: Callable[[Dict[str, Any]], None]):
+        """Nhận mọi trace đã xong (dict giống /debug/traces) - vd benchmark gom số liệu theo span"""
+        self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter: Callable[[Dict[str, Any]], None]):
+        if exporter in self._exporters:
+            self._exporters.remove(exporter)
+
+    def _export_otel(self, root: RootSpan):
+        """Phát lại cây span sang OpenTelemetry với đúng thời điểm bắt đầu/kết thúc"""
+        offset_ns = int(root.started_at * 1e9) - root.start_ns
+
+        def emit(span: Span, parent_context=None):
+            otel_span = self._otel.start_span(span.name, context=parent_context, start_time=span.start_ns + offset_ns)
+            for key, value in span.attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    otel_span.set_attribute(key, value)
+            if span.error:
+                otel_span.set_attribute("error", span.error)
+            context = otel_trace.set_span_in_context(otel_span)
+            for child in list(span.children):
+                emit(child, context)
+            otel_span.end(end_time=(span.end_ns or span.start_ns) + offset_ns)
+
+        try:
+            emit(root)
+            self.exported += 1
+        except Exception as e:
+            print(f"⚠️ OpenTelemetry export failed: {e}")
+
+    def recent(self, limit: int = 20, name: str = None) -> List[Dict[str, Any]]:
+        """Các trace gần nhất (mới nhất trước)"""
+        with self._lock:
+            traces = list(self._traces)
+        if name:
+            traces = [trace for trace in traces if trace["name"] == name]
+        return traces[::-1][:limit]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((trace for trace in self._traces if trace["trace_id"] == trace_id), None)
+
+    def summary(self) -> Dict[str, Any]:
+        """p50/p95 theo tên span trên các trace trong buffer"""
+        durations: Dict[str, List[float]] = {}
+
+        def collect(span: Dict[str, Any]):
+            durations.setdefault(span["name"], []).append(span["duration_ms"])
+            for child in span.get("children", ()):
+                collect(child)
+
+        for trace in self.recent(self.buffer_size):
+            collect(trace)
+
+        summary = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1]
+            }
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "buffer_size": self.buffer_size,
+            "buffered": len(self._traces),
+            "started": self.started,
+            "sampled": self.sampled,
+            "otel_export": self._otel is not None,
+            "exported": self.exported
+        }
+
+
+# Global instance
+tracer = Tracer(
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")),
+    buffer_size=int(os.getenv("TRACE_BUFFER_SIZE", "200")),
+    otel_export=os.getenv("TRACE_OTEL_EXPORT", "false").lower() == "true"
+)